@@ -0,0 +1,34 @@
+# kanidm_create_group.py - Run kanidm_create_group on the controller when the task is local.
+
+# pylint: disable=E0401
+# GNU General Public License v3.0+
+# (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from typing import Any, Dict
+
+from ansible_collections.annie444.base.plugins.plugin_utils.kanidm_action import (  # type: ignore
+    KanidmActionBase,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.arg_specs.group import (  # type: ignore
+    KanidmGroupArgs,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.group import (  # type: ignore
+    KanidmGroup,
+)
+
+
+class ActionModule(KanidmActionBase):  # type: ignore[misc]
+    """
+    Create or update a Kanidm group from the controller.
+    """
+
+    MODULE = "annie444.base.kanidm_create_group"
+    ARGS = KanidmGroupArgs
+    RESULT = {}
+
+    def runner(self, args: KanidmGroupArgs) -> KanidmGroup:
+        return KanidmGroup(args)
+
+    def execute(self, runner: KanidmGroup) -> Dict[str, Any]:
+        runner.create_group()
+        return {}
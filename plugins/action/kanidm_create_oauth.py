@@ -0,0 +1,34 @@
+# kanidm_create_oauth.py - Run kanidm_create_oauth on the controller when the task is local.
+
+# pylint: disable=E0401
+# GNU General Public License v3.0+
+# (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from typing import Any, Dict
+
+from ansible_collections.annie444.base.plugins.plugin_utils.kanidm_action import (  # type: ignore
+    KanidmActionBase,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.arg_specs.oauth import (  # type: ignore
+    KanidmOauthArgs,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.oauth import (  # type: ignore
+    KanidmOAuth,
+)
+
+
+class ActionModule(KanidmActionBase):  # type: ignore[misc]
+    """
+    Create or update a Kanidm OAuth client from the controller.
+    """
+
+    MODULE = "annie444.base.kanidm_create_oauth"
+    ARGS = KanidmOauthArgs
+    RESULT = dict(secret="")
+    SECRETS = ("secret",)
+
+    def runner(self, args: KanidmOauthArgs) -> KanidmOAuth:
+        return KanidmOAuth(args)
+
+    def execute(self, runner: KanidmOAuth) -> Dict[str, Any]:
+        return {"secret": runner.create_oauth_client()}
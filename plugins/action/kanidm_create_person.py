@@ -0,0 +1,34 @@
+# kanidm_create_person.py - Run kanidm_create_person on the controller when the task is local.
+
+# pylint: disable=E0401
+# GNU General Public License v3.0+
+# (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from typing import Any, Dict
+
+from ansible_collections.annie444.base.plugins.plugin_utils.kanidm_action import (  # type: ignore
+    KanidmActionBase,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.arg_specs.person import (  # type: ignore
+    KanidmPersonArgs,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.person import (  # type: ignore
+    KanidmPerson,
+)
+
+
+class ActionModule(KanidmActionBase):  # type: ignore[misc]
+    """
+    Create or update one Kanidm person from the controller.
+    """
+
+    MODULE = "annie444.base.kanidm_create_person"
+    ARGS = KanidmPersonArgs
+    RESULT = dict(reset_url="")
+    SECRETS = ("reset_url",)
+
+    def runner(self, args: KanidmPersonArgs) -> KanidmPerson:
+        return KanidmPerson(args)
+
+    def execute(self, runner: KanidmPerson) -> Dict[str, Any]:
+        return {"reset_url": runner.create_person()}
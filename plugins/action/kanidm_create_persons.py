@@ -0,0 +1,45 @@
+# kanidm_create_persons.py - Run kanidm_create_persons on the controller when the task is local.
+
+# pylint: disable=E0401
+# GNU General Public License v3.0+
+# (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from typing import Any, Dict
+
+from ansible_collections.annie444.base.plugins.plugin_utils.kanidm_action import (  # type: ignore
+    KanidmActionBase,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.arg_specs.persons import (  # type: ignore
+    KanidmPersonsArgs,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.persons import (  # type: ignore
+    KanidmPersons,
+)
+
+
+class ActionModule(KanidmActionBase):  # type: ignore[misc]
+    """
+    Create or update many Kanidm persons from the controller.
+    """
+
+    MODULE = "annie444.base.kanidm_create_persons"
+    ARGS = KanidmPersonsArgs
+    RESULT = dict(persons=[])
+
+    def runner(self, args: KanidmPersonsArgs) -> KanidmPersons:
+        return KanidmPersons(args)
+
+    def execute(self, runner: KanidmPersons) -> Dict[str, Any]:
+        runner.create_persons()
+        if len(runner.failed) > 0:
+            return {
+                "failed": True,
+                "msg": f"Unable to create or update persons: {', '.join(runner.failed)}",
+            }
+        return {}
+
+    def report(self, runner: KanidmPersons) -> Dict[str, Any]:
+        return {"persons": list(runner.results.values())}
+
+    def has_secrets(self, result: Dict[str, Any]) -> bool:
+        return any(person.get("reset_url") for person in result.get("persons", []))
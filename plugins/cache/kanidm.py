@@ -0,0 +1,145 @@
+# kanidm.py - SQLite cache plugin shared with the Kanidm modules.
+
+# pylint: disable=E0401
+# GNU General Public License v3.0+
+# (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = """
+    name: kanidm
+    author: Annie Ehler (@annie444)
+    version_added: "1.1.0"
+    short_description: SQLite backed cache with per-key expiry and LRU eviction.
+    description:
+      - Stores cached values in a single SQLite database.
+      - Every value expires on its own and the least recently read values are evicted once the cache holds more than O(_max_entries) values.
+      - Writes are atomic SQLite transactions, so forks and concurrent runs never read a partial value.
+      - Use a separate file from O(kanidm.entry_cache_path) of the Kanidm modules, the cache would list and flush their entries as facts.
+    requirements:
+      - The Python sqlite3 module.
+    options:
+      _uri:
+        required: False
+        default: ~/.cache/ansible-kanidm/facts.sqlite
+        description:
+          - Path of the SQLite database.
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_CONNECTION
+        ini:
+          - key: fact_caching_connection
+            section: defaults
+        type: path
+      _prefix:
+        description: User defined prefix added to every key.
+        default: ""
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_PREFIX
+        ini:
+          - key: fact_caching_prefix
+            section: defaults
+      _timeout:
+        default: 86400
+        description:
+          - Expiration timeout for the cached values, in seconds.
+          - V(0) keeps values until they are evicted.
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_TIMEOUT
+        ini:
+          - key: fact_caching_timeout
+            section: defaults
+        type: integer
+      _max_entries:
+        default: 10000
+        description: Number of values kept before the least recently read ones are evicted.
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_MAX_ENTRIES
+        ini:
+          - key: fact_caching_max_entries
+            section: defaults
+        type: integer
+"""
+
+import copy
+
+from ansible.errors import AnsibleError  # type: ignore
+from ansible.module_utils.basic import missing_required_lib  # type: ignore
+from ansible.parsing.ajson import AnsibleJSONDecoder, AnsibleJSONEncoder  # type: ignore
+from ansible.plugins.cache import BaseCacheModule  # type: ignore
+from ansible.utils.display import Display  # type: ignore
+
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.store import (  # type: ignore
+    HAS_SQLITE,
+    SQLITE_IMP_ERR,
+    KanidmStore,
+)
+
+display = Display()
+
+## Returned by the store for keys it doesn't hold, cached facts may be None.
+MISSING = object()
+
+
+class CacheModule(BaseCacheModule):  # type: ignore[misc]
+    """
+    A cache module backed by the SQLite store of the Kanidm modules.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CacheModule, self).__init__(*args, **kwargs)
+        if not HAS_SQLITE:
+            raise AnsibleError(f"{missing_required_lib('sqlite3')}: {SQLITE_IMP_ERR}")
+
+        self._prefix = self.get_option("_prefix") or ""
+        self._store = KanidmStore(
+            self.get_option("_uri"),
+            ttl=self.get_option("_timeout"),
+            max_entries=self.get_option("_max_entries"),
+            encoder=AnsibleJSONEncoder,
+            decoder=AnsibleJSONDecoder,
+        )
+
+    def _key(self, key):
+        return f"{self._prefix}{key}"
+
+    def get(self, key):
+        value = self._store.get(self._key(key), MISSING)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def set(self, key, value):
+        self._store.set(self._key(key), value)
+
+    def keys(self):
+        return [
+            key[len(self._prefix) :]
+            for key in self._store.keys()
+            if key.startswith(self._prefix)
+        ]
+
+    def contains(self, key):
+        return self._store.contains(self._key(key))
+
+    def delete(self, key):
+        self._store.delete(self._key(key))
+
+    def flush(self):
+        if self._prefix:
+            self._store.delete_prefix(self._prefix)
+        else:
+            self._store.flush()
+
+    def copy(self):
+        ret = dict()
+        for key in self.keys():
+            try:
+                ret[key] = copy.deepcopy(self.get(key))
+            except KeyError:
+                # Expired between listing and reading.
+                continue
+        return ret
+
+    def stats(self):
+        """Hit, miss, expiry and eviction counters of this run and in total."""
+        stats = self._store.stats()
+        display.vvv(f"kanidm cache stats: {stats}")
+        return stats
@@ -6,7 +6,8 @@ class ModuleDocFragment(object):
         required: true
         aliases:
         - image_src
-        description: The source URL of the image.
+        description: The source URL or path of the image. Remote images are kept under C(~/.cache/ansible-kanidm/downloads)
+          and revalidated with conditional requests on later runs.
       format:
         type: str
         choices:
@@ -19,6 +20,19 @@ class ModuleDocFragment(object):
         default: auto
         required: false
         description: The format of the image. Defaults to auto.
+      optimize:
+        type: bool
+        default: false
+        required: false
+        description: Shrink the image before uploading it. SVG images are minified. PNG,
+          JPEG and WebP images are downscaled to max_dimension and re-encoded as WebP when
+          Pillow is installed, and uploaded unchanged otherwise. Results are kept under
+          C(~/.cache/ansible-kanidm/optimized).
+      max_dimension:
+        type: int
+        default: 256
+        required: false
+        description: The longest side, in pixels, of an optimized image.
       
     """
 
@@ -1,4 +1,3 @@
-
 class ModuleDocFragment(object):
     DOCUMENTATION = r"""
     options:
@@ -76,7 +75,9 @@ class ModuleDocFragment(object):
             type: str
             required: false
             no_log: true
-            description: The CA certificate data as a base64 encoded string.
+            description: The CA certificate data as a base64 encoded string, optionally
+              compressed or archived. The decoded file is kept under C(~/.cache/ansible-kanidm/content)
+              and reused while the data is unchanged.
           verify_ca:
             type: bool
             required: false
@@ -87,6 +88,117 @@ class ModuleDocFragment(object):
             required: false
             default: 30
             description: The connection timeout in seconds.
+          read_timeout:
+            type: int
+            required: false
+            default: 60
+            description: How long to wait for the server to send a response, in seconds.
+          pool_size:
+            type: int
+            required: false
+            default: 10
+            description: The maximum number of pooled connections kept open to the Kanidm
+              server.
+          retries:
+            type: int
+            required: false
+            default: 3
+            description: How many times to retry a request that failed to connect, was reset,
+              or got a transient error from the server. Only idempotent requests are retried
+              after they reached the server.
+          retry_backoff:
+            type: float
+            required: false
+            default: 0.5
+            description: The base delay in seconds for the exponential backoff between retries.
+              A random jitter is applied to every delay.
+          workers:
+            type: int
+            required: false
+            default: 4
+            description: The maximum number of independent requests sent to the Kanidm server
+              at the same time.
+          token_cache:
+            type: bool
+            required: false
+            default: false
+            description: Whether to reuse authentication tokens between runs by caching
+              them on disk. The cached tokens are privileged, a token whose write access
+              is about to end is not reused.
+          token_cache_path:
+            type: path
+            required: false
+            default: ~/.cache/kanidm_tokens
+            description: The path of the token cache. Uses the same file format as the kanidm
+              CLI.
+          validate_token_locally:
+            type: bool
+            required: false
+            default: false
+            description: Trust the expiry claim of the bearer token instead of asking the
+              server to validate it, as long as the token is outside the grace window.
+          read_cache:
+            type: bool
+            required: false
+            default: true
+            description: Reuse successful GET responses within one module run until the
+              entry they belong to is written to.
+          entry_cache:
+            type: bool
+            required: false
+            default: false
+            description: Share person, group and OAuth client reads between module runs
+              through an SQLite cache on the host running the module. Writes made through
+              this collection invalidate the cached entries.
+          entry_cache_path:
+            type: path
+            required: false
+            default: ~/.cache/ansible-kanidm/entries.sqlite
+            description: The path of the SQLite entry cache. Don't share it with the annie444.base.kanidm
+              cache plugin, which treats every key in its file as a fact.
+          entry_cache_ttl:
+            type: int
+            required: false
+            default: 300
+            description: How long, in seconds, an entry is served from the entry cache.
+              V(0) keeps entries until they are evicted.
+          entry_cache_entries:
+            type: int
+            required: false
+            default: 10000
+            description: The number of values kept in the entry cache before the least recently
+              used ones are evicted.
+          daemon:
+            type: bool
+            required: false
+            default: false
+            description: Send requests through a local daemon that keeps HTTP connections
+              to the server open between module runs. The daemon is started on first use
+              and exits after daemon_idle_timeout seconds without clients. Requests are
+              sent directly when it can't be started.
+          daemon_socket:
+            type: path
+            required: false
+            default: ~/.cache/ansible-kanidm/daemon-0.sock
+            description: The Unix socket of the connection daemon.
+          daemon_idle_timeout:
+            type: int
+            required: false
+            default: 300
+            description: How long, in seconds, the connection daemon keeps running without
+              any client.
+          transcript_entries:
+            type: int
+            required: false
+            default: 64
+            description: The maximum number of requests and responses returned in the module
+              result. The oldest calls are dropped first.
+          transcript_bytes:
+            type: int
+            required: false
+            default: 1048576
+            description: The maximum number of request and response body bytes kept for
+              the module result.
         required: true
         description: Configuration for the Kanidm client.
       display_name:
@@ -200,7 +312,9 @@ class ModuleDocFragment(object):
             required: true
             aliases:
             - image_src
-            description: The source URL of the image.
+            description: The source URL or path of the image. Remote images are kept under
+              C(~/.cache/ansible-kanidm/downloads) and revalidated with conditional requests
+              on later runs.
           format:
             type: str
             choices:
@@ -213,6 +327,19 @@ class ModuleDocFragment(object):
             default: auto
             required: false
             description: The format of the image. Defaults to auto.
+          optimize:
+            type: bool
+            default: false
+            required: false
+            description: Shrink the image before uploading it. SVG images are minified.
+              PNG, JPEG and WebP images are downscaled to max_dimension and re-encoded as
+              WebP when Pillow is installed, and uploaded unchanged otherwise. Results are
+              kept under C(~/.cache/ansible-kanidm/optimized).
+          max_dimension:
+            type: int
+            default: 256
+            required: false
+            description: The longest side, in pixels, of an optimized image.
         required: false
         aliases:
         - logo
@@ -224,4 +351,3 @@ class ModuleDocFragment(object):
         description: Enable debug mode.
       
     """
-            
\ No newline at end of file
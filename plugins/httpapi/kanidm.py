@@ -0,0 +1,115 @@
+# kanidm.py - HttpApi plugin for the Kanidm REST API.
+
+# pylint: disable=E0401
+# GNU General Public License v3.0+
+# (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = """
+    name: kanidm
+    author: Annie Ehler (@annie444)
+    version_added: "1.1.0"
+    short_description: HttpApi plugin for the Kanidm REST API.
+    description:
+      - Lets the Kanidm modules send their requests over a persistent C(ansible.netcommon.httpapi) connection, so one authenticated HTTP connection is kept per inventory host for the whole play.
+      - Logs in with the O(remote_user) and O(password) of the connection through the same C(/v1/auth) init2, begin and cred steps as the modules, and sends the token as a bearer token.
+      - An expired token is detected by a 401 response, after which the plugin logs in again and repeats the request once.
+    notes:
+      - Set C(ansible_connection=ansible.netcommon.httpapi) and C(ansible_network_os=annie444.base.kanidm). The connection's host, port and TLS settings are used, the O(kanidm.uri) of the modules is only used to key caches.
+"""
+
+import base64
+from typing import Any, Dict, Optional
+
+from ansible.errors import AnsibleAuthenticationFailure  # type: ignore
+from ansible.plugins.httpapi import HttpApiBase  # type: ignore
+
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.codec import (  # type: ignore
+    dumps,
+    loads,
+)
+
+## Kanidm hands out the id of an authentication session in this header, and
+## expects it back on the following steps.
+AUTH_SESSION_HEADER = "X-KANIDM-AUTH-SESSION-ID"
+
+
+class HttpApi(HttpApiBase):  # type: ignore[misc]
+    """
+    HttpApi plugin for the Kanidm REST API.
+    """
+
+    def login(self, username: str, password: str):
+        if not username or not password:
+            raise AnsibleAuthenticationFailure(
+                "Kanidm needs remote_user and password to log in"
+            )
+
+        headers: Dict[str, str] = {"Content-Type": "application/json"}
+        state = self.auth_step(
+            {"init2": {"username": username, "issue": "token", "privileged": True}},
+            headers,
+        )
+        if "password" not in state.get("choose", []):
+            raise AnsibleAuthenticationFailure(f"Unexpected Kanidm auth state {state}")
+
+        state = self.auth_step({"begin": "password"}, headers)
+        if "password" not in state.get("continue", []):
+            raise AnsibleAuthenticationFailure(f"Unexpected Kanidm auth state {state}")
+
+        state = self.auth_step({"cred": {"password": password}}, headers)
+        if "success" not in state:
+            raise AnsibleAuthenticationFailure("Kanidm rejected the credentials")
+
+        self.connection._auth = {"Authorization": f"Bearer {state['success']}"}
+
+    def auth_step(
+        self, step: Dict[str, Any], headers: Dict[str, str]
+    ) -> Dict[str, Any]:
+        response, data = self.connection.send(
+            "/v1/auth",
+            dumps({"step": step}),
+            method="POST",
+            headers=headers,
+        )
+        # Carry the authentication session over to the next step.
+        session = response.headers.get(AUTH_SESSION_HEADER)
+        if session:
+            headers[AUTH_SESSION_HEADER] = session
+        cookie = response.headers.get("Set-Cookie")
+        if cookie:
+            headers["Cookie"] = cookie.split(";", 1)[0]
+        try:
+            return loads(data.getvalue()).get("state", {})
+        except ValueError:
+            raise AnsibleAuthenticationFailure(
+                f"Unexpected Kanidm auth response {data.getvalue()!r}"
+            )
+
+    def update_auth(self, response, response_text) -> Optional[Dict[str, str]]:
+        # The bearer token from login stays valid, cookies are not needed.
+        return None
+
+    def send_request(
+        self,
+        data: Optional[str],
+        path: str = "/",
+        method: str = "GET",
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """Send one request and return its status, headers and base64 body.
+
+        HTTP errors are returned like any other response, so the caller sees
+        the same status codes it would get from a direct connection.
+        """
+        body = base64.b64decode(data) if data is not None else None
+        response, buffer = self.connection.send(
+            path, body, method=method, headers=headers or {}
+        )
+        status = getattr(response, "status", None) or response.getcode()
+        return {
+            "status": status,
+            "reason": getattr(response, "reason", None) or getattr(response, "msg", ""),
+            "url": response.geturl(),
+            "headers": dict(response.headers.items()),
+            "body": base64.b64encode(buffer.getvalue()).decode("ascii"),
+        }
@@ -0,0 +1,181 @@
+# kanidm.py - Build an inventory from Kanidm entries and groups.
+
+# pylint: disable=E0401
+# GNU General Public License v3.0+
+# (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = """
+    name: kanidm
+    author: Annie Ehler (@annie444)
+    version_added: "1.1.0"
+    short_description: Kanidm inventory source.
+    description:
+      - Adds the Kanidm service accounts or persons as hosts and their Kanidm groups, from C(memberof), as inventory groups.
+      - The inventory is kept in the inventory cache, a run that uses the cache makes no requests to Kanidm.
+      - Kanidm can't select entries by C(last_modified_cid), so refreshing the cache lists the collections in full. Only entries whose C(last_modified_cid) changed are processed again.
+      - Uses a YAML configuration file that ends with C(kanidm.yml) or C(kanidm.yaml).
+    extends_documentation_fragment:
+      - constructed
+      - inventory_cache
+    options:
+      plugin:
+        description: Token that ensures this is a source file for the plugin.
+        required: True
+        choices: ['annie444.base.kanidm']
+      kanidm:
+        description: Connection settings, the same options as the C(kanidm) option of the Kanidm modules.
+        type: dict
+        required: True
+      host_kind:
+        description: Which entries become inventory hosts.
+        type: str
+        default: service_account
+        choices: [service_account, person]
+      host_group:
+        description: Only add hosts that are members of this Kanidm group.
+        type: str
+      posix_groups_only:
+        description: Only create inventory groups for Kanidm groups with the C(posixgroup) class.
+        type: bool
+        default: False
+"""
+
+EXAMPLES = """
+# kanidm.yml
+plugin: annie444.base.kanidm
+kanidm:
+  uri: https://idm.example.com
+  username: idm_admin
+  password: "{{ lookup('env', 'KANIDM_PASSWORD') }}"
+host_group: servers
+posix_groups_only: true
+cache: true
+cache_plugin: annie444.base.kanidm
+cache_timeout: 3600
+keyed_groups:
+  - key: kanidm_gidnumber
+    prefix: gid
+"""
+
+from typing import Any, Dict, Optional
+
+from ansible.errors import AnsibleError, AnsibleParserError  # type: ignore
+from ansible.module_utils.basic import missing_required_lib  # type: ignore
+from ansible.plugins.inventory import (  # type: ignore
+    BaseInventoryPlugin,
+    Cacheable,
+    Constructable,
+)
+from ansible.utils.display import Display  # type: ignore
+
+from ansible_collections.annie444.base.plugins.module_utils.base_exception import (  # type: ignore
+    BaseAnsibleError,
+)
+from ansible_collections.annie444.base.plugins.module_utils.verify import (  # type: ignore
+    Verify,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.arg_specs.conf import (  # type: ignore
+    KanidmConf,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.api import (  # type: ignore
+    HAS_REQUESTS,
+    REQUESTS_IMP_ERR,
+    KanidmApi,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.inventory import (  # type: ignore
+    KanidmInventory,
+)
+
+display = Display()
+
+
+class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):  # type: ignore[misc]
+    """
+    Kanidm inventory plugin: kanidm
+    Build an inventory from Kanidm entries and groups.
+    """
+
+    NAME = "annie444.base.kanidm"
+
+    def verify_file(self, path: str) -> bool:
+        if super(InventoryModule, self).verify_file(path):
+            return path.endswith(("kanidm.yml", "kanidm.yaml"))
+        return False
+
+    def parse(self, inventory, loader, path, cache=True):
+        super(InventoryModule, self).parse(inventory, loader, path)
+        self._read_config_data(path)
+
+        if not HAS_REQUESTS:
+            raise AnsibleError(
+                f"{missing_required_lib('requests')}: {REQUESTS_IMP_ERR}"
+            )
+
+        cache_key = self.get_cache_key(path)
+        use_cache = self.get_option("cache")
+
+        previous = self.cached(cache_key) if use_cache else None
+        runner = self.runner()
+        if previous is not None and cache:
+            snapshot = previous
+        else:
+            snapshot = self.refresh(runner, previous)
+            display.vvv(
+                f"kanidm inventory derived {runner.derived} entries and reused {runner.reused}"
+            )
+            if use_cache:
+                self._cache[cache_key] = snapshot
+
+        self.populate(runner.inventory(snapshot))
+
+    def cached(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        # Even when a refresh is forced the old snapshot provides the CIDs.
+        try:
+            return self._cache[cache_key]
+        except KeyError:
+            return None
+
+    def runner(self) -> KanidmInventory:
+        try:
+            # Allow secrets to come from lookups such as env or vault files.
+            options = self.templar.template(self.get_option("kanidm"))
+            conf = KanidmConf(**Verify(options, "kanidm").verify_dict())
+        except BaseAnsibleError as e:
+            raise AnsibleParserError(f"Invalid kanidm options: {e.message}") from e
+        except (TypeError, ValueError, AttributeError) as e:
+            raise AnsibleParserError(f"Invalid kanidm options: {e}") from e
+        return KanidmInventory(
+            KanidmApi(args=conf),
+            host_kind=self.get_option("host_kind"),
+            host_group=self.get_option("host_group"),
+            posix_groups_only=self.get_option("posix_groups_only"),
+        )
+
+    def refresh(
+        self, runner: KanidmInventory, previous: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        try:
+            return runner.refresh(previous)
+        except BaseAnsibleError as e:
+            raise AnsibleError(f"Error in kanidm inventory: {e.message}") from e
+
+    def populate(self, hosts: Dict[str, Dict[str, Any]]):
+        strict = self.get_option("strict")
+        for name, host in hosts.items():
+            self.inventory.add_host(name)
+            for group in host["groups"]:
+                group = self.inventory.add_group(group)
+                self.inventory.add_child(group, name)
+            for key, value in host["vars"].items():
+                self.inventory.set_variable(name, key, value)
+
+            hostvars = self.inventory.get_host(name).get_vars()
+            self._set_composite_vars(
+                self.get_option("compose"), hostvars, name, strict=strict
+            )
+            self._add_host_to_composed_groups(
+                self.get_option("groups"), hostvars, name, strict=strict
+            )
+            self._add_host_to_keyed_groups(
+                self.get_option("keyed_groups"), hostvars, name, strict=strict
+            )
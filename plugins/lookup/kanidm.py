@@ -0,0 +1,161 @@
+# kanidm.py - Look up persons, groups and OAuth clients in Kanidm.
+
+# pylint: disable=E0401
+# GNU General Public License v3.0+
+# (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = """
+    name: kanidm
+    author: Annie Ehler (@annie444)
+    version_added: "1.1.0"
+    short_description: Look up persons, groups and OAuth clients in Kanidm.
+    description:
+      - Resolves persons, groups, group members, OAuth client attributes and OAuth client secrets by name or UUID.
+      - All terms of one lookup are answered by a single filtered search of C(/v1/raw/search) for their names or UUIDs. When the account may not search, the collection is listed instead. Client secrets are read concurrently, one request per client.
+      - Results are memoized for the process and, unless O(kanidm.entry_cache) is disabled, shared between forks and hosts through the entry cache for O(kanidm.entry_cache_ttl) seconds. Client secrets are only memoized in memory.
+    options:
+      _terms:
+        description: Names or UUIDs to look up.
+        required: True
+        type: list
+        elements: str
+      kind:
+        description:
+          - What to look up.
+          - V(group_members) returns the member names of each group.
+          - V(oauth2_secret) returns the basic secret of each OAuth client.
+        type: str
+        default: person
+        choices: [person, group, group_members, oauth2, oauth2_secret]
+      attribute:
+        description:
+          - Return this attribute instead of the whole entry, for example V(uuid) or V(mail).
+          - Ignored for V(group_members) and V(oauth2_secret).
+        type: str
+      first:
+        description: Return only the first value of O(attribute), or null if it is empty.
+        type: bool
+        default: False
+      kanidm:
+        description:
+          - Connection settings, the same options as the C(kanidm) option of the Kanidm modules.
+          - O(kanidm.entry_cache) defaults to V(true) for this lookup.
+        type: dict
+        required: True
+"""
+
+EXAMPLES = """
+- name: Get the UUID of an OAuth client
+  ansible.builtin.debug:
+    msg: "{{ lookup('annie444.base.kanidm', 'nextcloud', kind='oauth2', attribute='uuid', first=True, kanidm=kanidm) }}"
+
+- name: Get the members of two groups with one request
+  ansible.builtin.debug:
+    msg: "{{ query('annie444.base.kanidm', 'admins', 'developers', kind='group_members', kanidm=kanidm) }}"
+
+- name: Get a client secret
+  ansible.builtin.set_fact:
+    client_secret: "{{ lookup('annie444.base.kanidm', 'nextcloud', kind='oauth2_secret', kanidm=kanidm) }}"
+"""
+
+RETURN = """
+_list:
+  description: One value per term, in the order of the terms.
+  type: list
+"""
+
+from typing import Any, Dict, List, Optional
+
+from ansible.errors import AnsibleError  # type: ignore
+from ansible.module_utils.basic import missing_required_lib  # type: ignore
+from ansible.plugins.lookup import LookupBase  # type: ignore
+from ansible.utils.display import Display  # type: ignore
+
+from ansible_collections.annie444.base.plugins.module_utils.base_exception import (  # type: ignore
+    BaseAnsibleError,
+)
+from ansible_collections.annie444.base.plugins.module_utils.verify import (  # type: ignore
+    Verify,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.arg_specs.conf import (  # type: ignore
+    KanidmConf,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.api import (  # type: ignore
+    HAS_REQUESTS,
+    REQUESTS_IMP_ERR,
+    KanidmApi,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.codec import (  # type: ignore
+    dumps,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.lookup import (  # type: ignore
+    KanidmLookup,
+    LookupKind,
+)
+
+display = Display()
+
+# One lookup runner per connection, so repeated lookups in this process reuse
+# the session, the token and the read cache.
+_LOOKUPS: Dict[str, KanidmLookup] = {}
+
+
+class LookupModule(LookupBase):  # type: ignore[misc]
+    """
+    Kanidm lookup plugin: kanidm
+    Look up persons, groups and OAuth clients in Kanidm.
+    """
+
+    def run(
+        self,
+        terms: List[str],
+        variables: Optional[Dict[str, Any]] = None,
+        **kwargs: Dict[str, Any],
+    ) -> List[Any]:
+        """
+        Run the lookup with the specified terms.
+
+        Args:
+            terms: Names or UUIDs to look up.
+            variables: Additional variables.
+            **kwargs: The lookup options.
+
+        Returns:
+            list: One value per term.
+
+        Raises:
+            AnsibleError: If the options are invalid or a term can't be resolved.
+        """
+        if not HAS_REQUESTS:
+            raise AnsibleError(
+                f"{missing_required_lib('requests')}: {REQUESTS_IMP_ERR}"
+            )
+
+        self.set_options(var_options=variables, direct=kwargs)
+        kind = LookupKind(self.get_option("kind"))
+
+        display.vvv(f"Running kanidm {kind} lookup with terms: {terms}")
+
+        try:
+            runner = self.runner(self.get_option("kanidm"))
+            result = runner.lookup(
+                kind,
+                [str(term) for term in terms],
+                attribute=self.get_option("attribute"),
+                first=self.get_option("first"),
+            )
+            display.vvv(f"kanidm lookup stats: {runner.api.stats}")
+            return result
+        except BaseAnsibleError as e:
+            raise AnsibleError(f"Error in kanidm lookup: {e.message}") from e
+        except (TypeError, ValueError, AttributeError) as e:
+            raise AnsibleError(f"Error in kanidm lookup: {e}") from e
+
+    @staticmethod
+    def runner(options: Dict[str, Any]) -> KanidmLookup:
+        options = dict(Verify(options, "kanidm").verify_dict())
+        options.setdefault("entry_cache", True)
+        key = dumps(options, sort_keys=True, default=str)
+        if key not in _LOOKUPS:
+            _LOOKUPS[key] = KanidmLookup(KanidmApi(args=KanidmConf(**options)))
+        return _LOOKUPS[key]
@@ -0,0 +1,102 @@
+from __future__ import absolute_import, annotations, division, print_function
+
+import hashlib
+import os
+import tempfile
+import traceback
+from pathlib import Path
+from ansible.module_utils.compat.typing import Dict, Iterable, Optional, Tuple
+
+from .kanidm.runner.codec import dumpb, loads
+
+REQUESTS_IMP_ERR = None
+try:
+    import requests
+
+    HAS_REQUESTS = True
+except ImportError:
+    HAS_REQUESTS = False
+    REQUESTS_IMP_ERR = traceback.format_exc()
+
+## Downloads are kept here, in one directory per URL named by its hash.
+DOWNLOAD_CACHE_DIR: str = "~/.cache/ansible-kanidm/downloads"
+## Connect and read timeouts of a download, in seconds.
+DOWNLOAD_TIMEOUT: Tuple[float, float] = (10.0, 60.0)
+## Bytes written to disk at a time.
+DOWNLOAD_CHUNK_SIZE: int = 64 * 1024
+## Files in a cache directory holding the body and the validators of a URL.
+DOWNLOAD_DATA: str = "data"
+DOWNLOAD_META: str = "meta.json"
+
+
+def read_meta(directory: Path) -> Dict[str, str]:
+    try:
+        with open(directory / DOWNLOAD_META, "rb") as f:
+            meta = loads(f.read())
+    except (OSError, ValueError):
+        return {}
+    return meta if isinstance(meta, dict) else {}
+
+
+def write_atomic(path: Path, chunks: Iterable[bytes]):
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def validators(response) -> Dict[str, str]:
+    return {
+        key: response.headers[header]
+        for key, header in (("etag", "ETag"), ("last_modified", "Last-Modified"))
+        if header in response.headers
+    }
+
+
+def download(
+    url: str,
+    cache_dir: str | Path = DOWNLOAD_CACHE_DIR,
+    timeout: Optional[Tuple[float, float]] = DOWNLOAD_TIMEOUT,
+) -> Path:
+    """Download ``url`` into the cache and return the path of the body.
+
+    The ETag and Last-Modified headers of the response are kept next to the
+    body. When the URL was downloaded before they are sent back as
+    If-None-Match and If-Modified-Since, and a 304 answer reuses the cached
+    body. The body is streamed to disk, and replaces the cached one only once
+    it is complete.
+
+    Raises ``requests.RequestException`` when the download fails.
+    """
+    directory = (
+        Path(cache_dir).expanduser() / hashlib.sha256(url.encode("utf-8")).hexdigest()
+    )
+    data = directory / DOWNLOAD_DATA
+    meta = read_meta(directory) if data.exists() else {}
+
+    headers: Dict[str, str] = {}
+    if "etag" in meta:
+        headers["If-None-Match"] = meta["etag"]
+    if "last_modified" in meta:
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 304 and meta:
+            return data
+        if response.status_code != 200:
+            raise requests.HTTPError(
+                f"{response.status_code} {response.reason} for url: {url}",
+                response=response,
+            )
+        directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        write_atomic(data, response.iter_content(DOWNLOAD_CHUNK_SIZE))
+        fresh = validators(response)
+
+    fresh["url"] = url
+    write_atomic(directory / DOWNLOAD_META, [dumpb(fresh)])
+    return data
@@ -16,6 +16,10 @@ from ..exceptions import (
     KanidmArgsException,
     KanidmRequiredOptionError,
 )
+from ..runner.attrs import CLIENT_TOKEN_CACHE
+from ..runner.daemon import DEFAULT_DAEMON_IDLE_TIMEOUT, DEFAULT_DAEMON_SOCKET
+from ..runner.store import DEFAULT_STORE_ENTRIES, DEFAULT_STORE_PATH, DEFAULT_STORE_TTL
+from ..runner.transcript import DEFAULT_TRANSCRIPT_BYTES, DEFAULT_TRANSCRIPT_ENTRIES
 
 STR_ENUM_IMP_ERR = None
 try:
@@ -53,6 +57,26 @@ class KanidmConf:
     ca_cert_data: Optional[str] = None
     verify_ca: bool = True
     connect_timeout: int = 30
+    read_timeout: int = 60
+    pool_size: int = 10
+    retries: int = 3
+    retry_backoff: float = 0.5
+    workers: int = 4
+    token_cache: bool = False
+    token_cache_path: str = CLIENT_TOKEN_CACHE
+    validate_token_locally: bool = False
+    read_cache: bool = True
+    entry_cache: bool = False
+    entry_cache_path: str = DEFAULT_STORE_PATH
+    entry_cache_ttl: int = DEFAULT_STORE_TTL
+    entry_cache_entries: int = DEFAULT_STORE_ENTRIES
+    daemon: bool = False
+    daemon_socket: str = DEFAULT_DAEMON_SOCKET
+    daemon_idle_timeout: int = DEFAULT_DAEMON_IDLE_TIMEOUT
+    transcript_entries: int = DEFAULT_TRANSCRIPT_ENTRIES
+    transcript_bytes: int = DEFAULT_TRANSCRIPT_BYTES
+    # Set by the modules when they run over a persistent httpapi connection.
+    socket_path: Optional[str] = None
 
     def __init__(self, **kwargs):
         try:
@@ -84,6 +108,78 @@ class KanidmConf:
                 self.connect_timeout = Verify(
                     kwargs.get("connect_timeout"), "connect_timeout"
                 ).verify_default_int(30)
+            if "read_timeout" in kwargs:
+                self.read_timeout = Verify(
+                    kwargs.get("read_timeout"), "read_timeout"
+                ).verify_default_int(60)
+            if "pool_size" in kwargs:
+                self.pool_size = Verify(
+                    kwargs.get("pool_size"), "pool_size"
+                ).verify_default_int(10)
+            if "retries" in kwargs:
+                self.retries = Verify(
+                    kwargs.get("retries"), "retries"
+                ).verify_default_int(3)
+            if "retry_backoff" in kwargs:
+                self.retry_backoff = Verify(
+                    kwargs.get("retry_backoff"), "retry_backoff"
+                ).verify_default_float(0.5)
+            if "workers" in kwargs:
+                self.workers = Verify(
+                    kwargs.get("workers"), "workers"
+                ).verify_default_int(4)
+            if "token_cache" in kwargs:
+                self.token_cache = Verify(
+                    kwargs.get("token_cache"), "token_cache"
+                ).verify_default_bool(False)
+            if "token_cache_path" in kwargs:
+                self.token_cache_path = Verify(
+                    kwargs.get("token_cache_path"), "token_cache_path"
+                ).verify_default_str(CLIENT_TOKEN_CACHE)
+            if "validate_token_locally" in kwargs:
+                self.validate_token_locally = Verify(
+                    kwargs.get("validate_token_locally"), "validate_token_locally"
+                ).verify_default_bool(False)
+            if "read_cache" in kwargs:
+                self.read_cache = Verify(
+                    kwargs.get("read_cache"), "read_cache"
+                ).verify_default_bool(True)
+            if "entry_cache" in kwargs:
+                self.entry_cache = Verify(
+                    kwargs.get("entry_cache"), "entry_cache"
+                ).verify_default_bool(False)
+            if "entry_cache_path" in kwargs:
+                self.entry_cache_path = Verify(
+                    kwargs.get("entry_cache_path"), "entry_cache_path"
+                ).verify_default_str(DEFAULT_STORE_PATH)
+            if "entry_cache_ttl" in kwargs:
+                self.entry_cache_ttl = Verify(
+                    kwargs.get("entry_cache_ttl"), "entry_cache_ttl"
+                ).verify_default_int(DEFAULT_STORE_TTL)
+            if "entry_cache_entries" in kwargs:
+                self.entry_cache_entries = Verify(
+                    kwargs.get("entry_cache_entries"), "entry_cache_entries"
+                ).verify_default_int(DEFAULT_STORE_ENTRIES)
+            if "daemon" in kwargs:
+                self.daemon = Verify(
+                    kwargs.get("daemon"), "daemon"
+                ).verify_default_bool(False)
+            if "daemon_socket" in kwargs:
+                self.daemon_socket = Verify(
+                    kwargs.get("daemon_socket"), "daemon_socket"
+                ).verify_default_str(DEFAULT_DAEMON_SOCKET)
+            if "daemon_idle_timeout" in kwargs:
+                self.daemon_idle_timeout = Verify(
+                    kwargs.get("daemon_idle_timeout"), "daemon_idle_timeout"
+                ).verify_default_int(DEFAULT_DAEMON_IDLE_TIMEOUT)
+            if "transcript_entries" in kwargs:
+                self.transcript_entries = Verify(
+                    kwargs.get("transcript_entries"), "transcript_entries"
+                ).verify_default_int(DEFAULT_TRANSCRIPT_ENTRIES)
+            if "transcript_bytes" in kwargs:
+                self.transcript_bytes = Verify(
+                    kwargs.get("transcript_bytes"), "transcript_bytes"
+                ).verify_default_int(DEFAULT_TRANSCRIPT_BYTES)
         except TypeError as e:
             raise KanidmArgsException(str(e), e)
         except ValueError as e:
@@ -121,6 +217,24 @@ class KanidmConf:
                 "ca_cert_data",
                 "verify_ca",
                 "connect_timeout",
+                "read_timeout",
+                "pool_size",
+                "retries",
+                "retry_backoff",
+                "workers",
+                "token_cache",
+                "token_cache_path",
+                "validate_token_locally",
+                "read_cache",
+                "entry_cache",
+                "entry_cache_path",
+                "entry_cache_ttl",
+                "entry_cache_entries",
+                "daemon",
+                "daemon_socket",
+                "daemon_idle_timeout",
+                "transcript_entries",
+                "transcript_bytes",
             ]
         )
 
@@ -164,7 +278,7 @@ class KanidmConf:
                 "type": OptionType("str"),
                 "required": False,
                 "no_log": True,
-                "description": "The CA certificate data as a base64 encoded string.",
+                "description": "The CA certificate data as a base64 encoded string, optionally compressed or archived. The decoded file is kept under C(~/.cache/ansible-kanidm/content) and reused while the data is unchanged.",
             },
             "verify_ca": {
                 "type": OptionType("bool"),
@@ -178,6 +292,114 @@ class KanidmConf:
                 "default": 30,
                 "description": "The connection timeout in seconds.",
             },
+            "read_timeout": {
+                "type": OptionType("int"),
+                "required": False,
+                "default": 60,
+                "description": "How long to wait for the server to send a response, in seconds.",
+            },
+            "pool_size": {
+                "type": OptionType("int"),
+                "required": False,
+                "default": 10,
+                "description": "The maximum number of pooled connections kept open to the Kanidm server.",
+            },
+            "retries": {
+                "type": OptionType("int"),
+                "required": False,
+                "default": 3,
+                "description": "How many times to retry a request that failed to connect, was reset, or got a transient error from the server. Only idempotent requests are retried after they reached the server.",
+            },
+            "retry_backoff": {
+                "type": OptionType("float"),
+                "required": False,
+                "default": 0.5,
+                "description": "The base delay in seconds for the exponential backoff between retries. A random jitter is applied to every delay.",
+            },
+            "workers": {
+                "type": OptionType("int"),
+                "required": False,
+                "default": 4,
+                "description": "The maximum number of independent requests sent to the Kanidm server at the same time.",
+            },
+            "token_cache": {
+                "type": OptionType("bool"),
+                "required": False,
+                "default": False,
+                "description": "Whether to reuse authentication tokens between runs by caching them on disk. The cached tokens are privileged, a token whose write access is about to end is not reused.",
+            },
+            "token_cache_path": {
+                "type": OptionType("path"),
+                "required": False,
+                "default": CLIENT_TOKEN_CACHE,
+                "description": "The path of the token cache. Uses the same file format as the kanidm CLI.",
+            },
+            "validate_token_locally": {
+                "type": OptionType("bool"),
+                "required": False,
+                "default": False,
+                "description": "Trust the expiry claim of the bearer token instead of asking the server to validate it, as long as the token is outside the grace window.",
+            },
+            "read_cache": {
+                "type": OptionType("bool"),
+                "required": False,
+                "default": True,
+                "description": "Reuse successful GET responses within one module run until the entry they belong to is written to.",
+            },
+            "entry_cache": {
+                "type": OptionType("bool"),
+                "required": False,
+                "default": False,
+                "description": "Share person, group and OAuth client reads between module runs through an SQLite cache on the host running the module. Writes made through this collection invalidate the cached entries.",
+            },
+            "entry_cache_path": {
+                "type": OptionType("path"),
+                "required": False,
+                "default": DEFAULT_STORE_PATH,
+                "description": "The path of the SQLite entry cache. Don't share it with the annie444.base.kanidm cache plugin, which treats every key in its file as a fact.",
+            },
+            "entry_cache_ttl": {
+                "type": OptionType("int"),
+                "required": False,
+                "default": DEFAULT_STORE_TTL,
+                "description": "How long, in seconds, an entry is served from the entry cache. V(0) keeps entries until they are evicted.",
+            },
+            "entry_cache_entries": {
+                "type": OptionType("int"),
+                "required": False,
+                "default": DEFAULT_STORE_ENTRIES,
+                "description": "The number of values kept in the entry cache before the least recently used ones are evicted.",
+            },
+            "daemon": {
+                "type": OptionType("bool"),
+                "required": False,
+                "default": False,
+                "description": "Send requests through a local daemon that keeps HTTP connections to the server open between module runs. The daemon is started on first use and exits after daemon_idle_timeout seconds without clients. Requests are sent directly when it can't be started.",
+            },
+            "daemon_socket": {
+                "type": OptionType("path"),
+                "required": False,
+                "default": DEFAULT_DAEMON_SOCKET,
+                "description": "The Unix socket of the connection daemon.",
+            },
+            "daemon_idle_timeout": {
+                "type": OptionType("int"),
+                "required": False,
+                "default": DEFAULT_DAEMON_IDLE_TIMEOUT,
+                "description": "How long, in seconds, the connection daemon keeps running without any client.",
+            },
+            "transcript_entries": {
+                "type": OptionType("int"),
+                "required": False,
+                "default": DEFAULT_TRANSCRIPT_ENTRIES,
+                "description": "The maximum number of requests and responses returned in the module result. The oldest calls are dropped first.",
+            },
+            "transcript_bytes": {
+                "type": OptionType("int"),
+                "required": False,
+                "default": DEFAULT_TRANSCRIPT_BYTES,
+                "description": "The maximum number of request and response body bytes kept for the module result.",
+            },
         }
 
     @staticmethod
@@ -42,6 +42,21 @@ except ImportError:
     HAS_YAML = False
     YAML_IMP_ERR = traceback.format_exc()
 
+## Default number of members added or removed per request.
+DEFAULT_MEMBER_CHUNK_SIZE: int = 1000
+
+
+class MemberState(StrEnum):  # type: ignore
+    present = "present"
+    exact = "exact"
+    absent = "absent"
+
+    def __str__(self):
+        return self.value
+
+    def __repr__(self):
+        return self.value
+
 
 @dataclass
 class KanidmGroupArgs:
@@ -49,11 +64,15 @@ class KanidmGroupArgs:
     users: List[str]
     kanidm: KanidmConf
     parent: Optional[str] = None
+    state: MemberState = MemberState("present")
+    chunk_size: int = DEFAULT_MEMBER_CHUNK_SIZE
     debug: bool = False
 
     def __init__(self, **kwargs):
         # Defaults
         self.parent = None
+        self.state = MemberState.present
+        self.chunk_size = DEFAULT_MEMBER_CHUNK_SIZE
         self.debug = False
 
         # Set args
@@ -70,6 +89,18 @@ class KanidmGroupArgs:
                 self.users = Verify(kwargs.get("users"), "users").verify_list_str()
             else:
                 raise KanidmRequiredOptionError("users is required")
+            if "state" in kwargs:
+                self.state = MemberState(
+                    Verify(kwargs.get("state"), "state").verify_default_str(
+                        MemberState.present
+                    )
+                )
+            if "chunk_size" in kwargs:
+                self.chunk_size = Verify(
+                    kwargs.get("chunk_size"), "chunk_size"
+                ).verify_default_int(DEFAULT_MEMBER_CHUNK_SIZE)
+                if self.chunk_size < 1:
+                    raise KanidmArgsException("chunk_size must be at least 1")
             if "kanidm" in kwargs:
                 self.kanidm = KanidmConf(
                     **Verify(kwargs.get("kanidm"), "kanidm").verify_dict()
@@ -94,6 +125,8 @@ class KanidmGroupArgs:
             "name",
             "parent",
             "users",
+            "state",
+            "chunk_size",
             "debug",
         ]
         args.extend(kanidm)
@@ -120,6 +153,19 @@ class KanidmGroupArgs:
                 "required": True,
                 "description": "The users in the group.",
             },
+            "state": {
+                "type": OptionType("str"),
+                "choices": [e.value for e in MemberState],
+                "default": MemberState("present"),
+                "required": False,
+                "description": "Whether the users must be members (present), must be the only members (exact), or must not be members (absent).",
+            },
+            "chunk_size": {
+                "type": OptionType("int"),
+                "default": DEFAULT_MEMBER_CHUNK_SIZE,
+                "required": False,
+                "description": "The maximum number of members added or removed in a single request.",
+            },
             "kanidm": {
                 "type": OptionType("dict"),
                 "options": kanidm,
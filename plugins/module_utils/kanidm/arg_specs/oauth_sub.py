@@ -2,7 +2,6 @@ from __future__ import absolute_import, annotations, division, print_function
 
 from dataclasses import dataclass
 import traceback
-import tempfile
 from pathlib import Path
 
 from ansible.module_utils.compat.typing import FrozenSet, Optional, List
@@ -11,6 +10,9 @@ from ...ansible_specs import (
     AnsibleArgumentSpec,
     OptionType,
 )
+from ...download import download
+from ...optimize import MAX_DIMENSION, OPTIMIZE_ERRORS, optimize_image
+from ...sniff import IMAGE_KINDS, SNIFF_SIZE, sniff
 from ...verify import Verify
 from ..exceptions import (
     KanidmArgsException,
@@ -277,6 +279,8 @@ class CustomClaim:
 class Image:
     src: str
     format: ImageFormat = ImageFormat("auto")
+    optimize: bool = False
+    max_dimension: int = MAX_DIMENSION
 
     def __init__(self, **kwargs):
         try:
@@ -290,6 +294,14 @@ class Image:
                 )
             else:
                 raise KanidmRequiredOptionError("image.format is not defined")
+            self.optimize = Verify(
+                kwargs.get("optimize"), "image.optimize"
+            ).verify_default_bool(False)
+            self.max_dimension = Verify(
+                kwargs.get("max_dimension"), "image.max_dimension"
+            ).verify_default_int(MAX_DIMENSION)
+            if self.max_dimension < 1:
+                raise KanidmArgsException("image.max_dimension must be positive")
         except TypeError as e:
             raise KanidmArgsException(str(e), e)
         except ValueError as e:
@@ -301,7 +313,7 @@ class Image:
 
     @staticmethod
     def valid_args() -> FrozenSet[str]:
-        return frozenset(["src", "format"])
+        return frozenset(["src", "format", "optimize", "max_dimension"])
 
     @staticmethod
     def arg_spec() -> AnsibleArgumentSpec:
@@ -310,7 +322,9 @@ class Image:
                 "type": OptionType("str"),
                 "required": True,
                 "aliases": ["image_src"],
-                "description": "The source URL of the image.",
+                "description": "The source URL or path of the image. Remote images are"
+                " kept under C(~/.cache/ansible-kanidm/downloads) and revalidated"
+                " with conditional requests on later runs.",
             },
             "format": {
                 "type": OptionType("str"),
@@ -319,6 +333,22 @@ class Image:
                 "required": False,
                 "description": "The format of the image. Defaults to auto.",
             },
+            "optimize": {
+                "type": OptionType("bool"),
+                "default": False,
+                "required": False,
+                "description": "Shrink the image before uploading it. SVG images are"
+                " minified. PNG, JPEG and WebP images are downscaled to max_dimension"
+                " and re-encoded as WebP when Pillow is installed, and uploaded"
+                " unchanged otherwise. Results are kept under"
+                " C(~/.cache/ansible-kanidm/optimized).",
+            },
+            "max_dimension": {
+                "type": OptionType("int"),
+                "default": MAX_DIMENSION,
+                "required": False,
+                "description": "The longest side, in pixels, of an optimized image.",
+            },
         }
 
     @staticmethod
@@ -356,105 +386,30 @@ class Image:
             or self.src.startswith("https://")
             or self.src.startswith("ftp://")
         ):
-            temp = tempfile.mkstemp(suffix=self.format.get())[1]
-            response = requests.get(self.src)
-            if response.status_code == 200:
-                with open(temp, "wb") as f:
-                    f.write(response.content)
-
-            else:
-                raise KanidmModuleError(f"Failed to download image from {self.src}")
-            self.src = temp
-            dest = Path(temp)
+            try:
+                dest = download(self.src)
+            except requests.RequestException as e:
+                raise KanidmModuleError(
+                    f"Failed to download image from {self.src}: {e}"
+                )
+            self.src = str(dest)
         else:
             dest = Path(self.src)
 
         if self.format == ImageFormat.auto:
-            header: list[bytes] = []
             with open(self.src, "rb") as f:
-                for i in range(12):
-                    header.append(f.read(1))
-
-            if header[0:8] == [
-                b"\x89",
-                b"\x50",
-                b"\x4e",
-                b"\x47",
-                b"\x0d",
-                b"\x0a",
-                b"\x1a",
-                b"\x0a",
-            ]:
-                self.format = ImageFormat.png
-
-            elif (
-                header[0:12]
-                == [
-                    b"\xff",
-                    b"\xd8",
-                    b"\xff",
-                    b"\xe0",
-                    b"\x00",
-                    b"\x10",
-                    b"\x4a",
-                    b"\x46",
-                    b"\x49",
-                    b"\x46",
-                    b"\x00",
-                    b"\x01",
-                ]
-                or header[0:4] == [b"\xff", b"\xd8", b"\xff", b"\xee"]
-                or (
-                    header[0:4] == [b"\xff", b"\xd8", b"\xff", b"\xe1"]
-                    and header[6:10]
-                    == [b"\x45", b"\x78", b"\x69", b"\x66", b"\x00", b"\x00"]
-                )
-                or header[0:4] == [b"\xff", b"\xd8", b"\xff", b"\xe0"]
-                or header[0:12]
-                == [
-                    b"\x00",
-                    b"\x00",
-                    b"\x00",
-                    b"\x0c",
-                    b"\x6a",
-                    b"\x50",
-                    b"\x20",
-                    b"\x20",
-                    b"\x0d",
-                    b"\x0a",
-                    b"\x87",
-                    b"\x0a",
-                ]
-                or header[0:4] == [b"\xff", b"\x4f", b"\xff", b"\x51"]
-            ):
-                self.format = ImageFormat.jpg
-
-            elif header[0:6] == [
-                b"\x47",
-                b"\x49",
-                b"\x46",
-                b"\x38",
-                b"\x37",
-                b"\x61",
-            ] or header[0:6] == [b"\x47", b"\x49", b"\x46", b"\x38", b"\x39", b"\x61"]:
-                self.format = ImageFormat.gif
-
-            elif header[0:4] == [b"\x52", b"\x49", b"\x46", b"\x46"] and header[
-                8:12
-            ] == [b"\x57", b"\x45", b"\x42", b"\x50"]:
-                self.format = ImageFormat.webp
-
-            else:
-                with open(self.src, "rt") as f:
-                    for line in f:
-                        if (
-                            line.startswith("<svg")
-                            or line.startswith("<?xml")
-                            or line.startswith("<!DOCTYPE svg")
-                        ):
-                            self.format = ImageFormat.svg
-                            break
+                signature = sniff(f.read(SNIFF_SIZE), IMAGE_KINDS)
+            if signature is not None:
+                self.format = ImageFormat(signature.kind)
 
         if self.format == ImageFormat.auto:
             raise KanidmException(f"Unknown image format for {src}")
+
+        if self.optimize:
+            try:
+                dest, kind = optimize_image(dest, self.format.value, self.max_dimension)
+            except OPTIMIZE_ERRORS as e:
+                raise KanidmModuleError(f"Failed to optimize image {src}: {e}")
+            self.format = ImageFormat(kind)
+            self.src = str(dest)
         return dest
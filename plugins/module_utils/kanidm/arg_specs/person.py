@@ -68,7 +68,13 @@ class KanidmPersonArgs:
                 self.display_name = Verify(
                     kwargs.get("display_name"), "display_name"
                 ).verify_opt_str()
-            if "kanidm" in kwargs:
+                # The documented default is the person's name, which Ansible
+                # passes through untemplated.
+                if self.display_name == "{{ name }}":
+                    self.display_name = self.name
+            if isinstance(kwargs.get("kanidm"), KanidmConf):
+                self.kanidm = kwargs["kanidm"]
+            elif "kanidm" in kwargs:
                 self.kanidm = KanidmConf(
                     **Verify(kwargs.get("kanidm"), "kanidm").verify_dict()
                 )
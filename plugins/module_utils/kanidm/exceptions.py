@@ -43,3 +43,13 @@ class KanidmApiError(BaseAnsibleError):
     @property
     def message(self):
         return f"Kanidm API error: {self._message}"
+
+
+class KanidmDaemonError(BaseAnsibleError):
+    @property
+    def message(self):
+        return f"Kanidm daemon error: {self._message}"
+
+
+class KanidmDaemonUnavailable(KanidmDaemonError):
+    pass
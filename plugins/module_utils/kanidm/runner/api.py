@@ -5,28 +5,53 @@ from ..arg_specs.conf import (
 )
 from ..exceptions import (
     KanidmAuthenticationFailure,
+    KanidmDaemonUnavailable,
     KanidmRequiredOptionError,
     KanidmArgsException,
+    KanidmApiError,
 )
-import json
+from .codec import dumpb, loads
+from .daemon import KanidmDaemonClient
+from .httpapi import KanidmHttpApiTransport
+from .mutation import KanidmMutation
+from .entry import KanidmEntry
+from .search import SEARCH_PATH, Filter
+from .store import HAS_SQLITE, KanidmStore
+from .stream import STREAM_CHUNK_SIZE, JsonStreamError, iter_array
+from .tokens import KanidmTokenCache, token_expired
+from .transcript import KanidmTranscript, RequestDict, ResponseDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+import hashlib
+import random
+import re
+import threading
+import time
 import traceback
 from ansible.module_utils.compat.typing import (
-    Callable,
     Optional,
     Dict,
     Any,
-    Set,
+    FrozenSet,
     List,
     Tuple,
-    TypedDict,
     Iterable,
+    Iterator,
 )
 
 REQUESTS_IMP_ERR = None
 try:
     from requests.sessions import Session
     from requests.auth import AuthBase
+    from requests.adapters import HTTPAdapter
+    from requests.exceptions import (
+        ConnectionError as RequestsConnectionError,
+        ConnectTimeout,
+        Timeout,
+    )
     from requests import Response, PreparedRequest, Request
+    from urllib3.exceptions import NewConnectionError
 
     HAS_REQUESTS = True
 except ImportError:
@@ -35,6 +60,34 @@ except ImportError:
     AuthBase = object
 
 
+## How long a successful /v1/auth/valid check is trusted within one process.
+TOKEN_VALIDATION_MEMO: timedelta = timedelta(seconds=60)
+
+## Methods which can be replayed after the server may have seen the request.
+IDEMPOTENT_METHODS: FrozenSet[str] = frozenset(
+    ["GET", "HEAD", "OPTIONS", "PUT", "DELETE"]
+)
+## Status codes that indicate a transient failure worth retrying.
+RETRY_STATUS_CODES: FrozenSet[int] = frozenset([429, 502, 503, 504])
+## Upper bound for a single backoff delay, in seconds.
+RETRY_BACKOFF_MAX: float = 30.0
+## Search answers that mean the caller may not search, or the server can't.
+SEARCH_UNAVAILABLE_CODES: FrozenSet[int] = frozenset([401, 403, 404, 405])
+## A write refused with these after the token was read from the token cache
+## is sent again after logging in.
+REFUSED_CODES: FrozenSet[int] = frozenset([401, 403])
+## Bodies longer than this are never searched for an error marker.
+ERROR_BODY_MAX: int = 1024
+## Reads under this path check the session itself, so they always go to the
+## server.
+AUTH_PATH: str = "/v1/auth"
+## Reads that may be kept in the shared entry cache. Only whole entries and
+## collection listings; secrets, tokens and credential intents never are.
+STORABLE_PATH_RE = re.compile(
+    r"^/v1/(person|group|oauth2|service_account)(/[^/_][^/]*)?$"
+)
+
+
 class BearerAuth(AuthBase):
     def __init__(self, token: str):
         self.token = token
@@ -44,140 +97,73 @@ class BearerAuth(AuthBase):
         return r
 
 
-class RequestDict(TypedDict):
-    body: Any
-    headers: Dict[str, str]
+@dataclass
+class KanidmCall:
+    name: str
     method: str
-    url: str
-
-
-def from_prep_req(req: PreparedRequest) -> RequestDict:
-    if req.body is not None:
-        try:
-            body = json.loads(req.body)
-        except Exception:
-            body = str(req.body)
-    else:
-        body = ""
-
-    if req.method is not None:
-        method = req.method
-    else:
-        method = ""
-
-    if req.url is not None:
-        url = req.url
-    else:
-        url = ""
-
-    headers = {}
-    for k, v in req.headers.items():
-        headers[k] = v
-
-    return json.loads(
-        json.dumps(
-            {
-                "body": body,
-                "headers": headers,
-                "method": method,
-                "url": url,
-            }
-        )
-    )
-
+    path: str
+    json: Optional[Any] = None
+    data: Optional[Any] = None
+    content_type: str = "application/json"
+    # Reads sent with another method, such as searches, are cached under this.
+    read_key: Optional[str] = None
 
-def basic_from_prep_req(req: PreparedRequest) -> str:
-    if req.method is not None:
-        method = req.method
-    else:
-        method = ""
-
-    if req.url is not None:
-        url = req.url
-    else:
-        url = ""
-
-    if req.body is not None:
-        try:
-            body = json.loads(req.body)
-            return f"{method} {url} {body}"
-        except Exception:
-            return f"{method} {url}"
+    @property
+    def key(self) -> Optional[str]:
+        """The cache key of a read, or None for a write."""
+        return self.path if self.method == "GET" else self.read_key
 
-    return f"{method} {url}"
 
+@dataclass
+class KanidmResult:
+    name: str
+    ok: bool
+    response: Response
+    json: Any = field(default_factory=dict)
+    text: str = ""
 
-class ResponseDict(TypedDict):
-    cookies: Dict[str, str]
-    elapsed: str
-    encoding: str
-    headers: Dict[str, str]
-    redirect: bool
-    json: Dict | List | Set | Tuple
-    reason: str
-    status_code: int
-    text: str
-    url: str
 
+def check_response(res: Response) -> Tuple[bool, Any, str]:
+    if res.status_code < 200 or res.status_code >= 300:
+        return False, {}, res.text
 
-def from_resp(res: Response) -> ResponseDict:
     try:
-        js = res.json()
+        js = loads(res.content)
     except Exception:
         js = {}
+    text = res.text
+    # Kanidm reports a missing entry as a bare JSON string. Only such short
+    # bodies are checked, entries and listings are never scanned.
+    if isinstance(js, str) and "nomatchingentries" in js:
+        return False, js, text
+    if js == {} and len(text) <= ERROR_BODY_MAX and "nomatchingentries" in text:
+        return False, js, text
+    return True, js, text
 
-    try:
-        cookies = res.cookies.get_dict()
-    except Exception:
-        cookies = {}
 
-    if res.text is not None:
-        try:
-            text = json.loads(res.text)
-        except Exception:
-            text = str(res.text)
-    else:
-        text = ""
-
-    elapsed = str(res.elapsed)
-
-    headers = {}
-    for k, v in res.headers.items():
-        headers[k] = v
-
-    return json.loads(
-        json.dumps(
-            {
-                "cookies": cookies,
-                "elapsed": elapsed,
-                "encoding": res.encoding
-                if res.encoding is not None
-                else res.apparent_encoding,
-                "headers": headers,
-                "redirect": res.is_redirect,
-                "json": js,
-                "reason": res.reason,
-                "status_code": res.status_code,
-                "text": text,
-                "url": res.url,
-            }
-        )
-    )
+def entry_path(path: str) -> str:
+    """Return the entry a request path belongs to.
 
+    ``/v1/oauth2/app/_scopemap/group`` belongs to ``/v1/oauth2/app``. Paths on a
+    collection, such as ``/v1/person`` or ``/v1/oauth2/_basic``, belong to the
+    collection, so writing to them affects every entry below it.
+    """
+    parts = path.split("?", 1)[0].strip("/").split("/")
+    if len(parts) >= 3 and not parts[2].startswith("_"):
+        return "/" + "/".join(parts[:3])
+    return "/" + "/".join(parts[:2])
 
-def basic_from_resp(res: Response) -> str:
-    return f"{res.status_code} {res.reason} {res.text}"
 
+def storable(key: str) -> bool:
+    return STORABLE_PATH_RE.match(key) is not None or key.startswith(f"{SEARCH_PATH}/")
 
-process_request = {
-    True: from_prep_req,
-    False: basic_from_prep_req,
-}
 
-process_response = {
-    True: from_resp,
-    False: basic_from_resp,
-}
+def connect_failed(e: Exception) -> bool:
+    if isinstance(e, ConnectTimeout):
+        return True
+    if not isinstance(e, RequestsConnectionError) or len(e.args) == 0:
+        return False
+    return isinstance(getattr(e.args[0], "reason", None), NewConnectionError)
 
 
 class KanidmApi(object):
@@ -188,14 +174,56 @@ class KanidmApi(object):
         self.json: Dict = {}
         self.token: str | None = None
         self.text: str = ""
-        self.process_request: Callable[[PreparedRequest], str | RequestDict] = (
-            process_request[debug]
+        self.transcript: KanidmTranscript = KanidmTranscript(
+            debug=debug,
+            max_entries=self.args.transcript_entries,
+            max_bytes=self.args.transcript_bytes,
+        )
+        self.validated_token: str | None = None
+        self.validated_at: float = 0.0
+        self.token_cache: KanidmTokenCache | None = None
+        # The token read from the token cache, until it is replaced.
+        self.cached_token: str | None = None
+        self.auth_lock: threading.Lock = threading.Lock()
+        if self.args.token_cache:
+            self.token_cache = KanidmTokenCache(self.args.token_cache_path)
+        self.adapter: HTTPAdapter = HTTPAdapter(
+            pool_connections=self.args.pool_size,
+            pool_maxsize=max(self.args.pool_size, self.args.workers),
         )
-        self.process_response: Callable[[Response], str | ResponseDict] = (
-            process_response[debug]
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.timeout: Tuple[int, int] = (
+            self.args.connect_timeout,
+            self.args.read_timeout,
         )
-        self.requests: Dict[str, RequestDict | str] = {}
-        self.responses: Dict[str, ResponseDict | str] = {}
+        self.counters: Dict[str, int] = {
+            "requests": 0,
+            "retries": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+        }
+        self.cache: Dict[Tuple[str, str], KanidmResult] = {}
+        self.store: KanidmStore | None = None
+        if self.args.entry_cache and HAS_SQLITE:
+            self.store = KanidmStore(
+                self.args.entry_cache_path,
+                ttl=self.args.entry_cache_ttl,
+                max_entries=self.args.entry_cache_entries,
+            )
+        self.lock: threading.Lock = threading.Lock()
+        self.transport: KanidmHttpApiTransport | None = None
+        if self.args.socket_path is not None:
+            self.transport = KanidmHttpApiTransport(self.args.socket_path)
+        self.daemon: KanidmDaemonClient | None = None
+        self.can_search: bool = True
+        if self.args.daemon:
+            self.daemon = KanidmDaemonClient(
+                self.args.daemon_socket,
+                idle_timeout=self.args.daemon_idle_timeout,
+                pool_size=max(self.args.pool_size, self.args.workers),
+            )
+        self.set_headers()
         self.session.verify = self.args.verify_ca
         if self.args.ca_path is not None:
             if self.args.ca_path.is_file():
@@ -220,23 +248,17 @@ class KanidmApi(object):
         )
 
     def verify_response(self) -> bool:
-        if self.response.status_code < 200 or self.response.status_code >= 300:
-            return False
+        ok, self.json, self.text = check_response(self.response)
+        return ok
 
-        try:
-            self.json = self.response.json()
-        except Exception:
-            self.json = {}
-        self.text = self.response.text
-        if "nomatchingentries" in self.text:
-            return False
-        return True
+    def apply(self, result: KanidmResult) -> bool:
+        self.response = result.response
+        self.json = result.json
+        self.text = result.text
+        return result.ok
 
     def get(self, name: str, path: str) -> bool:
-        self.set_headers()
-        req = self.session.prepare_request(Request("GET", f"{self.args.uri}{path}"))
-        self.send(name, req)
-        return self.verify_response()
+        return self.apply(self.execute(KanidmCall(name=name, method="GET", path=path)))
 
     def post(
         self,
@@ -246,15 +268,18 @@ class KanidmApi(object):
         data: Optional[Any] = None,
         content_type: str = "application/json",
     ) -> bool:
-        self.set_headers(content_type=content_type)
-        pre_req = Request("POST", f"{self.args.uri}{path}")
-        if json is not None:
-            pre_req.json = json
-        if data is not None:
-            pre_req.data = data
-        req = self.session.prepare_request(pre_req)
-        self.send(name, req)
-        return self.verify_response()
+        return self.apply(
+            self.execute(
+                KanidmCall(
+                    name=name,
+                    method="POST",
+                    path=path,
+                    json=json,
+                    data=data,
+                    content_type=content_type,
+                )
+            )
+        )
 
     def patch(
         self,
@@ -263,38 +288,390 @@ class KanidmApi(object):
         json: Optional[Iterable] = None,
         data: Optional[Any] = None,
     ) -> bool:
-        self.set_headers()
-        pre_req = Request("PATCH", f"{self.args.uri}{path}")
-        if json is not None:
-            pre_req.json = json
-        if data is not None:
-            pre_req.data = data
-        req = self.session.prepare_request(pre_req)
-        self.send(name, req)
-        return self.verify_response()
-
-    def send(self, name: str, req: PreparedRequest):
-        self.requests[name] = self.process_request(req)
-        self.response = self.session.send(req)
-        self.responses[name] = self.process_response(self.response)
+        return self.apply(
+            self.execute(
+                KanidmCall(name=name, method="PATCH", path=path, json=json, data=data)
+            )
+        )
+
+    def delete(
+        self,
+        name: str,
+        path: str,
+        json: Optional[Iterable] = None,
+    ) -> bool:
+        return self.apply(
+            self.execute(KanidmCall(name=name, method="DELETE", path=path, json=json))
+        )
+
+    def search(
+        self,
+        name: str,
+        filter: Filter,
+        attrs: Optional[Iterable[str]] = None,
+    ) -> Optional[List[KanidmEntry]]:
+        """Find all entries matching ``filter`` with one request.
+
+        Returns the matching entries reduced to ``attrs`` besides their name
+        and UUID, or None if the search endpoint can't be used, in which case
+        the caller falls back to reading entries one by one or listing their
+        collection. Searching only returns what the account may read, so an
+        empty answer is only trusted for entries of the kinds the caller
+        manages.
+        """
+        if not self.can_search:
+            return None
+        body = dumpb(filter, sort_keys=True)
+        call = KanidmCall(
+            name=name,
+            method="POST",
+            path=SEARCH_PATH,
+            json={"filter": filter},
+            read_key=f"{SEARCH_PATH}/{hashlib.sha256(body).hexdigest()[:32]}",
+        )
+        if not self.apply(self.execute(call)):
+            if self.response.status_code in SEARCH_UNAVAILABLE_CODES:
+                self.can_search = False
+                return None
+            raise KanidmApiError(f"Search {name} failed. Got {self.error}")
+        # The entries come wrapped in a SearchResponse.
+        found = self.json.get("entries") if isinstance(self.json, dict) else None
+        if not isinstance(found, list):
+            raise KanidmApiError(f"Unexpected search response: {self.text}")
+        # The endpoint has no projection, so attributes are dropped here.
+        entries = (KanidmEntry.from_json(entry, attrs) for entry in found)
+        return [entry for entry in entries if entry is not None]
+
+    def stream(self, name: str, path: str) -> Iterator[Any]:
+        """Yield the items of a JSON array read from ``path`` one at a time.
+
+        The body is decoded while it is received and never held as a whole,
+        which keeps listings of large directories cheap. Streamed reads
+        bypass the read cache and the entry store. The response is closed
+        when the iteration ends, even when it stops early.
+        """
+        call = KanidmCall(name=name, method="GET", path=path)
+        req = self.prepare(call)
+        with self.lock:
+            self.transcript.record_request(name, req)
+        res = self.transmit(req, stream=True)
+        with self.lock:
+            self.transcript.record_response(name, res, streamed=True)
+        try:
+            if res.status_code < 200 or res.status_code >= 300:
+                self.apply(
+                    KanidmResult(
+                        name=name, ok=False, response=res, json={}, text=res.text
+                    )
+                )
+                raise KanidmApiError(f"Unable to read {path}. Got {self.error}")
+            self.response = res
+            try:
+                for item in iter_array(res.iter_content(STREAM_CHUNK_SIZE)):
+                    yield item
+            except JsonStreamError as e:
+                raise KanidmApiError(f"Unexpected response for {path}: {e}") from e
+        finally:
+            res.close()
+
+    def prepare(self, call: KanidmCall) -> PreparedRequest:
+        pre_req = Request(
+            call.method,
+            f"{self.args.uri}{call.path}",
+            headers={"Content-Type": call.content_type},
+        )
+        if call.json is not None:
+            pre_req.data = dumpb(call.json)
+        if call.data is not None:
+            pre_req.data = call.data
+        return self.session.prepare_request(pre_req)
+
+    def execute(self, call: KanidmCall) -> KanidmResult:
+        cached = self.cached(call)
+        if cached is not None:
+            return cached
+        req = self.prepare(call)
+        with self.lock:
+            self.transcript.record_request(call.name, req)
+        res = self.transmit(req)
+        if (
+            res.status_code in REFUSED_CODES
+            and call.method != "GET"
+            and not call.path.startswith(AUTH_PATH)
+            and self.renew_cached_token(req)
+        ):
+            req = self.prepare(call)
+            with self.lock:
+                self.transcript.record_request(call.name, req)
+            res = self.transmit(req)
+        with self.lock:
+            self.transcript.record_response(call.name, res)
+        ok, js, text = check_response(res)
+        result = KanidmResult(name=call.name, ok=ok, response=res, json=js, text=text)
+        self.remember(call, result)
+        return result
+
+    def cacheable(self, call: KanidmCall) -> bool:
+        return (
+            call.key is not None
+            and self.args.read_cache
+            and not call.path.startswith(AUTH_PATH)
+        )
+
+    def cached(self, call: KanidmCall) -> Optional[KanidmResult]:
+        if not self.cacheable(call):
+            return None
+        with self.lock:
+            result = self.cache.get((call.method, call.key))
+            if result is None:
+                self.counters["cache_misses"] += 1
+            else:
+                self.counters["cache_hits"] += 1
+        if result is None:
+            result = self.stored(call)
+        return result
+
+    def store_key(self, path: str) -> str:
+        # Entries are only visible to the identity that read them.
+        identity = self.args.username
+        if identity is None:
+            token = self.token or self.args.token or ""
+            identity = hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+        return f"{self.args.uri}{path}|{identity}"
+
+    def stored(self, call: KanidmCall) -> Optional[KanidmResult]:
+        if self.store is None or not storable(call.key):
+            return None
+        value = self.store.get(self.store_key(call.key))
+        if value is None:
+            return None
+        res = Response()
+        res.status_code = value["status"]
+        res.reason = "OK"
+        res.url = f"{self.args.uri}{call.path}"
+        res.encoding = "utf-8"
+        res._content = value["text"].encode("utf-8")
+        ok, js, text = check_response(res)
+        result = KanidmResult(name=call.name, ok=ok, response=res, json=js, text=text)
+        with self.lock:
+            self.cache[(call.method, call.key)] = result
+        return result
+
+    def remember(self, call: KanidmCall, result: KanidmResult):
+        with self.lock:
+            if call.key is None:
+                # The write may have been applied even if it failed, so any
+                # read of the same entry has to go back to the server.
+                self.invalidate(call.path)
+            elif result.ok and self.cacheable(call):
+                self.cache[(call.method, call.key)] = result
+        if self.store is None:
+            return
+        if call.key is None:
+            self.unstore(call.path)
+        elif result.ok and storable(call.key):
+            self.store.set(
+                self.store_key(call.key),
+                {"status": result.response.status_code, "text": result.text},
+            )
+
+    def unstore(self, path: str):
+        # Changing an entry also changes the listing of its collection.
+        entry = entry_path(path)
+        collection = "/" + "/".join(entry.strip("/").split("/")[:2])
+        self.store.delete_prefix(f"{self.args.uri}{entry}|")
+        self.store.delete_prefix(f"{self.args.uri}{entry}/")
+        if collection != entry:
+            self.store.delete_prefix(f"{self.args.uri}{collection}|")
+        self.store.delete_prefix(f"{self.args.uri}{SEARCH_PATH}/")
+
+    def invalidate(self, path: str):
+        entry = entry_path(path)
+        for key in list(self.cache.keys()):
+            if key[1] == entry or key[1].startswith(f"{entry}/"):
+                del self.cache[key]
+            elif key[1].startswith(f"{SEARCH_PATH}/"):
+                # Any write can change what a search matches.
+                del self.cache[key]
+
+    def gather(
+        self, calls: List[KanidmCall], workers: Optional[int] = None
+    ) -> List[KanidmResult]:
+        if len(calls) == 0:
+            return []
+        workers = min(len(calls), workers or self.args.workers)
+        if workers <= 1:
+            results = [self.execute(call) for call in calls]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(self.execute, calls))
+        # Leave the first failure in self.response so callers can report it.
+        failed = [r for r in results if not r.ok]
+        self.apply(failed[0] if len(failed) > 0 else results[-1])
+        return results
+
+    @property
+    def requests(self) -> Dict[str, RequestDict | str]:
+        return self.transcript.requests()
+
+    @property
+    def responses(self) -> Dict[str, ResponseDict | str]:
+        return self.transcript.responses()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        connections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+        stats = {
+            "requests": self.counters["requests"],
+            "retries": self.counters["retries"],
+            "cache_hits": self.counters["cache_hits"],
+            "cache_misses": self.counters["cache_misses"],
+            "connections": connections,
+            "reused_connections": max(0, self.counters["requests"] - connections),
+            "transcript_dropped": self.transcript.dropped,
+        }
+        if self.store is not None:
+            stats["store_hits"] = self.store.counters["hits"]
+            stats["store_misses"] = self.store.counters["misses"]
+        return stats
+
+    def transmit(self, req: PreparedRequest, stream: bool = False) -> Response:
+        attempt = 0
+        while True:
+            with self.lock:
+                self.counters["requests"] += 1
+            retry_after = None
+            try:
+                res = self.send(req, stream=stream)
+            except (RequestsConnectionError, Timeout) as e:
+                if not self.can_retry(req, attempt, e):
+                    raise
+            else:
+                if (
+                    res.status_code not in RETRY_STATUS_CODES
+                    or req.method not in IDEMPOTENT_METHODS
+                    or attempt >= self.args.retries
+                ):
+                    return res
+                retry_after = res.headers.get("Retry-After")
+                res.close()
+            attempt += 1
+            with self.lock:
+                self.counters["retries"] += 1
+            time.sleep(self.backoff(attempt, retry_after))
+
+    def send(self, req: PreparedRequest, stream: bool = False) -> Response:
+        if self.transport is not None:
+            return self.transport.send(req)
+        daemon = self.daemon
+        if daemon is not None:
+            try:
+                res = daemon.send(
+                    req,
+                    verify=self.session.verify,
+                    timeout=self.timeout,
+                    replay=req.method in IDEMPOTENT_METHODS,
+                )
+            except KanidmDaemonUnavailable:
+                # Nothing reached the daemon, so the request can go out directly.
+                self.daemon = None
+            else:
+                # Like Session.send, keep the cookies, the login session needs them.
+                self.session.cookies.update(res.cookies)
+                return res
+        return self.session.send(req, timeout=self.timeout, stream=stream)
+
+    def can_retry(self, req: PreparedRequest, attempt: int, e: Exception) -> bool:
+        if attempt >= self.args.retries:
+            return False
+        # Anything that never reached the server is safe to send again, a reset
+        # or read timeout is only safe for requests that can be replayed.
+        return connect_failed(e) or req.method in IDEMPOTENT_METHODS
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        delay = min(RETRY_BACKOFF_MAX, self.args.retry_backoff * (2 ** (attempt - 1)))
+        delay = random.uniform(0, delay)
+        if retry_after is not None and retry_after.isdigit():
+            delay = max(delay, min(RETRY_BACKOFF_MAX, float(retry_after)))
+        return delay
 
     def authenticate(self):
+        if self.transport is not None:
+            # The httpapi connection logs in and keeps the token itself.
+            return
         if self.args.token is None and (
             self.args.username is None or self.args.password is None
         ):
             raise KanidmRequiredOptionError("No authentication method specified")
         if self.args.token is not None and self.check_token():
             return
-        elif (
-            self.args.username is not None and self.args.password is not None
-        ) and self.login():
+        elif self.args.username is not None and self.args.password is not None:
+            if self.load_cached_token():
+                if self.check_token():
+                    return
+                self.forget_cached_token()
+            if self.login():
+                self.store_cached_token()
+                return
+        raise KanidmAuthenticationFailure(
+            f"Authentication failed: {self.response.status_code} {self.response.reason} {self.response.text}"
+        )
+
+    def load_cached_token(self) -> bool:
+        if self.token_cache is None or self.args.username is None:
+            return False
+        token = self.token_cache.get(self.args.uri, self.args.username)
+        if token is None:
+            return False
+        # A token that can't write any more is as good as expired.
+        if token_expired(token, writable=True):
+            self.token_cache.remove(self.args.uri, self.args.username)
+            return False
+        self.token = token
+        self.cached_token = token
+        self.session.auth = BearerAuth(token)
+        return True
+
+    def store_cached_token(self):
+        if self.token_cache is None or self.args.username is None or self.token is None:
             return
-        else:
-            raise KanidmAuthenticationFailure(
-                f"Authentication failed: {self.response.status_code} {self.response.reason} {self.response.text}"
-            )
+        self.token_cache.set(self.args.uri, self.args.username, self.token)
+
+    def renew_cached_token(self, req: PreparedRequest) -> bool:
+        """Log in again after a write with a cached token was refused.
+
+        The server keeps accepting a privileged token after its write access
+        ended, so the cached token is only found out by a refused write. It is
+        dropped and replaced once per run. Returns whether ``req`` should be
+        sent again with the new token.
+        """
+        with self.auth_lock:
+            sent = req.headers.get("Authorization")
+            if self.cached_token is not None and sent == f"Bearer {self.cached_token}":
+                self.cached_token = None
+                self.forget_cached_token()
+                if not self.login():
+                    return False
+                self.store_cached_token()
+            # Another thread may have logged in again in the meantime.
+            return self.token is not None and sent != f"Bearer {self.token}"
+
+    def forget_cached_token(self):
+        self.token = None
+        self.session.auth = None
+        self.cache.clear()
+        if self.token_cache is None or self.args.username is None:
+            return
+        self.token_cache.remove(self.args.uri, self.args.username)
 
     def check_token(self) -> bool:
+        if self.transport is not None:
+            return self.get(name="check_token", path="/v1/auth/valid")
         if (
             self.args.token is None
             and not isinstance(self.session.auth, BearerAuth)
@@ -310,7 +687,27 @@ class KanidmApi(object):
         ):
             self.session.auth = BearerAuth(self.args.token)
 
-        return self.get(name="check_token", path="/v1/auth/valid")
+        token = self.session.auth.token
+        if self.token_is_fresh(token):
+            return True
+
+        if not self.get(name="check_token", path="/v1/auth/valid"):
+            return False
+
+        self.validated_token = token
+        self.validated_at = time.monotonic()
+        return True
+
+    def token_is_fresh(self, token: str) -> bool:
+        if (
+            token == self.validated_token
+            and time.monotonic() - self.validated_at
+            < TOKEN_VALIDATION_MEMO.total_seconds()
+        ):
+            return True
+        if self.args.validate_token_locally:
+            return token_expired(token) is False
+        return False
 
     def login(self) -> bool:
         if self.args.username is None or self.args.password is None:
@@ -374,9 +771,15 @@ class KanidmApi(object):
         if "success" not in self.json["state"]:
             return False
 
-        self.session.auth = BearerAuth(self.json["state"]["success"])
+        self.token = self.json["state"]["success"]
+        self.session.auth = BearerAuth(self.token)
+        # Reads made with another identity must not be reused.
+        self.cache.clear()
         return True
 
+    def mutation(self, name: str, path: str) -> KanidmMutation:
+        return KanidmMutation(self.patch, name=name, path=path)
+
     def patch_oauth(
         self, name: str, oauth_name: str, attrs: Dict[str, List[str]]
     ) -> bool:
@@ -6,6 +6,8 @@ import os
 
 ## The default location for the `kanidm` CLI tool's token cache.
 CLIENT_TOKEN_CACHE: str = "~/.cache/kanidm_tokens"
+## Where the hashes of uploaded OAuth client images are recorded.
+IMAGE_STATE_DIR: str = "~/.cache/ansible-kanidm/images"
 
 ## Content type string for jpeg
 CONTENT_TYPE_JPG: str = "image/jpeg"
@@ -298,6 +300,7 @@ ENTRYCLASS_DYN_GROUP: str = "dyngroup"
 ENTRYCLASS_EXTENSIBLE_OBJECT: str = "extensibleobject"
 ENTRYCLASS_GROUP: str = "group"
 ENTRYCLASS_MEMBER_OF: str = "memberof"
+ENTRYCLASS_OAUTH2_RESOURCE_SERVER: str = "oauth2_resource_server"
 ENTRYCLASS_OBJECT: str = "object"
 ENTRYCLASS_ORG_PERSON: str = "orgperson"
 ENTRYCLASS_PERSON: str = "person"
@@ -0,0 +1,69 @@
+from __future__ import absolute_import, annotations, division, print_function
+
+import json
+import traceback
+from ansible.module_utils.compat.typing import (
+    Any,
+    Callable,
+    Optional,
+)
+
+ORJSON_IMP_ERR = None
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    ORJSON_IMP_ERR = traceback.format_exc()
+    HAS_ORJSON = False
+
+## Raised for invalid documents by either codec, orjson's error subclasses it.
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data: str | bytes | bytearray | memoryview) -> Any:
+    """Decode a JSON document, with orjson when it is installed.
+
+    orjson reads integers wider than 64 bits as floats. Kanidm sends attribute
+    values as strings, so its documents decode the same with either codec.
+    """
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def dumpb(
+    value: Any,
+    sort_keys: bool = False,
+    default: Optional[Callable[[Any], Any]] = None,
+) -> bytes:
+    """Encode ``value`` as compact UTF-8 JSON.
+
+    orjson refuses a few values the standard library accepts, such as
+    integers wider than 64 bits or dictionaries with keys that aren't
+    strings; those are encoded with the standard library instead.
+    """
+    if HAS_ORJSON:
+        option = orjson.OPT_SORT_KEYS if sort_keys else 0
+        try:
+            return orjson.dumps(value, default=default, option=option)
+        except TypeError:
+            pass
+    return json.dumps(
+        value,
+        sort_keys=sort_keys,
+        default=default,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+
+def dumps(
+    value: Any,
+    sort_keys: bool = False,
+    default: Optional[Callable[[Any], Any]] = None,
+) -> str:
+    """Encode ``value`` as compact JSON text."""
+    return dumpb(value, sort_keys=sort_keys, default=default).decode("utf-8")
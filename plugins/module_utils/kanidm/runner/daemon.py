@@ -0,0 +1,414 @@
+from __future__ import absolute_import, annotations, division, print_function
+
+import base64
+import errno
+from http.cookiejar import DefaultCookiePolicy
+import os
+import socket
+import struct
+import threading
+import time
+import traceback
+from pathlib import Path
+from ..exceptions import (
+    KanidmDaemonError,
+    KanidmDaemonUnavailable,
+)
+from .codec import dumpb, dumps, loads
+from ansible.module_utils.compat.typing import (
+    Any,
+    Dict,
+    Optional,
+    Tuple,
+)
+
+REQUESTS_IMP_ERR = None
+try:
+    from requests.sessions import Session
+    from requests.adapters import HTTPAdapter
+    from requests.exceptions import (
+        ConnectionError as RequestsConnectionError,
+        ConnectTimeout,
+        ReadTimeout,
+        Timeout,
+    )
+    from requests.cookies import create_cookie
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers
+    from requests import Response, PreparedRequest
+
+    HAS_REQUESTS = True
+except ImportError:
+    REQUESTS_IMP_ERR = traceback.format_exc()
+    HAS_REQUESTS = False
+
+## The default socket the daemon listens on, one per user.
+DEFAULT_DAEMON_SOCKET: str = f"~/.cache/ansible-kanidm/daemon-{os.getuid()}.sock"
+## Default number of seconds the daemon stays up without any client.
+DEFAULT_DAEMON_IDLE_TIMEOUT: int = 300
+## Frames larger than this are refused, in bytes.
+MAX_FRAME_SIZE: int = 64 * 1024 * 1024
+## How long a client waits for a daemon it started to accept connections.
+DAEMON_START_TIMEOUT: float = 5.0
+
+FRAME_HEADER = struct.Struct(">I")
+
+
+def send_frame(sock: socket.socket, message: Dict[str, Any]):
+    """Send one message as a 4 byte big endian length followed by JSON."""
+    data = dumpb(message)
+    if len(data) > MAX_FRAME_SIZE:
+        raise KanidmDaemonError(f"Frame of {len(data)} bytes is too large")
+    sock.sendall(FRAME_HEADER.pack(len(data)) + data)
+
+
+def recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise EOFError("Connection closed")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def recv_frame(sock: socket.socket) -> Dict[str, Any]:
+    (size,) = FRAME_HEADER.unpack(recv_exactly(sock, FRAME_HEADER.size))
+    if size > MAX_FRAME_SIZE:
+        raise KanidmDaemonError(f"Frame of {size} bytes is too large")
+    return loads(recv_exactly(sock, size))
+
+
+def encode_body(body: Optional[str | bytes]) -> Optional[str]:
+    if body is None:
+        return None
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return base64.b64encode(body).decode("ascii")
+
+
+def decode_body(body: Optional[str]) -> Optional[bytes]:
+    if body is None:
+        return None
+    return base64.b64decode(body)
+
+
+def read_body(req: PreparedRequest) -> Optional[str | bytes]:
+    """Return the body of ``req``, reading a streamed body into memory.
+
+    Streamed bodies, such as the multipart encoder of image uploads, can only
+    be read once. The bytes replace the stream on the request, so a retry or a
+    fallback to a direct connection sends them again.
+    """
+    body = req.body
+    if body is None or isinstance(body, (bytes, str)):
+        return body
+    if hasattr(body, "read"):
+        data = body.read()
+    else:
+        data = b"".join(body)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    req.body = data
+    req.headers.pop("Transfer-Encoding", None)
+    req.headers["Content-Length"] = str(len(data))
+    return data
+
+
+def cookie_dict(cookie: Any) -> Dict[str, Any]:
+    return {
+        "name": cookie.name,
+        "value": cookie.value,
+        "domain": cookie.domain,
+        "path": cookie.path,
+        "secure": cookie.secure,
+        "expires": cookie.expires,
+    }
+
+
+class KanidmDaemon(object):
+    """Hold pooled HTTP sessions for the Kanidm modules of one user.
+
+    Clients send prepared requests over a Unix socket, the daemon sends them
+    on a long lived ``requests.Session`` per scheme, host and CA setting, so
+    TLS connections stay warm between module runs. Authentication headers are
+    part of each request, so tokens are never stored by the daemon. Cookies
+    set by the server are relayed to the client that received them and never
+    kept in the shared sessions. When no client has been connected for
+    ``idle_timeout`` seconds the daemon removes its socket and exits.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = DEFAULT_DAEMON_SOCKET,
+        idle_timeout: int = DEFAULT_DAEMON_IDLE_TIMEOUT,
+        pool_size: int = 10,
+    ):
+        self.path: Path = Path(path).expanduser()
+        self.idle_timeout: int = idle_timeout
+        self.pool_size: int = pool_size
+        self.sessions: Dict[Tuple[str, str], Session] = {}
+        self.lock: threading.Lock = threading.Lock()
+        self.clients: int = 0
+        self.last_seen: float = time.monotonic()
+
+    def session(self, url: str, verify: bool | str) -> Session:
+        origin = "/".join(url.split("/", 3)[:3])
+        key = (origin, dumps(verify))
+        with self.lock:
+            if key not in self.sessions:
+                session = Session()
+                adapter = HTTPAdapter(
+                    pool_connections=self.pool_size, pool_maxsize=self.pool_size
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.verify = verify
+                # Cookies belong to the client, each request carries its own.
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                self.sessions[key] = session
+            return self.sessions[key]
+
+    def handle(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        if message.get("op") == "ping":
+            return {"ok": True}
+        if message.get("op") != "send":
+            return {"error": "protocol", "message": f"Unknown op {message.get('op')}"}
+
+        req = PreparedRequest()
+        req.prepare(
+            method=message["method"],
+            url=message["url"],
+            headers=message["headers"],
+        )
+        req.body = decode_body(message.get("body"))
+        try:
+            res = self.session(message["url"], message["verify"]).send(
+                req, timeout=tuple(message["timeout"])
+            )
+        except ConnectTimeout as e:
+            return {"error": "connect", "message": str(e)}
+        except Timeout as e:
+            return {"error": "timeout", "message": str(e)}
+        except RequestsConnectionError as e:
+            kind = "connect" if "NewConnectionError" in repr(e) else "connection"
+            return {"error": kind, "message": str(e)}
+        return {
+            "status": res.status_code,
+            "reason": res.reason,
+            "url": res.url,
+            "headers": dict(res.headers),
+            "cookies": [cookie_dict(c) for c in res.cookies],
+            "body": encode_body(res.content),
+        }
+
+    def serve_client(self, conn: socket.socket):
+        with self.lock:
+            self.clients += 1
+        try:
+            while True:
+                try:
+                    message = recv_frame(conn)
+                except (EOFError, OSError, KanidmDaemonError, ValueError):
+                    return
+                try:
+                    reply = self.handle(message)
+                except Exception as e:
+                    reply = {"error": "daemon", "message": str(e)}
+                send_frame(conn, reply)
+        except OSError:
+            return
+        finally:
+            conn.close()
+            with self.lock:
+                self.clients -= 1
+                self.last_seen = time.monotonic()
+
+    def idle(self) -> bool:
+        with self.lock:
+            return (
+                self.clients == 0
+                and time.monotonic() - self.last_seen > self.idle_timeout
+            )
+
+    def serve(self, listener: socket.socket):
+        listener.settimeout(1.0)
+        try:
+            while not self.idle():
+                try:
+                    conn, _ = listener.accept()
+                except socket.timeout:
+                    continue
+                conn.settimeout(None)
+                with self.lock:
+                    self.last_seen = time.monotonic()
+                threading.Thread(
+                    target=self.serve_client, args=(conn,), daemon=True
+                ).start()
+        finally:
+            try:
+                self.path.unlink()
+            except OSError:
+                pass
+            listener.close()
+
+
+def bind(path: Path) -> Optional[socket.socket]:
+    """Bind the daemon socket, or return None if another daemon owns it."""
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        listener.bind(str(path))
+    except OSError as e:
+        if e.errno != errno.EADDRINUSE:
+            listener.close()
+            raise
+        # A socket left behind by a daemon that died is replaced, a live one
+        # wins the race.
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(path))
+            listener.close()
+            return None
+        except OSError:
+            path.unlink()
+            listener.bind(str(path))
+        finally:
+            probe.close()
+    os.chmod(path, 0o600)
+    listener.listen(64)
+    return listener
+
+
+def spawn_daemon(path: Path, idle_timeout: int, pool_size: int):
+    """Start a detached daemon with the usual double fork."""
+    pid = os.fork()
+    if pid > 0:
+        os.waitpid(pid, 0)
+        return
+    try:
+        os.setsid()
+        if os.fork() > 0:
+            os._exit(0)
+        os.chdir("/")
+        os.umask(0o077)
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        # Don't hold on to the module's pipes or sockets.
+        os.closerange(3, 1024)
+        listener = bind(path)
+        if listener is not None:
+            KanidmDaemon(path, idle_timeout, pool_size).serve(listener)
+    finally:
+        os._exit(0)
+
+
+class KanidmDaemonClient(object):
+    """Send prepared requests through the daemon, starting it when needed.
+
+    Every thread keeps its own connection to the daemon. A connection that
+    turns out to be closed, for example because the daemon exited after its
+    idle timeout, is replaced once. Requests are only resent when the daemon
+    can't have forwarded them, or when their method can be replayed.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = DEFAULT_DAEMON_SOCKET,
+        idle_timeout: int = DEFAULT_DAEMON_IDLE_TIMEOUT,
+        pool_size: int = 10,
+    ):
+        self.path: Path = Path(path).expanduser()
+        self.idle_timeout: int = idle_timeout
+        self.pool_size: int = pool_size
+        self.local: threading.local = threading.local()
+
+    def connect(self) -> socket.socket:
+        sock = getattr(self.local, "sock", None)
+        if sock is not None:
+            return sock
+
+        deadline = time.monotonic() + DAEMON_START_TIMEOUT
+        started = False
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(str(self.path))
+                self.local.sock = sock
+                return sock
+            except OSError as e:
+                sock.close()
+                if e.errno not in (errno.ENOENT, errno.ECONNREFUSED):
+                    raise KanidmDaemonUnavailable(f"Unable to reach the daemon: {e}")
+            if not started:
+                spawn_daemon(self.path, self.idle_timeout, self.pool_size)
+                started = True
+            if time.monotonic() > deadline:
+                raise KanidmDaemonUnavailable("The daemon didn't start in time")
+            time.sleep(0.05)
+
+    def close(self):
+        sock = getattr(self.local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self.local.sock = None
+
+    def exchange(self, message: Dict[str, Any], replay: bool) -> Dict[str, Any]:
+        for _ in range(2):
+            sock = self.connect()
+            sent = False
+            try:
+                send_frame(sock, message)
+                sent = True
+                return recv_frame(sock)
+            except (OSError, EOFError, ValueError) as e:
+                self.close()
+                # The daemon may have forwarded the request before it went
+                # away, which is only safe to repeat for replayable methods.
+                if sent and not replay:
+                    raise RequestsConnectionError(
+                        f"Lost the connection to the daemon: {e}"
+                    )
+        raise KanidmDaemonUnavailable("Unable to reach the daemon")
+
+    def send(
+        self,
+        req: PreparedRequest,
+        verify: bool | str,
+        timeout: Tuple[int, int],
+        replay: bool,
+    ) -> Response:
+        reply = self.exchange(
+            {
+                "op": "send",
+                "method": req.method,
+                "url": req.url,
+                "headers": dict(req.headers),
+                "body": encode_body(read_body(req)),
+                "verify": verify,
+                "timeout": list(timeout),
+            },
+            replay,
+        )
+        error = reply.get("error")
+        if error == "connect":
+            raise ConnectTimeout(reply.get("message", ""), request=req)
+        if error == "timeout":
+            raise ReadTimeout(reply.get("message", ""), request=req)
+        if error == "connection":
+            raise RequestsConnectionError(reply.get("message", ""), request=req)
+        if error is not None:
+            raise KanidmDaemonError(reply.get("message", error))
+
+        res = Response()
+        res.status_code = reply["status"]
+        res.reason = reply["reason"]
+        res.url = reply["url"]
+        res.headers = CaseInsensitiveDict(reply["headers"])
+        for cookie in reply.get("cookies", []):
+            res.cookies.set_cookie(create_cookie(**cookie))
+        res._content = decode_body(reply["body"]) or b""
+        res.encoding = get_encoding_from_headers(res.headers)
+        res.request = req
+        return res
@@ -0,0 +1,151 @@
+from __future__ import absolute_import, annotations, division, print_function
+
+import re
+import sys
+from collections.abc import Mapping
+from uuid import UUID
+from . import attrs as schema
+from .attrs import ATTR_CLASS, ATTR_NAME, ATTR_UUID
+from ansible.module_utils.compat.typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+## Attribute names known to the schema, mapped to the constant itself so
+## every entry shares one string object per name.
+ATTRIBUTE_NAMES: Dict[str, str] = {
+    value: value
+    for key, value in vars(schema).items()
+    if key.startswith("ATTR_") and isinstance(value, str)
+}
+## Attributes whose values repeat across most entries, their values are
+## interned too.
+INTERNED_VALUE_ATTRS = frozenset([ATTR_CLASS])
+CANONICAL_UUID_RE = re.compile(
+    r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\Z"
+)
+BOOLEANS: Dict[str, bool] = {"true": True, "false": False}
+
+# A single value is kept as is, several as a tuple. UUIDs are kept as their
+# 16 bytes.
+Packed = Union[str, bytes, Tuple[Union[str, bytes], ...]]
+
+
+def intern_attr(name: str) -> str:
+    known = ATTRIBUTE_NAMES.get(name)
+    return known if known is not None else sys.intern(name)
+
+
+def pack_values(attr: str, values: Iterable[str]) -> Tuple[str | bytes, ...]:
+    if attr == ATTR_UUID:
+        return tuple(pack_uuid(v) for v in values)
+    if attr in INTERNED_VALUE_ATTRS:
+        return tuple(sys.intern(v) for v in values)
+    return tuple(values)
+
+
+def pack_uuid(value: str) -> str | bytes:
+    # Only canonical spellings survive the round trip unchanged.
+    if CANONICAL_UUID_RE.match(value) is None:
+        return value
+    return bytes.fromhex(value.replace("-", ""))
+
+
+def unpack_value(value: str | bytes) -> str:
+    if isinstance(value, bytes):
+        return str(UUID(bytes=value))
+    return value
+
+
+class KanidmEntry(Mapping):
+    """The attributes of one Kanidm entry, stored compactly.
+
+    Behaves like the ``Dict[str, List[str]]`` of ``attrs`` in a response, but
+    attribute names are shared between entries, single values aren't wrapped
+    in a list and UUIDs take 16 bytes. Values are turned back into lists of
+    strings when they are read, and typed accessors decode them as needed.
+    """
+
+    __slots__ = ("_attrs",)
+
+    def __init__(
+        self,
+        attrs: Mapping[str, Iterable[str]],
+        keep: Optional[Iterable[str]] = None,
+    ):
+        names = None if keep is None else set(keep) | {ATTR_NAME, ATTR_UUID}
+        packed: Dict[str, Packed] = {}
+        for name, values in attrs.items():
+            if names is not None and name not in names:
+                continue
+            name = intern_attr(name)
+            if isinstance(values, str):
+                values = [values]
+            items = pack_values(name, values)
+            packed[name] = items[0] if len(items) == 1 else items
+        self._attrs: Dict[str, Packed] = packed
+
+    @classmethod
+    def from_json(
+        cls, entry: Any, keep: Optional[Iterable[str]] = None
+    ) -> Optional[KanidmEntry]:
+        """Build an entry from ``{"attrs": {...}}``, or None for anything else."""
+        if not isinstance(entry, dict):
+            return None
+        attrs = entry.get("attrs")
+        if not isinstance(attrs, dict):
+            return None
+        return cls(attrs, keep)
+
+    def __getitem__(self, attr: str) -> List[str]:
+        value = self._attrs[attr]
+        if isinstance(value, tuple):
+            return [unpack_value(v) for v in value]
+        return [unpack_value(value)]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._attrs)
+
+    def __len__(self) -> int:
+        return len(self._attrs)
+
+    def __contains__(self, attr: object) -> bool:
+        return attr in self._attrs
+
+    def __repr__(self) -> str:
+        return f"KanidmEntry({self.to_dict()!r})"
+
+    def first(self, attr: str, default: Optional[str] = None) -> Optional[str]:
+        value = self._attrs.get(attr)
+        if value is None or value == ():
+            return default
+        if isinstance(value, tuple):
+            value = value[0]
+        return unpack_value(value)
+
+    def flag(self, attr: str) -> Optional[bool]:
+        """The boolean value of ``attr``, or None when it isn't set."""
+        value = self.first(attr)
+        return None if value is None else BOOLEANS.get(value.lower())
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.first(ATTR_NAME)
+
+    @property
+    def uuid(self) -> Optional[UUID]:
+        value = self._attrs.get(ATTR_UUID)
+        if isinstance(value, tuple):
+            value = value[0] if len(value) > 0 else None
+        if isinstance(value, bytes):
+            return UUID(bytes=value)
+        return None if value is None else UUID(value)
+
+    def to_dict(self) -> Dict[str, List[str]]:
+        return {attr: self[attr] for attr in self._attrs}
@@ -2,20 +2,46 @@ from __future__ import absolute_import, annotations, division, print_function
 
 from ..arg_specs.group import (
     KanidmGroupArgs,
+    MemberState,
 )
 from ..exceptions import (
     KanidmAuthenticationFailure,
     KanidmModuleError,
     KanidmRequiredOptionError,
 )
-from .api import KanidmApi
+from .api import KanidmApi, KanidmCall
 from .attrs import ATTR_NAME, ATTR_UUID, ATTR_ENTRY_MANAGED_BY, ATTR_MEMBER
+from .entry import KanidmEntry
+from .mutation import spn_key
+from .search import any_of, eq, is_uuid
+from uuid import UUID
+from ansible.module_utils.compat.typing import (
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Tuple,
+)
+
+
+def member_key(value: str) -> str:
+    return spn_key(value).lower()
+
+
+def chunked(values: List[str], size: int) -> Iterator[List[str]]:
+    for i in range(0, len(values), size):
+        yield values[i : i + size]
 
 
 class KanidmGroup(object):
     def __init__(self, args: KanidmGroupArgs):
         self.args: KanidmGroupArgs = args
         self.api = KanidmApi(args=args.kanidm, debug=args.debug)
+        self.mutation = self.api.mutation(
+            name="update_group", path=f"/v1/group/{self.args.name}"
+        )
+        self.entry: Mapping[str, List[str]] = {}
+        self.changed: bool = False
 
     def create_group(self):
         self.api.authenticate()
@@ -30,15 +56,21 @@ class KanidmGroup(object):
                 raise KanidmModuleError(
                     f"Unable to create or get group {self.args.name}. Got {self.api.error}"
                 )
+            self.changed = True
 
-        if not self.get_group():
+            if not self.get_group():
+                raise KanidmModuleError(
+                    f"Unable to get group {self.args.name}. Got {self.api.error}"
+                )
+
+        if not self.update_group():
             raise KanidmModuleError(
-                f"Unable to get group {self.args.name}. Got {self.api.error}"
+                f"Unable to set {self.mutation.failed or 'attributes'} for group {self.args.name}. Got {self.api.error}"
             )
 
-        if not self.add_members():
+        if not self.update_members():
             raise KanidmModuleError(
-                f"Unable to add members to group {self.args.name}. Got {self.api.error}"
+                f"Unable to update members of group {self.args.name}. Got {self.api.error}"
             )
 
     def get_group(self) -> bool:
@@ -51,11 +83,14 @@ class KanidmGroup(object):
         )
 
         try:
-            self.api.text = self.api.json["attrs"][ATTR_UUID]
+            self.entry = KanidmEntry(self.api.json["attrs"])
+            self.api.text = self.entry[ATTR_UUID]
         except Exception:
+            self.entry = {}
             self.api.text = ""
             return False
 
+        self.mutation.load(self.entry)
         return True
 
     def make_group(self) -> bool:
@@ -84,14 +119,114 @@ class KanidmGroup(object):
                 },
             )
 
-    def add_members(self) -> bool:
-        if self.args.name is None:
-            raise KanidmRequiredOptionError("No name specified")
+    def update_group(self) -> bool:
+        if self.args.parent is not None:
+            self.mutation.set(ATTR_ENTRY_MANAGED_BY, [self.args.parent], key=spn_key)
+
+        if not self.mutation.flush():
+            return False
+        self.changed = self.changed or self.mutation.changed
+        return True
+
+    def member_diff(self) -> Tuple[List[str], List[str]]:
+        """Return the members to add and the members to remove.
+
+        Both sides are reduced to lower-case names, so ``alice``,
+        ``Alice@idm.example.com`` and the UUID of alice compare equal. Removals
+        use the values the server returned, additions the values given.
+        """
         if self.args.users is None:
             raise KanidmRequiredOptionError("No users specified")
 
-        return self.api.post(
-            name="add_members",
-            path=f"/v1/group/{self.args.name}/_attr/{ATTR_MEMBER}",
-            json=self.args.users,
-        )
+        current = {member_key(m): m for m in self.entry.get(ATTR_MEMBER, [])}
+        desired = self.resolve_members(self.args.users)
+
+        if self.args.state == MemberState.absent:
+            return [], [current[k] for k in desired.keys() if k in current]
+
+        add = [user for k, user in desired.items() if k not in current]
+        if self.args.state == MemberState.present:
+            return add, []
+        return add, [m for k, m in current.items() if k not in desired]
+
+    def resolve_members(self, users: List[str]) -> Dict[str, str]:
+        members: Dict[str, str] = {}
+        uuids: List[str] = []
+        for user in users:
+            if is_uuid(user):
+                uuids.append(user)
+            else:
+                members.setdefault(member_key(user), user)
+
+        # The member attribute holds SPNs, so UUIDs are looked up once to find
+        # the name they belong to. Members can be persons, groups or service
+        # accounts, one search covers all of them.
+        if len(uuids) > 0:
+            found = self.api.search(
+                name="resolve_members",
+                filter=any_of(eq(ATTR_UUID, u) for u in uuids),
+                attrs=[],
+            )
+            if found is not None:
+                names = {entry.uuid: entry.name for entry in found}
+                unresolved = []
+                for u in uuids:
+                    name = names.get(UUID(u))
+                    if name:
+                        members.setdefault(member_key(name), u)
+                    else:
+                        unresolved.append(u)
+                uuids = unresolved
+
+        # The search only sees entries the account may read, so members it
+        # didn't return, or all of them without search, are read from every
+        # collection in turn.
+        for kind in ("person", "group", "service_account"):
+            if len(uuids) == 0:
+                break
+            results = self.api.gather(
+                [
+                    KanidmCall(
+                        name=f"resolve_member[{u}]",
+                        method="GET",
+                        path=f"/v1/{kind}/{u}",
+                    )
+                    for u in uuids
+                ]
+            )
+            unresolved = []
+            for u, result in zip(uuids, results):
+                try:
+                    members.setdefault(
+                        member_key(result.json["attrs"][ATTR_NAME][0]), u
+                    )
+                except Exception:
+                    unresolved.append(u)
+            uuids = unresolved
+
+        if len(uuids) > 0:
+            raise KanidmModuleError(
+                f"Unable to find members {', '.join(uuids)} of group {self.args.name}"
+            )
+        return members
+
+    def update_members(self) -> bool:
+        if self.args.name is None:
+            raise KanidmRequiredOptionError("No name specified")
+
+        add, remove = self.member_diff()
+        path = f"/v1/group/{self.args.name}/_attr/{ATTR_MEMBER}"
+
+        # Chunks go out one after another: they modify the same attribute of
+        # the same entry, so sending them together would only make them race.
+        for i, chunk in enumerate(chunked(add, self.args.chunk_size)):
+            if not self.api.post(name=f"add_members[{i}]", path=path, json=chunk):
+                return False
+            self.changed = True
+
+        for i, chunk in enumerate(chunked(remove, self.args.chunk_size)):
+            if not self.api.delete(name=f"remove_members[{i}]", path=path, json=chunk):
+                return False
+            self.changed = True
+
+        return True
@@ -0,0 +1,61 @@
+from __future__ import absolute_import, annotations, division, print_function
+
+import traceback
+from .daemon import decode_body, encode_body, read_body
+from ansible.module_utils.connection import (
+    Connection,
+    ConnectionError as AnsibleConnectionError,
+)
+
+REQUESTS_IMP_ERR = None
+try:
+    from requests.exceptions import ConnectionError as RequestsConnectionError
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers
+    from requests import Response, PreparedRequest
+
+    HAS_REQUESTS = True
+except ImportError:
+    REQUESTS_IMP_ERR = traceback.format_exc()
+    HAS_REQUESTS = False
+
+
+class KanidmHttpApiTransport(object):
+    """Send prepared requests over the persistent httpapi connection.
+
+    The ``annie444.base.kanidm`` httpapi plugin owns the HTTP connection and
+    the token, this only forwards the path, method, headers and body of each
+    request to it and turns the answer back into a ``requests.Response``, so
+    ``KanidmApi`` handles it like any other response.
+    """
+
+    def __init__(self, socket_path: str):
+        self.socket_path: str = socket_path
+        self.connection: Connection = Connection(socket_path)
+
+    def send(self, req: PreparedRequest) -> Response:
+        # The connection adds its own bearer token and host.
+        headers = {
+            k: v
+            for k, v in req.headers.items()
+            if k.lower() not in ("authorization", "host", "content-length")
+        }
+        try:
+            reply = self.connection.send_request(
+                encode_body(read_body(req)),
+                path=req.path_url,
+                method=req.method,
+                headers=headers,
+            )
+        except AnsibleConnectionError as e:
+            raise RequestsConnectionError(str(e), request=req)
+
+        res = Response()
+        res.status_code = reply["status"]
+        res.reason = reply["reason"]
+        res.url = reply["url"]
+        res.headers = CaseInsensitiveDict(reply["headers"])
+        res._content = decode_body(reply["body"]) or b""
+        res.encoding = get_encoding_from_headers(res.headers)
+        res.request = req
+        return res
@@ -0,0 +1,72 @@
+from __future__ import absolute_import, annotations, division, print_function
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from ansible.module_utils.compat.typing import Dict, Optional
+
+from .attrs import IMAGE_STATE_DIR
+from .codec import dumpb, loads
+
+## Bytes hashed at a time.
+HASH_CHUNK_SIZE: int = 64 * 1024
+
+
+def file_sha256(path: str | Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class KanidmImageState(object):
+    """What was last uploaded as the image of each OAuth client.
+
+    Every client has its own small file, named by the hash of the server URI
+    and client name, holding ``{"sha256": <hash of the uploaded file>,
+    "image": <the server's image attribute after the upload>}``. Parallel
+    forks handling different clients never touch the same file, and files are
+    replaced atomically.
+    """
+
+    def __init__(self, path: str | Path = IMAGE_STATE_DIR):
+        self.path: Path = Path(path).expanduser()
+
+    def _file(self, uri: str, name: str) -> Path:
+        key = hashlib.sha256(f"{uri}|{name}".encode("utf-8")).hexdigest()
+        return self.path / key
+
+    def get(self, uri: str, name: str) -> Dict[str, Optional[str]]:
+        try:
+            with open(self._file(uri, name), "rb") as f:
+                data = loads(f.read())
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return data
+
+    def set(self, uri: str, name: str, sha256: str, image: Optional[str]):
+        self.path.mkdir(mode=0o700, parents=True, exist_ok=True)
+        path = self._file(uri, name)
+        fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=str(self.path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(dumpb({"sha256": sha256, "image": image}))
+            os.replace(tmp, path)
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+    def unchanged(self, uri: str, name: str, sha256: str, image: Optional[str]) -> bool:
+        """Whether ``image`` on the server is still the upload of ``sha256``.
+
+        Without an image on the server there is nothing to compare, and an
+        image the server reports differently was replaced by someone else.
+        """
+        if image is None:
+            return False
+        state = self.get(uri, name)
+        return state.get("sha256") == sha256 and state.get("image") == image
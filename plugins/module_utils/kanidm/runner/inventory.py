@@ -0,0 +1,163 @@
+from __future__ import absolute_import, annotations, division, print_function
+
+from ..exceptions import KanidmAuthenticationFailure
+from .api import KanidmApi
+from .attrs import (
+    ATTR_CLASS,
+    ATTR_DISPLAYNAME,
+    ATTR_GIDNUMBER,
+    ATTR_LAST_MODIFIED_CID,
+    ATTR_MEMBEROF,
+    ATTR_NAME,
+    ATTR_SPN,
+    ATTR_UUID,
+    ENTRYCLASS_POSIX_GROUP,
+)
+from .entry import KanidmEntry
+from .mutation import spn_key
+from ansible.module_utils.compat.typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+)
+
+## Bumped whenever the layout of a snapshot changes, older snapshots are
+## rebuilt from scratch.
+SNAPSHOT_VERSION: int = 2
+
+
+## The attributes hosts and groups are derived from.
+INVENTORY_ATTRS: List[str] = [
+    ATTR_CLASS,
+    ATTR_DISPLAYNAME,
+    ATTR_GIDNUMBER,
+    ATTR_LAST_MODIFIED_CID,
+    ATTR_MEMBEROF,
+    ATTR_SPN,
+]
+
+
+def entry_cid(entry: KanidmEntry) -> str:
+    return entry.first(ATTR_LAST_MODIFIED_CID, "")
+
+
+class KanidmInventory(object):
+    """Build inventory hosts and groups from Kanidm entries.
+
+    A snapshot maps every host and group UUID to what was derived from it and
+    the ``last_modified_cid`` it was derived at. Refreshing against a previous
+    snapshot only derives entries again when their CID differs from the one
+    recorded for them; everything else is copied from the snapshot.
+
+    Kanidm filters can't select entries by CID, so every refresh lists the
+    collections in full. Listings are streamed, so only the derived values are
+    kept, not the entries.
+    """
+
+    def __init__(
+        self,
+        api: KanidmApi,
+        host_kind: str = "service_account",
+        host_group: Optional[str] = None,
+        posix_groups_only: bool = False,
+    ):
+        self.api: KanidmApi = api
+        self.host_kind: str = host_kind
+        self.host_group: Optional[str] = host_group
+        self.posix_groups_only: bool = posix_groups_only
+        self.derived: int = 0
+        self.reused: int = 0
+
+    def authenticate(self):
+        self.api.authenticate()
+        if not self.api.check_token():
+            raise KanidmAuthenticationFailure(
+                "Unable to establish an authenticated connection with the kanidm server"
+            )
+
+    def list(self, path: str) -> Iterator[KanidmEntry]:
+        # Streamed, so only the entry being derived is held in memory.
+        for item in self.api.stream(name=f"inventory_{path}", path=path):
+            entry = KanidmEntry.from_json(item, INVENTORY_ATTRS)
+            if entry is not None and len(entry) > 0:
+                yield entry
+
+    def refresh(self, previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if previous is None or previous.get("version") != SNAPSHOT_VERSION:
+            previous = {"groups": {}, "hosts": {}}
+        self.authenticate()
+
+        groups = previous["groups"]
+        if self.posix_groups_only:
+            groups = self.changed(
+                previous["groups"],
+                self.list("/v1/group"),
+                self.derive_group,
+            )
+        hosts = self.changed(
+            previous["hosts"],
+            self.list(f"/v1/{self.host_kind}"),
+            self.derive_host,
+        )
+        return {
+            "version": SNAPSHOT_VERSION,
+            "groups": groups,
+            "hosts": hosts,
+        }
+
+    def changed(
+        self,
+        previous: Dict[str, Dict[str, Any]],
+        entries: Iterable[KanidmEntry],
+        derive,
+    ) -> Dict[str, Dict[str, Any]]:
+        # Entries missing from the listing were deleted and are dropped.
+        current: Dict[str, Dict[str, Any]] = {}
+        for entry in entries:
+            uuid = entry.first(ATTR_UUID, "")
+            cid = entry_cid(entry)
+            known = previous.get(uuid)
+            if known is not None and known["cid"] == cid:
+                current[uuid] = known
+                self.reused += 1
+                continue
+            current[uuid] = derive(entry)
+            current[uuid]["cid"] = cid
+            self.derived += 1
+        return current
+
+    def derive_group(self, entry: KanidmEntry) -> Dict[str, Any]:
+        return {
+            "name": entry.first(ATTR_NAME, ""),
+            "posix": ENTRYCLASS_POSIX_GROUP in entry.get(ATTR_CLASS, []),
+        }
+
+    def derive_host(self, entry: KanidmEntry) -> Dict[str, Any]:
+        memberof = sorted({spn_key(v) for v in entry.get(ATTR_MEMBEROF, [])})
+        return {
+            "name": entry.first(ATTR_NAME, ""),
+            "memberof": memberof,
+            "vars": {
+                "kanidm_uuid": entry.first(ATTR_UUID, ""),
+                "kanidm_spn": entry.first(ATTR_SPN, ""),
+                "kanidm_displayname": entry.first(ATTR_DISPLAYNAME, ""),
+                "kanidm_gidnumber": entry.first(ATTR_GIDNUMBER),
+                "kanidm_memberof": memberof,
+            },
+        }
+
+    def inventory(self, snapshot: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Resolve a snapshot into host names with their groups and variables."""
+        posix = {g["name"] for g in snapshot["groups"].values() if g["posix"]}
+        hosts: Dict[str, Dict[str, Any]] = {}
+        for host in snapshot["hosts"].values():
+            if self.host_group is not None and self.host_group not in host["memberof"]:
+                continue
+            groups = host["memberof"]
+            if self.posix_groups_only:
+                groups = [g for g in groups if g in posix]
+            hosts[host["name"]] = {"groups": groups, "vars": host["vars"]}
+        return hosts
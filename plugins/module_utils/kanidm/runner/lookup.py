@@ -0,0 +1,188 @@
+from __future__ import absolute_import, annotations, division, print_function
+
+import traceback
+
+from ..exceptions import (
+    KanidmAuthenticationFailure,
+    KanidmModuleError,
+)
+from .api import KanidmApi, KanidmCall
+from .attrs import (
+    ATTR_MEMBER,
+    ATTR_NAME,
+    ATTR_UUID,
+    ENTRYCLASS_GROUP,
+    ENTRYCLASS_OAUTH2_RESOURCE_SERVER,
+    ENTRYCLASS_PERSON,
+)
+from .mutation import spn_key
+from .entry import KanidmEntry
+from .search import named
+from ansible.module_utils.compat.typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+)
+
+STR_ENUM_IMP_ERR = None
+try:
+    from enum import StrEnum
+
+    HAS_ENUM = True
+except ImportError:
+    try:
+        from strenum import StrEnum
+
+        HAS_ENUM = True
+    except ImportError:
+        STR_ENUM_IMP_ERR = traceback.format_exc()
+        HAS_ENUM = False
+        StrEnum = object
+
+
+class LookupKind(StrEnum):  # type: ignore
+    person = "person"
+    group = "group"
+    group_members = "group_members"
+    oauth2 = "oauth2"
+    oauth2_secret = "oauth2_secret"
+
+    def __str__(self):
+        return self.value
+
+    def __repr__(self):
+        return self.value
+
+
+## The collection each kind of lookup lists.
+LOOKUP_COLLECTIONS: Dict[LookupKind, str] = {
+    LookupKind.person: "/v1/person",
+    LookupKind.group: "/v1/group",
+    LookupKind.group_members: "/v1/group",
+    LookupKind.oauth2: "/v1/oauth2",
+    LookupKind.oauth2_secret: "/v1/oauth2",
+}
+
+## The entry class each kind of lookup searches for.
+LOOKUP_CLASSES: Dict[LookupKind, str] = {
+    LookupKind.person: ENTRYCLASS_PERSON,
+    LookupKind.group: ENTRYCLASS_GROUP,
+    LookupKind.group_members: ENTRYCLASS_GROUP,
+    LookupKind.oauth2: ENTRYCLASS_OAUTH2_RESOURCE_SERVER,
+    LookupKind.oauth2_secret: ENTRYCLASS_OAUTH2_RESOURCE_SERVER,
+}
+
+
+class KanidmLookup(object):
+    """Resolve many names of one kind with as few requests as possible.
+
+    All terms of a kind are answered from a single search for their names or
+    UUIDs, or from a listing of the collection when searching isn't
+    permitted. Client secrets have no listing, so they are read
+    concurrently, one request per client. Searches and secrets go through
+    ``KanidmApi``, so they are memoized by its read cache for the lifetime of
+    the instance and, when ``kanidm.entry_cache`` is enabled, searches are
+    shared with other processes through the entry store. Listings are
+    streamed and not cached. Secrets are never written to the store.
+    """
+
+    def __init__(self, api: KanidmApi):
+        self.api: KanidmApi = api
+        self.authenticated: bool = False
+
+    def authenticate(self):
+        if self.authenticated:
+            return
+        self.api.authenticate()
+        if not self.api.check_token():
+            raise KanidmAuthenticationFailure(
+                "Unable to establish an authenticated connection with the kanidm server"
+            )
+        self.authenticated = True
+
+    def entries(
+        self,
+        kind: LookupKind,
+        terms: List[str],
+        attribute: Optional[str] = None,
+    ) -> Dict[str, KanidmEntry]:
+        keep = None
+        if kind == LookupKind.group_members:
+            keep = [ATTR_MEMBER]
+        elif kind != LookupKind.oauth2_secret and attribute is not None:
+            keep = [attribute]
+        found = self.api.search(
+            name=f"lookup_{kind}",
+            filter=named(LOOKUP_CLASSES[kind], terms),
+            attrs=keep,
+        )
+        if found is None:
+            found = self.listing(kind, keep)
+
+        index: Dict[str, KanidmEntry] = {}
+        for entry in found:
+            for attr in (ATTR_NAME, ATTR_UUID):
+                for value in entry.get(attr, []):
+                    index[value.lower()] = entry
+        return index
+
+    def listing(
+        self, kind: LookupKind, keep: Optional[List[str]] = None
+    ) -> Iterator[KanidmEntry]:
+        path = LOOKUP_COLLECTIONS[kind]
+        for item in self.api.stream(name=f"lookup_{kind}", path=path):
+            entry = KanidmEntry.from_json(item, keep)
+            if entry is not None:
+                yield entry
+
+    def lookup(
+        self,
+        kind: LookupKind,
+        terms: List[str],
+        attribute: Optional[str] = None,
+        first: bool = False,
+    ) -> List[Any]:
+        self.authenticate()
+        index = self.entries(kind, terms, attribute)
+
+        missing = [term for term in terms if term.lower() not in index]
+        if len(missing) > 0:
+            raise KanidmModuleError(f"No {kind} named {', '.join(missing)}")
+        found = [index[term.lower()] for term in terms]
+
+        if kind == LookupKind.oauth2_secret:
+            values = self.secrets([entry.name for entry in found])
+        elif kind == LookupKind.group_members:
+            values = [
+                [spn_key(m) for m in entry.get(ATTR_MEMBER, [])] for entry in found
+            ]
+        elif attribute is not None and first:
+            values = [entry.first(attribute) for entry in found]
+        elif attribute is not None:
+            values = [entry.get(attribute, []) for entry in found]
+        else:
+            values = [entry.to_dict() for entry in found]
+        return values
+
+    def secrets(self, names: List[str]) -> List[str]:
+        # The same client may be asked for twice, read each secret only once.
+        unique = list(dict.fromkeys(names))
+        calls = [
+            KanidmCall(
+                name=f"lookup_secret[{name}]",
+                method="GET",
+                path=f"/v1/oauth2/{name}/_basic_secret",
+            )
+            for name in unique
+        ]
+        secrets: Dict[str, str] = {}
+        for name, result in zip(unique, self.api.gather(calls)):
+            if not result.ok:
+                res = result.response
+                raise KanidmModuleError(
+                    f"Unable to read the secret of {name}. Got {res.status_code} {res.reason} {res.text}"
+                )
+            secrets[name] = result.json
+        return [secrets[name] for name in names]
@@ -0,0 +1,123 @@
+from __future__ import absolute_import, annotations, division, print_function
+
+from ansible.module_utils.compat.typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+)
+
+
+def spn_key(value: str) -> str:
+    """Compare references by name, the server answers with ``name@domain``."""
+    return value.split("@", 1)[0]
+
+
+def url_key(value: str) -> str:
+    """Compare URLs without the trailing slash the server may add."""
+    return value.rstrip("/")
+
+
+def value_keys(
+    values: Iterable[str], key: Optional[Callable[[str], str]] = None
+) -> Set[str]:
+    if key is None:
+        return set(values)
+    return {key(value) for value in values}
+
+
+class KanidmMutation(object):
+    """Collects attribute changes for one entry and writes them as one PATCH.
+
+    ``patch`` is called as ``patch(name, path, json)`` and returns whether the
+    server accepted the change, which is the signature of ``KanidmApi.patch``.
+    If the merged PATCH is rejected every attribute is retried on its own, so a
+    single bad value is reported by name instead of failing the whole batch.
+
+    Once the entry's current ``attrs`` are loaded, values that already match
+    are not staged, so a converged entry is never written. ``changed`` records
+    whether any PATCH was sent.
+    """
+
+    def __init__(
+        self,
+        patch: Callable[..., bool],
+        name: str,
+        path: str,
+    ):
+        self.patch: Callable[..., bool] = patch
+        self.name: str = name
+        self.path: str = path
+        self.attrs: Dict[str, List[str]] = {}
+        self.current: Dict[str, List[str]] = {}
+        self.failed: Optional[str] = None
+        self.changed: bool = False
+
+    def __len__(self) -> int:
+        return len(self.attrs)
+
+    def load(self, attrs: Dict[str, List[str]]) -> KanidmMutation:
+        self.current = dict(attrs)
+        return self
+
+    def differs(
+        self,
+        attr: str,
+        values: Iterable[str],
+        key: Optional[Callable[[str], str]] = None,
+    ) -> bool:
+        return value_keys(self.current.get(attr, []), key) != value_keys(values, key)
+
+    def set(
+        self,
+        attr: str,
+        values: Iterable[str],
+        key: Optional[Callable[[str], str]] = None,
+    ) -> KanidmMutation:
+        values = list(values)
+        if self.differs(attr, values, key):
+            self.attrs[attr] = values
+        else:
+            self.attrs.pop(attr, None)
+        return self
+
+    def add(
+        self,
+        attr: str,
+        values: Iterable[str],
+        key: Optional[Callable[[str], str]] = None,
+    ) -> KanidmMutation:
+        # PATCH replaces the attribute, so adding keeps the current values.
+        staged = self.attrs.get(attr, list(self.current.get(attr, [])))
+        known = value_keys(staged, key)
+        for value in values:
+            if (value if key is None else key(value)) not in known:
+                staged.append(value)
+                known.add(value if key is None else key(value))
+        return self.set(attr, staged, key)
+
+    def flush(self) -> bool:
+        self.failed = None
+        if len(self.attrs) == 0:
+            return True
+
+        if self.patch(name=self.name, path=self.path, json={"attrs": self.attrs}):
+            self.current.update(self.attrs)
+            self.attrs = {}
+            self.changed = True
+            return True
+
+        for attr in list(self.attrs.keys()):
+            if not self.patch(
+                name=f"{self.name}[{attr}]",
+                path=self.path,
+                json={"attrs": {attr: self.attrs[attr]}},
+            ):
+                self.failed = attr
+                return False
+            self.current[attr] = self.attrs.pop(attr)
+            self.changed = True
+
+        return True
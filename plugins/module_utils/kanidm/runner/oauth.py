@@ -1,29 +1,43 @@
 from __future__ import absolute_import, annotations, division, print_function
 
 from ..arg_specs.oauth import KanidmOauthArgs
-from ..arg_specs.oauth_sub import PrefUsername
+from ..arg_specs.oauth_sub import ClaimJoin, PrefUsername
 from ..exceptions import (
     KanidmAuthenticationFailure,
     KanidmModuleError,
     KanidmRequiredOptionError,
     KanidmArgsException,
 )
-from .api import KanidmApi
+from .api import KanidmApi, KanidmCall
 from .attrs import (
     ATTR_DISPLAYNAME,
+    ATTR_IMAGE,
     ATTR_NAME,
     ATTR_OAUTH2_ALLOW_INSECURE_CLIENT_DISABLE_PKCE,
     ATTR_OAUTH2_ALLOW_LOCALHOST_REDIRECT,
     ATTR_OAUTH2_JWT_LEGACY_CRYPTO_ENABLE,
     ATTR_OAUTH2_PREFER_SHORT_USERNAME,
+    ATTR_OAUTH2_RS_CLAIM_MAP,
     ATTR_OAUTH2_RS_ORIGIN,
     ATTR_OAUTH2_RS_ORIGIN_LANDING,
+    ATTR_OAUTH2_RS_SCOPE_MAP,
+    ATTR_OAUTH2_RS_SUP_SCOPE_MAP,
     ATTR_OAUTH2_STRICT_REDIRECT_URI,
     ATTR_UUID,
 )
+from .entry import KanidmEntry
+from .images import KanidmImageState, file_sha256
+from .mutation import spn_key, url_key
+import re
 import traceback
 from ansible.module_utils.compat.typing import (
+    Dict,
+    Iterable,
+    List,
+    Mapping,
     Optional,
+    Set,
+    Tuple,
 )
 
 REQUESTS_TOOLS_IMP_ERR = None
@@ -35,11 +49,61 @@ except ImportError:
     REQUESTS_TOOLS_IMP_ERR = traceback.format_exc()
     HAS_REQUESTS_TOOLS = False
 
+## The separator Kanidm uses for each claim join strategy.
+CLAIM_JOIN_SEPARATORS: Dict[str, str] = {
+    ClaimJoin.array.value: ";",
+    ClaimJoin.csv.value: ",",
+    ClaimJoin.ssv.value: " ",
+}
+
+SCOPE_MAP_RE = re.compile(r"^\s*(?P<group>[^:\s]+)\s*:\s*\{(?P<scopes>.*)\}\s*$")
+QUOTED_RE = re.compile(r'"([^"]*)"')
+
+
+def parse_scope_maps(values: Iterable[str]) -> Dict[str, Set[str]]:
+    """Parse ``group@domain: {"openid", "email"}`` scope map values by group."""
+    maps: Dict[str, Set[str]] = {}
+    for value in values:
+        m = SCOPE_MAP_RE.match(value)
+        if m is None:
+            continue
+        maps[spn_key(m.group("group"))] = set(QUOTED_RE.findall(m.group("scopes")))
+    return maps
+
+
+def parse_claim_maps(
+    values: Iterable[str],
+) -> Dict[Tuple[str, str], Tuple[str, Set[str]]]:
+    """Parse ``claim:group@domain:join:"joined values"`` claim map values.
+
+    Values that don't have this shape are skipped, which makes the matching
+    claim map look missing so it is written again.
+    """
+    maps: Dict[Tuple[str, str], Tuple[str, Set[str]]] = {}
+    for value in values:
+        parts = value.split(":", 3)
+        if len(parts) != 4:
+            continue
+        claim, group, separator, joined = parts
+        joined = joined.strip()
+        if len(joined) < 2 or joined[0] != '"' or joined[-1] != '"':
+            continue
+        joined = joined[1:-1]
+        claims = set(joined.split(separator)) if separator else {joined}
+        maps[(claim, spn_key(group))] = (separator, claims)
+    return maps
+
 
 class KanidmOAuth(object):
     def __init__(self, args: KanidmOauthArgs):
         self.args: KanidmOauthArgs = args
         self.api = KanidmApi(args=args.kanidm, debug=args.debug)
+        self.mutation = self.api.mutation(
+            name="update_client", path=f"/v1/oauth2/{self.args.name}"
+        )
+        self.entry: Mapping[str, List[str]] = {}
+        self.images = KanidmImageState()
+        self.changed: bool = False
 
     def create_oauth_client(self) -> str:
         self.api.authenticate()
@@ -60,46 +124,34 @@ class KanidmOAuth(object):
                     raise KanidmModuleError(
                         f"Unable to create or get public client {self.args.name}. Got {self.api.error}"
                     )
+            self.changed = True
 
-        if not self.get_client():
-            raise KanidmModuleError(
-                f"Unable to get client {self.args.name}. Got {self.api.error}"
-            )
-
-        if not self.args.public:
-            if not self.set_pkce():
+            if not self.get_client():
                 raise KanidmModuleError(
-                    f"Unable to set PKCE for client {self.args.name}. Got {self.api.error}"
+                    f"Unable to get client {self.args.name}. Got {self.api.error}"
                 )
 
-            if not self.set_legacy_crypto():
-                raise KanidmModuleError(
-                    f"Unable to set legacy crypto for client {self.args.name}. Got {self.api.error}"
-                )
+        self.set_display_name()
+        self.set_landing_url()
+        if not self.args.public:
+            self.set_pkce()
+            self.set_legacy_crypto()
         else:
-            if not self.set_localhost_redirect():
-                raise KanidmModuleError(
-                    f"Unable to set localhost redirect policy for client {self.args.name}. Got {self.api.error}"
-                )
+            self.set_localhost_redirect()
 
-        if not self.add_redirect_urls():
-            raise KanidmModuleError(
-                f"Unable to add redirect URLs for client {self.args.name}. Got {self.api.error}"
-            )
-
-        if not self.update_scope_map():
-            raise KanidmModuleError(
-                f"Unable to update scope map for client {self.args.name}. Got {self.api.error}"
-            )
+        self.add_redirect_urls()
+        self.set_preferred_username()
+        self.set_strict_redirect()
 
-        if not self.set_preferred_username():
+        if not self.mutation.flush():
             raise KanidmModuleError(
-                f"Unable to set preferred username for client {self.args.name}. Got {self.api.error}"
+                f"Unable to set {self.mutation.failed or 'attributes'} for client {self.args.name}. Got {self.api.error}"
             )
+        self.changed = self.changed or self.mutation.changed
 
-        if not self.set_strict_redirect():
+        if not self.update_maps():
             raise KanidmModuleError(
-                f"Unable to set strict redirect for client {self.args.name}. Got {self.api.error}"
+                f"Unable to update scope and claim maps for client {self.args.name}. Got {self.api.error}"
             )
 
         if self.args.image is not None:
@@ -108,18 +160,7 @@ class KanidmOAuth(object):
                     f"Unable to add image for client {self.args.name}. Got {self.api.error}"
                 )
 
-        if self.args.sup_scopes is not None:
-            if not self.update_sup_scope_map():
-                raise KanidmModuleError(
-                    f"Unable to update supplemental scope map for client {self.args.name}. Got {self.api.error}"
-                )
-
         if self.args.custom_claims is not None:
-            if not self.update_custom_claim_map():
-                raise KanidmModuleError(
-                    f"Unable to update custom claim map for client {self.args.name}. Got {self.api.error}"
-                )
-
             if not self.update_custom_claim_join():
                 raise KanidmModuleError(
                     f"Unable to update custom claim join for client {self.args.name}. Got {self.api.error}"
@@ -148,11 +189,14 @@ class KanidmOAuth(object):
             return False
 
         try:
-            self.api.text = self.api.json["attrs"][ATTR_UUID]
+            self.entry = KanidmEntry(self.api.json["attrs"])
+            self.api.text = self.entry[ATTR_UUID]
         except Exception:
+            self.entry = {}
             self.api.text = ""
             return False
 
+        self.mutation.load(self.entry)
         return True
 
     def create_basic_client(self) -> bool:
@@ -201,7 +245,49 @@ class KanidmOAuth(object):
             },
         )
 
-    def update_scope_map(self) -> bool:
+    def update_maps(self) -> bool:
+        # Scope maps, supplemental scope maps and claim maps live on separate
+        # endpoints and don't depend on each other, so they are sent together.
+        # Maps which already match the client's entry are skipped.
+        calls = []
+        scope_maps = parse_scope_maps(self.entry.get(ATTR_OAUTH2_RS_SCOPE_MAP, []))
+        if scope_maps.get(spn_key(self.args.group)) != {
+            str(s) for s in self.args.scopes
+        }:
+            calls.append(self.scope_map_call())
+
+        if self.args.sup_scopes is not None:
+            sup_scope_maps = parse_scope_maps(
+                self.entry.get(ATTR_OAUTH2_RS_SUP_SCOPE_MAP, [])
+            )
+            calls.extend(
+                call
+                for call, sup_scope in zip(
+                    self.sup_scope_map_calls(), self.args.sup_scopes
+                )
+                if sup_scope_maps.get(spn_key(sup_scope.group))
+                != {str(s) for s in sup_scope.scopes}
+            )
+
+        if self.args.custom_claims is not None:
+            claim_maps = parse_claim_maps(self.entry.get(ATTR_OAUTH2_RS_CLAIM_MAP, []))
+            calls.extend(
+                call
+                for call, c in zip(
+                    self.custom_claim_map_calls(), self.args.custom_claims
+                )
+                if claim_maps.get((c.name, spn_key(c.group)), ("", set()))[1]
+                != {str(v) for v in c.values}
+            )
+
+        if len(calls) == 0:
+            return True
+        if not all(result.ok for result in self.api.gather(calls)):
+            return False
+        self.changed = True
+        return True
+
+    def scope_map_call(self) -> KanidmCall:
         if not self.args.group:
             raise KanidmRequiredOptionError("No group specified")
         if not self.args.name:
@@ -209,35 +295,38 @@ class KanidmOAuth(object):
         if not self.args.scopes:
             raise KanidmRequiredOptionError("No scopes specified")
 
-        return self.api.post(
+        return KanidmCall(
             name="update_scope_map",
+            method="POST",
             path=f"/v1/oauth2/{self.args.name}/_scopemap/{self.args.group}",
             json=self.args.scopes,
         )
 
-    def update_sup_scope_map(self, index: Optional[int] = None) -> bool:
+    def update_scope_map(self) -> bool:
+        return self.api.apply(self.api.execute(self.scope_map_call()))
+
+    def sup_scope_map_calls(self) -> List[KanidmCall]:
         if not self.args.sup_scopes:
             raise KanidmRequiredOptionError("No supplemental scopes specified")
         if not self.args.name:
             raise KanidmRequiredOptionError("No name specified")
 
-        if index is not None:
-            return self.api.post(
-                name=f"update_sup_scope_map[{index}]",
-                path=f"/v1/oauth2/{self.args.name}/_sup_scopemap/{self.args.sup_scopes[index].group}",
-                json=self.args.sup_scopes[index].scopes,
+        return [
+            KanidmCall(
+                name=f"update_sup_scope_map[{i}]",
+                method="POST",
+                path=f"/v1/oauth2/{self.args.name}/_sup_scopemap/{sup_scope.group}",
+                json=sup_scope.scopes,
             )
+            for i, sup_scope in enumerate(self.args.sup_scopes)
+        ]
 
-        else:
-            for i, sup_scope in enumerate(self.args.sup_scopes):
-                if not self.api.post(
-                    name=f"update_sup_scope_map[{i}]",
-                    path=f"/v1/oauth2/{self.args.name}/_sup_scopemap/{sup_scope.group}",
-                    json=sup_scope.scopes,
-                ):
-                    return False
+    def update_sup_scope_map(self, index: Optional[int] = None) -> bool:
+        calls = self.sup_scope_map_calls()
+        if index is not None:
+            calls = [calls[index]]
 
-        return self.api.verify_response()
+        return all(result.ok for result in self.api.gather(calls))
 
     def add_image(self) -> bool:
         if self.args.image is None:
@@ -245,114 +334,126 @@ class KanidmOAuth(object):
         if self.args.name is None:
             raise KanidmRequiredOptionError("No name specified")
 
-        self.args.image.get()
+        path = self.args.image.get()
+        uri = self.api.args.uri
+        sha256 = file_sha256(path)
+        if self.images.unchanged(uri, self.args.name, sha256, self.server_image()):
+            return True
+
+        with open(path, "rb") as f:
+            m = MultipartEncoder(
+                {
+                    "image": (
+                        f"{self.args.name}.{self.args.image.format.value}",
+                        FileWrapper(f),
+                        self.args.image.format.mime(),
+                    )
+                }
+            )
 
-        m = MultipartEncoder(
-            {
-                "image": (
-                    f"{self.args.name}.{self.args.image.format.value}",
-                    FileWrapper(open(self.args.image.src, "rb")),
-                    self.args.image.format.mime(),
-                )
-            }
-        )
+            if not self.api.post(
+                name="add_image",
+                path=f"/v1/oauth2/{self.args.name}/_image",
+                data=m,
+                content_type=m.content_type,
+            ):
+                return False
 
-        if not self.api.post(
-            name="add_image",
-            path=f"/v1/oauth2/{self.args.name}/_image",
-            data=m,
-            content_type=m.content_type,
-        ):
-            return False
+        self.changed = True
+        # Record how the server reports the new image, so a later change made
+        # elsewhere is noticed.
+        image = self.server_image() if self.get_client() else None
+        self.images.set(uri, self.args.name, sha256, image)
+        return True
+
+    def server_image(self) -> Optional[str]:
+        images = self.entry.get(ATTR_IMAGE, [])
+        return images[0] if images else None
 
+    def set_display_name(self) -> bool:
+        if self.args.display_name is None:
+            return True
+
+        self.mutation.set(ATTR_DISPLAYNAME, [self.args.display_name])
+        return True
+
+    def set_landing_url(self) -> bool:
+        if self.args.url is None:
+            raise KanidmRequiredOptionError("No url specified")
+
+        self.mutation.set(ATTR_OAUTH2_RS_ORIGIN_LANDING, [self.args.url], key=url_key)
         return True
 
     def set_pkce(self) -> bool:
         if self.args.pkce is None:
             raise KanidmRequiredOptionError("No PKCE specified")
 
-        return self.api.patch_oauth(
-            name="set_pkce",
-            oauth_name=self.args.name,
-            attrs={
-                ATTR_OAUTH2_ALLOW_INSECURE_CLIENT_DISABLE_PKCE: [
-                    str(self.args.pkce).lower()
-                ],
-            },
+        self.mutation.set(
+            ATTR_OAUTH2_ALLOW_INSECURE_CLIENT_DISABLE_PKCE,
+            [str(self.args.pkce).lower()],
         )
+        return True
 
     def set_legacy_crypto(self) -> bool:
         if self.args.legacy_crypto is None:
             raise KanidmRequiredOptionError("No legacy crypto specified")
 
-        return self.api.patch_oauth(
-            name="set_legacy_crypto",
-            oauth_name=self.args.name,
-            attrs={
-                ATTR_OAUTH2_JWT_LEGACY_CRYPTO_ENABLE: [
-                    str(self.args.legacy_crypto).lower()
-                ],
-            },
+        self.mutation.set(
+            ATTR_OAUTH2_JWT_LEGACY_CRYPTO_ENABLE,
+            [str(self.args.legacy_crypto).lower()],
         )
+        return True
 
     def set_preferred_username(self) -> bool:
         if self.args.username is None:
             raise KanidmRequiredOptionError("No username specified")
 
-        return self.api.patch_oauth(
-            name="set_preferred_username",
-            oauth_name=self.args.name,
-            attrs={
-                ATTR_OAUTH2_PREFER_SHORT_USERNAME: [
-                    str(self.args.username == PrefUsername.short).lower()
-                ],
-            },
+        self.mutation.set(
+            ATTR_OAUTH2_PREFER_SHORT_USERNAME,
+            [str(self.args.username == PrefUsername.short).lower()],
         )
+        return True
 
     def set_localhost_redirect(self) -> bool:
         if self.args.local_redirect is None:
             raise KanidmRequiredOptionError("No localhost redirect specified")
 
-        return self.api.patch_oauth(
-            name="set_localhost_redirect",
-            oauth_name=self.args.name,
-            attrs={
-                ATTR_OAUTH2_ALLOW_LOCALHOST_REDIRECT: [
-                    str(self.args.local_redirect).lower()
-                ]
-            },
+        self.mutation.set(
+            ATTR_OAUTH2_ALLOW_LOCALHOST_REDIRECT,
+            [str(self.args.local_redirect).lower()],
         )
+        return True
 
     def set_strict_redirect(self) -> bool:
         if self.args.strict_redirect is None:
             raise KanidmRequiredOptionError("No strict redirect specified")
 
-        return self.api.patch_oauth(
-            name="set_strict_redirect",
-            oauth_name=self.args.name,
-            attrs={
-                ATTR_OAUTH2_STRICT_REDIRECT_URI: [
-                    str(self.args.strict_redirect).lower()
-                ],
-            },
+        self.mutation.set(
+            ATTR_OAUTH2_STRICT_REDIRECT_URI,
+            [str(self.args.strict_redirect).lower()],
         )
+        return True
 
-    def update_custom_claim_map(self) -> bool:
+    def custom_claim_map_calls(self) -> List[KanidmCall]:
         if self.args.name is None:
             raise KanidmRequiredOptionError("No name specified")
         if self.args.custom_claims is None:
             raise KanidmRequiredOptionError("No claims specified")
-        if self.args.group is None:
-            raise KanidmRequiredOptionError("No group specified")
 
-        for i, c in enumerate(self.args.custom_claims):
-            if not self.api.post(
+        return [
+            KanidmCall(
                 name=f"update_custom_claim_map[{i}]",
-                path=f"/v1/oauth2/{self.args.name}/_claimmap/{self.args.name}/{self.args.group}",
+                method="POST",
+                path=f"/v1/oauth2/{self.args.name}/_claimmap/{c.name}/{c.group}",
                 json=[str(v) for v in c.values],
-            ):
-                return False
-        return True
+            )
+            for i, c in enumerate(self.args.custom_claims)
+        ]
+
+    def update_custom_claim_map(self) -> bool:
+        return all(
+            result.ok for result in self.api.gather(self.custom_claim_map_calls())
+        )
 
     def update_custom_claim_join(self) -> bool:
         if self.args.name is None:
@@ -362,14 +463,31 @@ class KanidmOAuth(object):
         if self.args.custom_claims is None:
             raise KanidmRequiredOptionError("No claims specified")
 
-        for i, c in enumerate(self.args.custom_claims):
-            if not self.api.post(
-                name=f"update_custom_claim_join[{i}]",
-                path=f"/v1/oauth2/{self.args.name}/_claimmap/{self.args.claim_join}",
+        separator = CLAIM_JOIN_SEPARATORS[str(self.args.claim_join)]
+        claim_maps = parse_claim_maps(self.entry.get(ATTR_OAUTH2_RS_CLAIM_MAP, []))
+        joins: Dict[str, Set[str]] = {}
+        for (claim, _), (current, _) in claim_maps.items():
+            joins.setdefault(claim, set()).add(current)
+        claims = [
+            claim
+            for claim in dict.fromkeys(c.name for c in self.args.custom_claims)
+            if joins.get(claim) != {separator}
+        ]
+        if len(claims) == 0:
+            return True
+
+        calls = [
+            KanidmCall(
+                name=f"update_custom_claim_join[{claim}]",
+                method="POST",
+                path=f"/v1/oauth2/{self.args.name}/_claimmap/{claim}",
                 json=self.args.claim_join,
-            ):
-                return False
-
+            )
+            for claim in claims
+        ]
+        if not all(result.ok for result in self.api.gather(calls)):
+            return False
+        self.changed = True
         return True
 
     def add_redirect_urls(self) -> bool:
@@ -378,13 +496,7 @@ class KanidmOAuth(object):
         if self.args.redirect_url is None:
             raise KanidmRequiredOptionError("No redirect URL specified")
 
-        for url in self.args.redirect_url:
-            if not self.api.patch_oauth(
-                name=f"add_redirect_url[{url}]",
-                oauth_name=self.args.name,
-                attrs={ATTR_OAUTH2_RS_ORIGIN: [url]},
-            ):
-                return False
+        self.mutation.set(ATTR_OAUTH2_RS_ORIGIN, self.args.redirect_url, key=url_key)
         return True
 
     def get_client_secret(self) -> bool:
@@ -8,15 +8,30 @@ from ..exceptions import (
     KanidmModuleError,
     KanidmRequiredOptionError,
 )
-from .api import KanidmApi
+from .api import KanidmApi, KanidmCall
 from .attrs import ATTR_NAME, ATTR_UUID, ATTR_DISPLAYNAME
+from .entry import KanidmEntry
 from urllib.parse import urlencode
+from ansible.module_utils.compat.typing import (
+    Any,
+    List,
+    Mapping,
+    Optional,
+)
 
 
 class KanidmPerson(object):
-    def __init__(self, args: KanidmPersonArgs):
+    def __init__(self, args: KanidmPersonArgs, api: Optional[KanidmApi] = None):
         self.args: KanidmPersonArgs = args
-        self.api = KanidmApi(args=args.kanidm, debug=args.debug)
+        # Bulk runners share one authenticated API between many persons.
+        self.api = (
+            api if api is not None else KanidmApi(args=args.kanidm, debug=args.debug)
+        )
+        self.mutation = self.api.mutation(
+            name="update_person", path=f"/v1/person/{self.args.name}"
+        )
+        self.entry: Mapping[str, List[str]] = {}
+        self.changed: bool = False
 
     def create_person(self) -> str:
         self.api.authenticate()
@@ -31,10 +46,16 @@ class KanidmPerson(object):
                 raise KanidmModuleError(
                     f"Unable to create or get person {self.args.name}. Got {self.api.error}"
                 )
+            self.changed = True
 
-        if not self.get_person():
+            if not self.get_person():
+                raise KanidmModuleError(
+                    f"Unable to get person {self.args.name}. Got {self.api.error}"
+                )
+
+        if not self.update_person():
             raise KanidmModuleError(
-                f"Unable to get person {self.args.name}. Got {self.api.error}"
+                f"Unable to set {self.mutation.failed or 'attributes'} for person {self.args.name}. Got {self.api.error}"
             )
 
         if not self.credential_update_url():
@@ -53,46 +74,69 @@ class KanidmPerson(object):
             path=f"/v1/person/{self.args.name}",
         )
 
-        try:
-            self.api.text = self.api.json["attrs"][ATTR_UUID]
-        except Exception:
+        if not self.load(KanidmEntry.from_json(self.api.json)):
             self.api.text = ""
             return False
 
+        self.api.text = self.entry[ATTR_UUID]
         return True
 
-    def make_person(self) -> bool:
+    def load(self, entry: Optional[KanidmEntry]) -> bool:
+        if entry is None or ATTR_UUID not in entry:
+            self.entry = {}
+            return False
+
+        self.entry = entry
+        self.mutation.load(self.entry)
+        return True
+
+    def make_person_call(self, name: str = "make_person") -> KanidmCall:
         if self.args.name is None:
             raise KanidmRequiredOptionError("No name specified")
 
-        if self.args.display_name is None:
-            return self.api.post(
-                name="make_person",
-                path="/v1/person",
-                json={
-                    "attrs": {
-                        ATTR_NAME: [self.args.name],
-                    }
-                },
-            )
-        else:
-            return self.api.post(
-                name="make_person",
-                path="/v1/person",
-                json={
-                    "attrs": {
-                        ATTR_NAME: [self.args.name],
-                        ATTR_DISPLAYNAME: [self.args.display_name],
-                    }
-                },
-            )
+        attrs = {ATTR_NAME: [self.args.name]}
+        if self.args.display_name is not None:
+            attrs[ATTR_DISPLAYNAME] = [self.args.display_name]
+
+        return KanidmCall(
+            name=name,
+            method="POST",
+            path="/v1/person",
+            json={"attrs": attrs},
+        )
+
+    def make_person(self) -> bool:
+        return self.api.apply(self.api.execute(self.make_person_call()))
+
+    def stage_update(self) -> int:
+        if self.args.display_name is not None:
+            self.mutation.set(ATTR_DISPLAYNAME, [self.args.display_name])
+
+        return len(self.mutation)
+
+    def update_person(self) -> bool:
+        self.stage_update()
+
+        if not self.mutation.flush():
+            return False
+        self.changed = self.changed or self.mutation.changed
+        return True
+
+    def credential_update_call(
+        self, name: str = "credential_update_url[update_intent]"
+    ) -> KanidmCall:
+        return KanidmCall(
+            name=name,
+            method="GET",
+            path=f"/v1/person/{self.args.name}/_credential/_update_intent/{self.args.ttl}",
+        )
+
+    def reset_url(self, intent: Any) -> str:
+        return f"{self.api.args.uri}/ui/reset?{urlencode({'token': intent['token']})}"
 
     def credential_update_url(self):
-        if not self.api.get(
-            "credential_update_url[update_intent]",
-            f"/v1/person/{self.args.name}/_credential/_update_intent/{self.args.ttl}",
-        ):
+        if not self.api.apply(self.api.execute(self.credential_update_call())):
             return False
 
-        self.api.text = f"{self.api.args.uri}/ui/reset?{urlencode({'token': self.api.json['token']})}"
+        self.api.text = self.reset_url(self.api.json)
         return True
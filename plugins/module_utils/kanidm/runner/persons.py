@@ -0,0 +1,170 @@
+from __future__ import absolute_import, annotations, division, print_function
+
+from ..arg_specs.persons import (
+    KanidmPersonsArgs,
+    ResetUrls,
+)
+from ..exceptions import (
+    KanidmAuthenticationFailure,
+    KanidmModuleError,
+)
+from .api import KanidmApi, KanidmCall, KanidmResult
+from .attrs import ATTR_UUID, ENTRYCLASS_PERSON
+from .entry import KanidmEntry
+from .person import KanidmPerson
+from .search import named
+from ansible.module_utils.compat.typing import (
+    Any,
+    Dict,
+    List,
+)
+
+
+class KanidmPersons(object):
+    """Create or update many persons with one authenticated session.
+
+    Existing persons are found with a single search for their names, or a
+    listing of ``/v1/person`` when searching isn't permitted. Missing
+    persons are created, changed display names are patched and credential
+    reset URLs are requested concurrently through ``KanidmApi.gather``. One
+    person failing doesn't stop the others; every outcome is recorded in
+    ``results`` in the order the persons were given.
+    """
+
+    def __init__(self, args: KanidmPersonsArgs):
+        self.args: KanidmPersonsArgs = args
+        self.api = KanidmApi(args=args.kanidm, debug=args.debug)
+        self.persons: Dict[str, KanidmPerson] = {
+            person.name: KanidmPerson(person, api=self.api) for person in args.persons
+        }
+        self.results: Dict[str, Dict[str, Any]] = {
+            name: {
+                "name": name,
+                "uuid": "",
+                "created": False,
+                "changed": False,
+                "failed": False,
+                "msg": "",
+                "reset_url": "",
+            }
+            for name in self.persons.keys()
+        }
+
+    @property
+    def changed(self) -> bool:
+        return any(r["changed"] for r in self.results.values())
+
+    @property
+    def failed(self) -> List[str]:
+        return [name for name, r in self.results.items() if r["failed"]]
+
+    def create_persons(self) -> List[Dict[str, Any]]:
+        self.api.authenticate()
+
+        if not self.api.check_token():
+            raise KanidmAuthenticationFailure(
+                "Unable to establish an authenticated connection with the kanidm server"
+            )
+
+        if not self.get_persons():
+            raise KanidmModuleError(f"Unable to list persons. Got {self.api.error}")
+
+        created = self.make_persons()
+        if len(created) > 0 and not self.get_persons():
+            raise KanidmModuleError(f"Unable to list persons. Got {self.api.error}")
+
+        self.update_persons()
+        self.credential_update_urls(created)
+
+        for name, person in self.persons.items():
+            if len(person.entry) > 0:
+                self.results[name]["uuid"] = person.entry[ATTR_UUID][0]
+
+        return list(self.results.values())
+
+    def get_persons(self) -> bool:
+        entries = self.api.search(
+            name="get_persons", filter=named(ENTRYCLASS_PERSON, self.persons.keys())
+        )
+        if entries is None:
+            # Fall back to listing every person, keeping only the ones asked for.
+            entries = (
+                KanidmEntry.from_json(item)
+                for item in self.api.stream(name="get_persons", path="/v1/person")
+            )
+
+        for entry in entries:
+            name = entry.name if entry is not None else None
+            if name in self.persons:
+                self.persons[name].load(entry)
+        return True
+
+    def make_persons(self) -> List[str]:
+        names = [name for name, p in self.persons.items() if len(p.entry) == 0]
+        calls = [
+            self.persons[name].make_person_call(name=f"make_person[{name}]")
+            for name in names
+        ]
+        created = []
+        for name, result in zip(names, self.api.gather(calls)):
+            if self.record(name, result, "Unable to create person"):
+                self.results[name]["created"] = True
+                self.results[name]["changed"] = True
+                created.append(name)
+        return created
+
+    def update_persons(self):
+        names = []
+        calls: List[KanidmCall] = []
+        for name, person in self.persons.items():
+            if len(person.entry) == 0 or self.results[name]["failed"]:
+                continue
+            if person.stage_update() == 0:
+                continue
+            names.append(name)
+            calls.append(
+                KanidmCall(
+                    name=f"update_person[{name}]",
+                    method="PATCH",
+                    path=person.mutation.path,
+                    json={"attrs": person.mutation.attrs},
+                )
+            )
+
+        for name, result in zip(names, self.api.gather(calls)):
+            if self.record(name, result, "Unable to update person"):
+                self.results[name]["changed"] = True
+
+    def credential_update_urls(self, created: List[str]):
+        if self.args.reset_urls == ResetUrls.none:
+            return
+
+        names = [
+            name
+            for name, person in self.persons.items()
+            if len(person.entry) > 0
+            and not self.results[name]["failed"]
+            and (self.args.reset_urls == ResetUrls.all or name in set(created))
+        ]
+        calls = [
+            self.persons[name].credential_update_call(
+                name=f"credential_update_url[{name}]"
+            )
+            for name in names
+        ]
+        for name, result in zip(names, self.api.gather(calls)):
+            if self.record(name, result, "Unable to get credential update URL"):
+                self.results[name]["reset_url"] = self.persons[name].reset_url(
+                    result.json
+                )
+
+    def record(self, name: str, result: KanidmResult, message: str) -> bool:
+        if result.ok:
+            return True
+
+        res = result.response
+        self.results[name]["failed"] = True
+        self.results[name][
+            "msg"
+        ] = f"{message} {name}. Got {res.status_code} {res.reason} {res.text}"
+        return False
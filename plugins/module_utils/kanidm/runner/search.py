@@ -0,0 +1,44 @@
+from __future__ import absolute_import, annotations, division, print_function
+
+from .attrs import ATTR_CLASS, ATTR_NAME, ATTR_UUID
+from uuid import UUID
+from ansible.module_utils.compat.typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+)
+
+## The filter based search endpoint.
+SEARCH_PATH: str = "/v1/raw/search"
+
+Filter = Dict[str, Any]
+
+
+def eq(attr: str, value: str) -> Filter:
+    return {"eq": [attr, value]}
+
+
+def any_of(filters: Iterable[Filter]) -> Filter:
+    return {"or": list(filters)}
+
+
+def all_of(filters: Iterable[Filter]) -> Filter:
+    return {"and": list(filters)}
+
+
+def is_uuid(value: str) -> bool:
+    try:
+        UUID(value)
+    except ValueError:
+        return False
+    return True
+
+
+def named(entry_class: str, names: Iterable[str]) -> Filter:
+    """Entries of ``entry_class`` whose name or UUID is one of ``names``."""
+    terms: List[Filter] = []
+    for name in names:
+        # The server rejects a filter comparing the UUID with anything else.
+        terms.append(eq(ATTR_UUID, name) if is_uuid(name) else eq(ATTR_NAME, name))
+    return all_of([eq(ATTR_CLASS, entry_class), any_of(terms)])
@@ -0,0 +1,253 @@
+from __future__ import absolute_import, annotations, division, print_function
+
+from .codec import dumps, loads
+from contextlib import contextmanager
+from pathlib import Path
+import atexit
+import json
+import os
+import threading
+import time
+import traceback
+from ansible.module_utils.compat.typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Type,
+)
+
+SQLITE_IMP_ERR = None
+try:
+    import sqlite3
+
+    HAS_SQLITE = True
+except ImportError:
+    SQLITE_IMP_ERR = traceback.format_exc()
+    HAS_SQLITE = False
+
+## The default location of the shared entry cache.
+DEFAULT_STORE_PATH: str = "~/.cache/ansible-kanidm/entries.sqlite"
+## Default lifetime of a cached value in seconds.
+DEFAULT_STORE_TTL: int = 300
+## Expiry of values stored without a timeout, after every other value.
+NEVER_EXPIRES: float = float("inf")
+## Default number of values kept before the least recently used are evicted.
+DEFAULT_STORE_ENTRIES: int = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+COUNTERS = ("hits", "misses", "expired", "evictions")
+
+
+class KanidmStore(object):
+    """SQLite store for Kanidm entries shared between processes.
+
+    Every value has its own expiry. When more than ``max_entries`` values are
+    stored the least recently read ones are evicted. Each write is a single
+    SQLite transaction, so readers in other forks never see a partial value.
+    Reads never take the write lock: read times and the hit, miss, expiry and
+    eviction counters are kept in memory and added to the database with the
+    next write, or when the store is closed. One instance may be shared by the
+    worker threads of a ``KanidmApi``. A ``ttl`` of zero keeps values until
+    they are evicted, like ``fact_caching_timeout`` does for Ansible.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = DEFAULT_STORE_PATH,
+        ttl: int = DEFAULT_STORE_TTL,
+        max_entries: int = DEFAULT_STORE_ENTRIES,
+        encoder: Optional[Type[json.JSONEncoder]] = None,
+        decoder: Optional[Type[json.JSONDecoder]] = None,
+    ):
+        self.path: Path = Path(path).expanduser()
+        self.ttl: int = ttl
+        self.max_entries: int = max(1, max_entries)
+        self.encoder: Optional[Type[json.JSONEncoder]] = encoder
+        self.decoder: Optional[Type[json.JSONDecoder]] = decoder
+        self.counters: Dict[str, int] = {name: 0 for name in COUNTERS}
+        self.pending: Dict[str, int] = {name: 0 for name in COUNTERS}
+        self.accessed: Dict[str, float] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self.lock: threading.RLock = threading.RLock()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            os.close(fd)
+            db = sqlite3.connect(
+                str(self.path),
+                timeout=30,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(SCHEMA)
+            self._db = db
+            atexit.register(self.close)
+        return self._db
+
+    def close(self):
+        with self.lock:
+            if self._db is None:
+                return
+            if self.accessed or any(self.pending.values()):
+                with self.transaction() as db:
+                    self.write_pending(db)
+            self._db.close()
+            self._db = None
+        atexit.unregister(self.close)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        with self.lock:
+            db = self.db
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def count(self, name: str, amount: int = 1):
+        with self.lock:
+            self.counters[name] += amount
+            self.pending[name] += amount
+
+    def write_pending(self, db: sqlite3.Connection):
+        """Add the read times and counters kept in memory to the database."""
+        db.executemany(
+            "UPDATE entries SET accessed = ? WHERE key = ? AND accessed < ?",
+            [(when, key, when) for key, when in self.accessed.items()],
+        )
+        self.accessed.clear()
+        for name, amount in self.pending.items():
+            if not amount:
+                continue
+            db.execute(
+                "INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)", (name,)
+            )
+            db.execute(
+                "UPDATE counters SET value = value + ? WHERE name = ?", (amount, name)
+            )
+            self.pending[name] = 0
+
+    def get(self, key: str, default: Any = None) -> Optional[Any]:
+        """The value stored at ``key``, or ``default`` when there is none.
+
+        Pass a sentinel as ``default`` to tell a stored ``None`` from a miss.
+        """
+        now = time.time()
+        with self.lock:
+            row = self.db.execute(
+                "SELECT value, expires FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.count("misses")
+                return default
+            if row[1] <= now:
+                # Expired values are left for the next write to remove.
+                self.count("expired")
+                self.count("misses")
+                return default
+            self.accessed[key] = now
+            self.count("hits")
+        if self.decoder is not None:
+            return json.loads(row[0], cls=self.decoder)
+        return loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        expires = now + ttl if ttl > 0 else NEVER_EXPIRES
+        if self.encoder is not None:
+            data = json.dumps(value, cls=self.encoder, sort_keys=True)
+        else:
+            data = dumps(value, sort_keys=True)
+        with self.transaction() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                (key, data, expires, now),
+            )
+            self.accessed.pop(key, None)
+            self.write_pending(db)
+            self.evict(db, now)
+            self.write_pending(db)
+
+    def evict(self, db: sqlite3.Connection, now: float):
+        db.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        (size,) = db.execute("SELECT COUNT(*) FROM entries").fetchone()
+        if size <= self.max_entries:
+            return
+        db.execute(
+            "DELETE FROM entries WHERE key IN "
+            "(SELECT key FROM entries ORDER BY accessed ASC LIMIT ?)",
+            (size - self.max_entries,),
+        )
+        self.count("evictions", size - self.max_entries)
+
+    def contains(self, key: str) -> bool:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT 1 FROM entries WHERE key = ? AND expires > ?",
+                (key, time.time()),
+            ).fetchone()
+        return row is not None
+
+    def keys(self) -> List[str]:
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT key FROM entries WHERE expires > ? ORDER BY key",
+                (time.time(),),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, key: str):
+        with self.transaction() as db:
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def delete_prefix(self, prefix: str):
+        # Escape the LIKE wildcards so a path can be used as a prefix verbatim.
+        pattern = (
+            prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        )
+        with self.transaction() as db:
+            db.execute("DELETE FROM entries WHERE key LIKE ? ESCAPE '\\'", (pattern,))
+
+    def flush(self):
+        with self.transaction() as db:
+            db.execute("DELETE FROM entries")
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            totals = dict(
+                self.db.execute("SELECT name, value FROM counters").fetchall()
+            )
+            (size,) = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()
+            return {
+                "entries": size,
+                "session": dict(self.counters),
+                "total": {
+                    name: totals.get(name, 0) + self.pending[name] for name in COUNTERS
+                },
+            }
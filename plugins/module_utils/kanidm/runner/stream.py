@@ -0,0 +1,102 @@
+from __future__ import absolute_import, annotations, division, print_function
+
+import codecs
+import json
+from ansible.module_utils.compat.typing import (
+    Any,
+    Iterable,
+    Iterator,
+)
+
+## Bytes read from a streamed response at a time.
+STREAM_CHUNK_SIZE: int = 64 * 1024
+
+WHITESPACE = " \t\n\r"
+NUMBER = "0123456789+-.eE"
+
+
+class JsonStreamError(ValueError):
+    pass
+
+
+def iter_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Yield the items of a JSON array as they arrive.
+
+    ``chunks`` is the UTF-8 encoded body in pieces of any size, for example
+    ``Response.iter_content``. Only the item being decoded is buffered, so
+    memory use depends on the largest item rather than on the whole array.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    source = iter(chunks)
+    buf = ""
+    pos = 0
+    eof = False
+    # 0: before "[", 1: before an item or "]", 2: before "," or "]",
+    # 3: done, 4: before an item
+    state = 0
+
+    def fill(size: int) -> str:
+        # Drop what was consumed and read until ``size`` characters are
+        # pending, so an item spanning many chunks is decoded a few times
+        # rather than once per chunk.
+        nonlocal eof
+        pending = [buf[pos:]]
+        length = len(pending[0])
+        while length < size and not eof:
+            try:
+                text = utf8.decode(next(source))
+            except StopIteration:
+                text = utf8.decode(b"", final=True)
+                eof = True
+            pending.append(text)
+            length += len(text)
+        return "".join(pending)
+
+    while True:
+        while pos < len(buf) and buf[pos] in WHITESPACE:
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                break
+            buf, pos = fill(1), 0
+            continue
+
+        char = buf[pos]
+        if state == 0:
+            if char != "[":
+                raise JsonStreamError(f"Expected a JSON array, got {char!r}")
+            pos += 1
+            state = 1
+        elif state == 2 and char == ",":
+            pos += 1
+            state = 4
+        elif state in (1, 2) and char == "]":
+            pos += 1
+            state = 3
+        elif state in (1, 4):
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                item, end = None, -1
+            # A number cut by a chunk boundary decodes fine but is only
+            # complete when a delimiter follows it.
+            if end >= 0 and not isinstance(item, (dict, list, str)):
+                rest = buf[end : end + 1]
+                if rest == "" or (rest in NUMBER and buf[end:].strip(NUMBER) == ""):
+                    end = end if eof else -1
+                elif rest not in f",]{WHITESPACE}":
+                    raise JsonStreamError(f"Unexpected {rest!r} in JSON array")
+            if end < 0:
+                if eof:
+                    raise JsonStreamError("Truncated JSON array")
+                buf, pos = fill(2 * (len(buf) - pos)), 0
+                continue
+            pos = end
+            state = 2
+            yield item
+        else:
+            raise JsonStreamError(f"Unexpected {char!r} in JSON array")
+
+    if state != 3:
+        raise JsonStreamError("Truncated JSON array")
@@ -0,0 +1,191 @@
+from __future__ import absolute_import, annotations, division, print_function
+
+from base64 import urlsafe_b64decode
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+import fcntl
+import os
+import tempfile
+from ansible.module_utils.compat.typing import (
+    Any,
+    Dict,
+    Iterator,
+    Optional,
+)
+
+from .attrs import AUTH_TOKEN_GRACE_WINDOW, CLIENT_TOKEN_CACHE
+from .codec import dumpb, loads
+
+
+def token_claims(token: str) -> Optional[Dict[str, Any]]:
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+    payload = parts[1]
+    try:
+        claims = loads(urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(claims, dict):
+        return None
+    return claims
+
+
+def claim_time(value: Any) -> Optional[datetime]:
+    """Read a timestamp claim, either seconds since the epoch or ISO 8601."""
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value, tz=timezone.utc)
+        if isinstance(value, str):
+            expiry = datetime.fromisoformat(value)
+            if expiry.tzinfo is None:
+                expiry = expiry.replace(tzinfo=timezone.utc)
+            return expiry
+    except (ValueError, OverflowError, OSError):
+        return None
+    return None
+
+
+def token_expiry(token: str) -> Optional[datetime]:
+    """Read the expiry of a JWS compact token without verifying its signature.
+
+    Kanidm tokens carry either the standard ``exp`` claim or an ``expiry``
+    field. ``None`` means the expiry could not be determined and the caller
+    must ask the server instead.
+    """
+    claims = token_claims(token)
+    if claims is None:
+        return None
+    for claim in ("exp", "expiry"):
+        if claims.get(claim) is not None:
+            return claim_time(claims[claim])
+    return None
+
+
+def token_privilege_expiry(token: str) -> Optional[datetime]:
+    """Read when a privileged token drops back to read only.
+
+    A privileged login is marked with ``{"purpose": {"readwrite": {"expiry":
+    ...}}}``. Once that passes the server still accepts the token, but refuses
+    every write made with it. ``None`` means the token has no such limit or it
+    couldn't be read.
+    """
+    claims = token_claims(token)
+    if claims is None:
+        return None
+    purpose = claims.get("purpose")
+    if not isinstance(purpose, dict) or not isinstance(purpose.get("readwrite"), dict):
+        return None
+    return claim_time(purpose["readwrite"].get("expiry"))
+
+
+def token_expired(token: str, writable: bool = False) -> Optional[bool]:
+    """Whether the token expires within the grace window.
+
+    With ``writable`` a privileged token also counts as expired once it is
+    about to lose its write access.
+    """
+    expiry = token_expiry(token)
+    if writable:
+        privilege = token_privilege_expiry(token)
+        if privilege is not None and (expiry is None or privilege < expiry):
+            expiry = privilege
+    if expiry is None:
+        return None
+    return expiry - datetime.now(timezone.utc) <= AUTH_TOKEN_GRACE_WINDOW
+
+
+class KanidmTokenCache(object):
+    """On-disk bearer token cache shared with the ``kanidm`` CLI.
+
+    The file uses the CLI's layout, ``{"instances": {<instance>: {"keys": {},
+    "tokens": {<name>: <token>}}}}``. The module keys instances by server URI so
+    it never clobbers the CLI's own instances, and every other key in the file
+    is preserved on write. Reads take a shared lock and writes an exclusive lock
+    on a sidecar ``.lock`` file, so parallel forks can use the same cache.
+    """
+
+    def __init__(self, path: str | Path = CLIENT_TOKEN_CACHE):
+        self.path: Path = Path(path).expanduser()
+        self.lock_path: Path = self.path.with_name(f"{self.path.name}.lock")
+
+    @contextmanager
+    def lock(self, exclusive: bool = False) -> Iterator[None]:
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.path, "rb") as f:
+                data = loads(f.read())
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return data
+
+    def _write(self, data: Dict):
+        fd, tmp = tempfile.mkstemp(
+            prefix=f".{self.path.name}.", dir=str(self.path.parent)
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(dumpb(data))
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self.path)
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+    @staticmethod
+    def _tokens(data: Dict, uri: str) -> Dict[str, str]:
+        instances = data.setdefault("instances", {})
+        instance = instances.setdefault(uri, {})
+        instance.setdefault("keys", {})
+        return instance.setdefault("tokens", {})
+
+    def get(self, uri: str, username: str) -> Optional[str]:
+        try:
+            with self.lock():
+                data = self._read()
+        except OSError:
+            return None
+        try:
+            token = data["instances"][uri]["tokens"][username]
+        except (KeyError, TypeError):
+            return None
+        if not isinstance(token, str) or token == "":
+            return None
+        return token
+
+    def set(self, uri: str, username: str, token: str) -> bool:
+        try:
+            with self.lock(exclusive=True):
+                data = self._read()
+                self._tokens(data, uri)[username] = token
+                self._write(data)
+        except OSError:
+            return False
+        return True
+
+    def remove(self, uri: str, username: str) -> bool:
+        try:
+            with self.lock(exclusive=True):
+                data = self._read()
+                tokens = self._tokens(data, uri)
+                if username not in tokens:
+                    return True
+                del tokens[username]
+                self._write(data)
+        except OSError:
+            return False
+        return True
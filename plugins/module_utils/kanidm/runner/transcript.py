@@ -0,0 +1,294 @@
+from __future__ import absolute_import, annotations, division, print_function
+
+from .codec import loads
+from collections import OrderedDict
+import traceback
+from ansible.module_utils.compat.typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypedDict,
+)
+
+REQUESTS_IMP_ERR = None
+try:
+    from requests import Response, PreparedRequest
+
+    HAS_REQUESTS = True
+except ImportError:
+    REQUESTS_IMP_ERR = traceback.format_exc()
+    HAS_REQUESTS = False
+
+## Default number of request/response pairs kept in a transcript.
+DEFAULT_TRANSCRIPT_ENTRIES: int = 64
+## Default number of body bytes kept in a transcript.
+DEFAULT_TRANSCRIPT_BYTES: int = 1024 * 1024
+
+
+class RequestDict(TypedDict):
+    body: Any
+    headers: Dict[str, str]
+    method: str
+    url: str
+
+
+class ResponseDict(TypedDict):
+    cookies: Dict[str, str]
+    elapsed: str
+    encoding: str
+    headers: Dict[str, str]
+    redirect: bool
+    json: Dict | List | Set | Tuple
+    reason: str
+    status_code: int
+    text: str
+    url: str
+
+
+class RecordedRequest(object):
+    __slots__ = ("method", "url", "headers", "body", "truncated")
+
+    def __init__(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        body: Optional[bytes | str],
+        truncated: bool = False,
+    ):
+        self.method = method
+        self.url = url
+        self.headers = headers
+        self.body = body
+        self.truncated = truncated
+
+    @property
+    def size(self) -> int:
+        return 0 if self.body is None else len(self.body)
+
+
+class RecordedResponse(object):
+    __slots__ = (
+        "status_code",
+        "reason",
+        "url",
+        "headers",
+        "cookies",
+        "elapsed",
+        "encoding",
+        "redirect",
+        "content",
+        "truncated",
+    )
+
+    def __init__(
+        self,
+        status_code: int,
+        reason: str,
+        url: str,
+        headers: Dict[str, str],
+        cookies: Dict[str, str],
+        elapsed: str,
+        encoding: Optional[str],
+        redirect: bool,
+        content: bytes,
+        truncated: bool = False,
+    ):
+        self.status_code = status_code
+        self.reason = reason
+        self.url = url
+        self.headers = headers
+        self.cookies = cookies
+        self.elapsed = elapsed
+        self.encoding = encoding
+        self.redirect = redirect
+        self.content = content
+        self.truncated = truncated
+
+    @property
+    def size(self) -> int:
+        return len(self.content)
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+def clip(body: bytes | str, limit: int) -> Tuple[bytes | str, bool]:
+    if len(body) <= limit:
+        return body, False
+    return body[:limit], True
+
+
+def decode_body(body: Optional[bytes | str]) -> Any:
+    if body is None:
+        return ""
+    try:
+        return loads(body)
+    except Exception:
+        if isinstance(body, bytes):
+            return body.decode("utf-8", errors="replace")
+        return str(body)
+
+
+def from_prep_req(req: RecordedRequest) -> RequestDict:
+    return {
+        "body": decode_body(req.body),
+        "headers": req.headers,
+        "method": req.method,
+        "url": req.url,
+    }
+
+
+def basic_from_prep_req(req: RecordedRequest) -> str:
+    if req.body is not None:
+        try:
+            body = loads(req.body)
+            return f"{req.method} {req.url} {body}"
+        except Exception:
+            return f"{req.method} {req.url}"
+
+    return f"{req.method} {req.url}"
+
+
+def from_resp(res: RecordedResponse) -> ResponseDict:
+    text = res.text
+    try:
+        js = loads(text)
+    except Exception:
+        js = None
+
+    return {
+        "cookies": res.cookies,
+        "elapsed": res.elapsed,
+        "encoding": res.encoding or "utf-8",
+        "headers": res.headers,
+        "redirect": res.redirect,
+        "json": js if js is not None else {},
+        "reason": res.reason,
+        "status_code": res.status_code,
+        "text": js if js is not None else text,
+        "url": res.url,
+    }
+
+
+def basic_from_resp(res: RecordedResponse) -> str:
+    return f"{res.status_code} {res.reason} {res.text}"
+
+
+process_request = {
+    True: from_prep_req,
+    False: basic_from_prep_req,
+}
+
+process_response = {
+    True: from_resp,
+    False: basic_from_resp,
+}
+
+
+class KanidmTranscript(object):
+    """Bounded record of the requests sent and responses received.
+
+    Only raw bodies and metadata are kept while the module runs; they are
+    decoded when the transcript is rendered into the module result. The oldest
+    calls are evicted once either ``max_entries`` or ``max_bytes`` is exceeded.
+    """
+
+    def __init__(
+        self,
+        debug: bool = False,
+        max_entries: int = DEFAULT_TRANSCRIPT_ENTRIES,
+        max_bytes: int = DEFAULT_TRANSCRIPT_BYTES,
+    ):
+        self.debug: bool = debug
+        self.max_entries: int = max(1, max_entries)
+        self.max_bytes: int = max(0, max_bytes)
+        self.size: int = 0
+        self.dropped: int = 0
+        self.entries: OrderedDict[
+            str, Tuple[RecordedRequest, Optional[RecordedResponse]]
+        ] = OrderedDict()
+
+    def record_request(self, name: str, req: PreparedRequest):
+        body = req.body
+        truncated = False
+        if body is not None and not isinstance(body, (bytes, str)):
+            body = f"<{type(body).__name__}>"
+        if body is not None:
+            body, truncated = clip(body, self.max_bytes)
+
+        self.discard(name)
+        recorded = RecordedRequest(
+            method=req.method or "",
+            url=req.url or "",
+            headers=dict(req.headers.items()),
+            body=body,
+            truncated=truncated,
+        )
+        self.entries[name] = (recorded, None)
+        self.size += recorded.size
+        self.evict()
+
+    def record_response(self, name: str, res: Response, streamed: bool = False):
+        if name not in self.entries:
+            return
+        if streamed:
+            # Reading the body here would defeat streaming it, so it's left out.
+            content, truncated = b"", True
+        else:
+            content, truncated = clip(res.content or b"", self.max_bytes)
+        try:
+            cookies = res.cookies.get_dict()
+        except Exception:
+            cookies = {}
+
+        recorded = RecordedResponse(
+            status_code=res.status_code,
+            reason=res.reason,
+            url=res.url,
+            headers=dict(res.headers.items()),
+            cookies=cookies,
+            elapsed=str(res.elapsed),
+            encoding=res.encoding,
+            redirect=res.is_redirect,
+            content=content,
+            truncated=truncated,
+        )
+        req, old = self.entries[name]
+        if old is not None:
+            self.size -= old.size
+        self.entries[name] = (req, recorded)
+        self.size += recorded.size
+        self.evict()
+
+    def discard(self, name: str):
+        if name not in self.entries:
+            return
+        req, res = self.entries.pop(name)
+        self.size -= req.size
+        if res is not None:
+            self.size -= res.size
+
+    def evict(self):
+        # Always keep the newest call, even when it alone exceeds the budget.
+        while len(self.entries) > 1 and (
+            len(self.entries) > self.max_entries or self.size > self.max_bytes
+        ):
+            self.discard(next(iter(self.entries)))
+            self.dropped += 1
+
+    def requests(self) -> Dict[str, RequestDict | str]:
+        render = process_request[self.debug]
+        return {name: render(req) for name, (req, _) in self.entries.items()}
+
+    def responses(self) -> Dict[str, ResponseDict | str]:
+        render = process_response[self.debug]
+        return {
+            name: render(res)
+            for name, (_, res) in self.entries.items()
+            if res is not None
+        }
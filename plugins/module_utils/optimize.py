@@ -0,0 +1,115 @@
+from __future__ import absolute_import, annotations, division, print_function
+
+import hashlib
+import io
+import re
+import traceback
+from pathlib import Path
+from ansible.module_utils.compat.typing import Tuple
+
+from . import sniff
+from .download import write_atomic
+
+PIL_IMP_ERR = None
+try:
+    from PIL import Image, ImageOps, features
+
+    HAS_PIL = True
+except ImportError:
+    PIL_IMP_ERR = traceback.format_exc()
+    HAS_PIL = False
+
+## Raised for images that can't be optimized. Pillow refuses images with more
+## pixels than it considers safe, and warns for the ones close to that, which
+## is an error too when warnings are turned into errors.
+OPTIMIZE_ERRORS: Tuple[type, ...] = (OSError,)
+if HAS_PIL:
+    OPTIMIZE_ERRORS += (Image.DecompressionBombError, Image.DecompressionBombWarning)
+
+## Optimized images are kept here, named by the hash of their source and of
+## the settings they were made with.
+OPTIMIZE_CACHE_DIR: str = "~/.cache/ansible-kanidm/optimized"
+## Longest side of an optimized image, in pixels. The Kanidm UI shows client
+## images at 64px, this leaves room for high density screens.
+MAX_DIMENSION: int = 256
+WEBP_QUALITY: int = 90
+## Raster kinds that are downscaled and re-encoded as WebP.
+REENCODED_KINDS = frozenset([sniff.PNG, sniff.JPEG, sniff.WEBP])
+## Changes whenever the output for the same source would change.
+OPTIMIZE_VERSION: int = 2
+
+SVG_COMMENT_RE = re.compile(rb"<!--.*?-->", re.DOTALL)
+## Whitespace between tags that spans lines only formats the document, except
+## within text elements, where it separates the words of sibling spans. Text
+## elements are matched first and kept as they are.
+SVG_INDENT_RE = re.compile(
+    rb"(<(?:\w+:)?text\b.*?</(?:\w+:)?text\s*)(?=>)|>\s*\n\s*(?=<)", re.DOTALL
+)
+
+
+def minify_svg(data: bytes) -> bytes:
+    data = SVG_COMMENT_RE.sub(b"", data)
+    return SVG_INDENT_RE.sub(lambda m: m.group(1) or b">", data).strip()
+
+
+def reencode(data: bytes, max_dimension: int) -> bytes:
+    """Downscale a raster image to fit ``max_dimension`` and encode it as WebP."""
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        resampling = getattr(Image, "Resampling", Image)
+        image.thumbnail((max_dimension, max_dimension), resampling.LANCZOS)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        out = io.BytesIO()
+        image.save(out, format="WEBP", quality=WEBP_QUALITY, method=6)
+    return out.getvalue()
+
+
+def can_reencode() -> bool:
+    return HAS_PIL and bool(features.check("webp"))
+
+
+def optimize_image(
+    path: Path,
+    kind: str,
+    max_dimension: int = MAX_DIMENSION,
+    cache_dir: str | Path = OPTIMIZE_CACHE_DIR,
+) -> Tuple[Path, str]:
+    """Shrink the image at ``path`` and return the result and its kind.
+
+    SVG documents are minified. PNG, JPEG and WebP images are downscaled to
+    ``max_dimension`` and re-encoded as WebP when Pillow is installed, and are
+    returned unchanged otherwise. The result is kept in ``cache_dir`` under
+    the SHA-256 of the source and the settings, so an unchanged image is only
+    processed once. When the output isn't smaller than the source, the source
+    is kept instead.
+    """
+    if kind == sniff.SVG:
+        target = sniff.SVG
+    elif kind in REENCODED_KINDS and can_reencode():
+        target = sniff.WEBP
+    else:
+        return path, kind
+
+    source = path.read_bytes()
+    digest = hashlib.sha256(
+        f"{OPTIMIZE_VERSION}|{target}|{max_dimension}|".encode("utf-8")
+    )
+    digest.update(source)
+    root = Path(cache_dir).expanduser()
+    for cached_kind in (target, kind):
+        cached = root / f"{digest.hexdigest()}.{cached_kind}"
+        if cached.exists():
+            return cached, cached_kind
+
+    if target == sniff.SVG:
+        optimized = minify_svg(source)
+    else:
+        optimized = reencode(source, max_dimension)
+    if len(optimized) >= len(source):
+        optimized, target = source, kind
+
+    root.mkdir(mode=0o700, parents=True, exist_ok=True)
+    result = root / f"{digest.hexdigest()}.{target}"
+    write_atomic(result, [optimized])
+    return result, target
@@ -0,0 +1,153 @@
+from __future__ import absolute_import, annotations, division, print_function
+
+from ansible.module_utils.compat.typing import (
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+## Bytes from the start of a file that are enough to detect its type.
+SNIFF_SIZE: int = 512
+
+GZIP = "gzip"
+BZIP2 = "bz2"
+XZ = "xz"
+ZLIB = "zlib"
+LZW = "lzw"
+ZIP = "zip"
+EMPTY_ZIP = "empty_zip"
+TAR = "tar"
+TEXT = "text"
+## Image kinds are spelled like the image formats Kanidm accepts.
+PNG = "png"
+JPEG = "jpg"
+GIF = "gif"
+WEBP = "webp"
+SVG = "svg"
+
+IMAGE_KINDS = frozenset([PNG, JPEG, GIF, WEBP, SVG])
+
+UTF8_BOM = b"\xef\xbb\xbf"
+## Leading markup of an SVG document, after any byte order mark and blanks.
+## Documents starting with other markup, such as a comment, are SVG when the
+## root element follows in the sniffed bytes.
+SVG_PREFIXES = (b"<svg", b"<?xml", b"<!DOCTYPE svg")
+
+
+class Signature(NamedTuple):
+    kind: str
+    ## ``(offset, magic)`` pairs that all have to match.
+    parts: Tuple[Tuple[int, bytes], ...]
+    ## Source encoding of BOM tagged text.
+    encoding: Optional[str] = None
+
+    @property
+    def size(self) -> int:
+        return max(offset + len(magic) for offset, magic in self.parts)
+
+    def matches(self, data: memoryview) -> bool:
+        for offset, magic in self.parts:
+            if data[offset : offset + len(magic)] != magic:
+                return False
+        return True
+
+
+def magic(kind: str, value: bytes, encoding: Optional[str] = None) -> Signature:
+    return Signature(kind, ((0, value),), encoding)
+
+
+SIGNATURES: Tuple[Signature, ...] = (
+    magic(GZIP, b"\x1f\x8b"),
+    magic(BZIP2, b"BZh"),
+    magic(XZ, b"\xfd7zXZ\x00"),
+    # The second byte is the compression level, with and without a preset
+    # dictionary.
+    *(
+        magic(ZLIB, bytes([0x78, level]))
+        for level in b"\x01\x5e\x9c\xda\x20\x7d\xbb\xf9"
+    ),
+    magic(LZW, b"\x1f\xa0"),
+    magic(ZIP, b"PK\x03\x04"),
+    magic(ZIP, b"PK\x07\x08"),
+    magic(EMPTY_ZIP, b"PK\x05\x06"),
+    Signature(TAR, ((257, b"ustar"),)),
+    magic(TEXT, UTF8_BOM, "utf-8"),
+    # UTF-32 before UTF-16, their little endian marks share a prefix.
+    magic(TEXT, b"\xff\xfe\x00\x00", "utf-32-le"),
+    magic(TEXT, b"\x00\x00\xfe\xff", "utf-32-be"),
+    magic(TEXT, b"\xff\xfe", "utf-16-le"),
+    magic(TEXT, b"\xfe\xff", "utf-16-be"),
+    *(magic(TEXT, b"+/v" + end, "utf-7") for end in (b"8", b"9", b"+", b"/")),
+    magic(PNG, b"\x89PNG\r\n\x1a\n"),
+    magic(JPEG, b"\xff\xd8\xff"),
+    # JPEG 2000, as a JP2 file and as a bare codestream.
+    magic(JPEG, b"\x00\x00\x00\x0cjP  \r\n\x87\n"),
+    magic(JPEG, b"\xff\x4f\xff\x51"),
+    magic(GIF, b"GIF87a"),
+    magic(GIF, b"GIF89a"),
+    Signature(WEBP, ((0, b"RIFF"), (8, b"WEBP"))),
+)
+
+
+def index_signatures(
+    signatures: Iterable[Signature],
+) -> Tuple[Dict[int, Tuple[Signature, ...]], Tuple[Signature, ...]]:
+    """Group signatures by their first byte, longest first.
+
+    Signatures that don't start at offset 0 can't be indexed and are
+    returned separately.
+    """
+    indexed: Dict[int, List[Signature]] = {}
+    rest: List[Signature] = []
+    for signature in signatures:
+        offset, value = signature.parts[0]
+        if offset == 0:
+            indexed.setdefault(value[0], []).append(signature)
+        else:
+            rest.append(signature)
+    return (
+        {
+            byte: tuple(sorted(group, key=lambda s: s.size, reverse=True))
+            for byte, group in indexed.items()
+        },
+        tuple(rest),
+    )
+
+
+SIGNATURE_INDEX, UNINDEXED_SIGNATURES = index_signatures(SIGNATURES)
+## SVG is recognised by its markup instead of magic bytes.
+SVG_SIGNATURE = Signature(SVG, ((0, b""),))
+
+
+def is_svg(data: memoryview) -> bool:
+    text = bytes(data)
+    if text.startswith(UTF8_BOM):
+        text = text[len(UTF8_BOM) :]
+    text = text.lstrip()
+    return text.startswith(SVG_PREFIXES) or (text.startswith(b"<") and b"<svg" in text)
+
+
+def sniff(
+    data: bytes | bytearray | memoryview,
+    kinds: Optional[Iterable[str]] = None,
+) -> Optional[Signature]:
+    """Detect the type of a file from its first ``SNIFF_SIZE`` bytes.
+
+    Only the signatures sharing the first byte of ``data`` are compared, so
+    the cost doesn't grow with the table. ``kinds`` limits the result to
+    those kinds. Returns None when nothing matches.
+    """
+    view = memoryview(data)
+    allowed = None if kinds is None else frozenset(kinds)
+    candidates = SIGNATURE_INDEX.get(view[0], ()) if len(view) > 0 else ()
+    for signature in (*candidates, *UNINDEXED_SIGNATURES):
+        if allowed is not None and signature.kind not in allowed:
+            continue
+        if signature.matches(view):
+            return signature
+    if (allowed is None or SVG in allowed) and is_svg(view):
+        return SVG_SIGNATURE
+    return None
@@ -4,133 +4,225 @@ from __future__ import annotations, division
 from pathlib import Path
 import tempfile
 from base64 import b64decode
+import codecs
 import gzip
+import hashlib
+import io
+import lzma
+import shutil
 import zlib
 import bz2
 import tarfile
 import zipfile
 import os
-from ansible.module_utils.compat.typing import Any
+from ansible.module_utils.compat.typing import IO, Any, Iterable, Iterator
 
 from ansible.module_utils.common.validation import (
     check_type_bool,
     check_type_list,
     check_type_int,
+    check_type_float,
     check_type_str,
     check_type_dict,
 )
 
+from . import sniff
+
+## Decoded content is kept here, in one directory per blob named by its hash.
+CONTENT_CACHE_DIR: str = "~/.cache/ansible-kanidm/content"
+## Bytes decoded, decompressed or transcoded at a time.
+CHUNK_SIZE: int = 64 * 1024
+## File in a cache directory naming the decoded file, relative to it.
+CONTENT_POINTER: str = ".path"
+## Kinds of data decode_file() accepts.
+CONTENT_KINDS = frozenset(
+    [
+        sniff.GZIP,
+        sniff.BZIP2,
+        sniff.XZ,
+        sniff.ZLIB,
+        sniff.LZW,
+        sniff.ZIP,
+        sniff.EMPTY_ZIP,
+        sniff.TAR,
+        sniff.TEXT,
+    ]
+)
 
-def decode_file(content: bytes, header: list[bytes]) -> str:
-    if header[0:2] == [b"\x1f", b"\x8b"]:
-        path = tempfile.mkstemp()[1]
-        with open(path, "wb") as f:
-            f.write(gzip.decompress(content))
-        return str(path)
-    elif header[0:2] == [b"\x1f", b"\xa0"]:
-        path = tempfile.mkstemp(suffix=".tar.z")[1]
-        with open(path, "wb") as f:
-            f.write(content)
-        temp_path = tempfile.mkdtemp()
-        with tarfile.open(path) as f:
-            members = f.getmembers()
-            f.extractall(path=temp_path)
-        os.remove(path)
-        path = f"{temp_path}/{members[0].name}"
-        return str(path)
-    elif header[0:3] == [b"\x42", b"\x5a", b"\x68"]:
-        path = tempfile.mkstemp()[1]
-        with open(path, "wb") as f:
-            f.write(bz2.decompress(content))
-        return str(path)
-    elif header[0:4] == [b"\x50", b"\x4b", b"\x03", b"\x04"] or header[0:4] == [
-        b"\x50",
-        b"\x4b",
-        b"\x07",
-        b"\x08",
-    ]:
-        path = tempfile.mkstemp(suffix=".zip")[1]
-        with open(path, "wb") as f:
-            f.write(content)
-        temp_path = tempfile.mkdtemp()
-        zip_file = zipfile.ZipFile(path)
-        members = zip_file.namelist()
-        zip_file.extractall(path=temp_path)
-        zip_file.close()
+
+class Base64Reader(io.RawIOBase):
+    """Read a base64 encoded string as binary, decoding it a chunk at a time."""
+
+    def __init__(self, value: str):
+        self.value = "".join(value.split())
+        self.pos = 0
+        self.buf = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if len(self.buf) == 0:
+            if self.pos >= len(self.value):
+                return 0
+            # Every 4 characters decode to 3 bytes.
+            end = self.pos + (len(b) // 3 + 1) * 4
+            self.buf = memoryview(b64decode(self.value[self.pos : end]))
+            self.pos = end
+        n = min(len(b), len(self.buf))
+        b[:n] = self.buf[:n]
+        self.buf = self.buf[n:]
+        return n
+
+
+def read_chunks(stream: IO[bytes]) -> Iterator[bytes]:
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def inflate_chunks(stream: IO[bytes]) -> Iterator[bytes]:
+    inflater = zlib.decompressobj()
+    for chunk in read_chunks(stream):
+        yield inflater.decompress(chunk)
+    yield inflater.flush()
+
+
+def transcode_chunks(stream: IO[bytes], encoding: str) -> Iterator[bytes]:
+    # The output is UTF-8, so the byte order mark of the source is dropped.
+    decoder = codecs.getincrementaldecoder(encoding)()
+    start = True
+    for chunk in read_chunks(stream):
+        text = decoder.decode(chunk)
+        if start and text:
+            text = text[1:] if text[0] == "\ufeff" else text
+            start = False
+        yield text.encode("utf-8")
+    yield decoder.decode(b"", final=True).encode("utf-8")
+
+
+def write_chunks(chunks: Iterable[bytes], path: Path):
+    with open(path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+
+def is_tar(path: Path) -> bool:
+    with open(path, "rb") as f:
+        block = f.read(sniff.SNIFF_SIZE)
+    return sniff.sniff(block, [sniff.TAR]) is not None
+
+
+def extract_tar(path: Path, directory: Path) -> str:
+    with tarfile.open(path) as f:
+        members = f.getmembers()
+        if len(members) == 0:
+            raise ValueError("Path is an empty tar file")
+        if hasattr(tarfile, "data_filter"):
+            f.extractall(path=directory / "archive", filter="data")
+        else:
+            f.extractall(path=directory / "archive")
+    os.remove(path)
+    return f"archive/{members[0].name}"
+
+
+def unpack(chunks: Iterable[bytes], directory: Path) -> str:
+    """Write decompressed data, and extract it when it is a tar archive."""
+    path = directory / "data"
+    write_chunks(chunks, path)
+    if is_tar(path):
+        return extract_tar(path, directory)
+    return "data"
+
+
+def decode_file(stream: io.BufferedReader, directory: Path) -> str:
+    """Decode ``stream`` into ``directory`` and return the path of the result.
+
+    The type is detected from the first bytes, the rest of the data is only
+    read in chunks. The returned path is relative to ``directory``.
+    """
+    signature = sniff.sniff(stream.peek(sniff.SNIFF_SIZE), CONTENT_KINDS)
+    kind = None if signature is None else signature.kind
+    if kind == sniff.GZIP:
+        with gzip.GzipFile(fileobj=stream, mode="rb") as f:
+            return unpack(read_chunks(f), directory)
+    elif kind == sniff.BZIP2:
+        with bz2.BZ2File(stream) as f:
+            return unpack(read_chunks(f), directory)
+    elif kind == sniff.XZ:
+        with lzma.LZMAFile(stream) as f:
+            return unpack(read_chunks(f), directory)
+    elif kind == sniff.ZLIB:
+        return unpack(inflate_chunks(stream), directory)
+    elif kind == sniff.LZW:
+        raise ValueError("LZW compressed files are not supported")
+    elif kind == sniff.ZIP:
+        # Zip files are read from their end, so they have to be written first.
+        path = directory / "data.zip"
+        write_chunks(read_chunks(stream), path)
+        with zipfile.ZipFile(path) as zip_file:
+            members = zip_file.namelist()
+            zip_file.extractall(path=directory / "archive")
         os.remove(path)
-        path = f"{temp_path}/{members[0]}"
-        return str(path)
-    elif header[0:4] == [b"\x50", b"\x4b", b"\x05", b"\x06"]:
+        return f"archive/{members[0]}"
+    elif kind == sniff.EMPTY_ZIP:
         raise ValueError("Path is an empty zip file")
-    elif header[0:3] == [b"\xef", b"\xbb", b"\xbf"]:
-        path = tempfile.mkstemp()[1]
-        with open(path, "wb") as f:
-            f.write(content)
-        return str(path)
-    elif header[0:2] == [b"\xff", b"\xfe"]:
-        path = tempfile.mkstemp()[1]
-        with open(path, "w") as f:
-            f.write(content.decode("utf-16-le"))
-        return str(path)
-    elif header[0:2] == [b"\xfe", b"\xff"]:
-        path = tempfile.mkstemp()[1]
-        with open(path, "w") as f:
-            f.write(content.decode("utf-16-be"))
-        return str(path)
-    elif header[0:4] == [b"\xff", b"\xfe", b"\x00", b"\x00"]:
-        path = tempfile.mkstemp()[1]
-        with open(path, "w") as f:
-            f.write(content.decode("utf-32-le"))
-        return str(path)
-    elif header[0:4] == [b"\x00", b"\x00", b"\xfe", b"\xff"]:
-        path = tempfile.mkstemp()[1]
-        with open(path, "w") as f:
-            f.write(content.decode("utf-32-be"))
-        return str(path)
-    elif (
-        header[0:4] == [b"\x2b", b"\x2f", b"\x76", b"\x38"]
-        or header[0:4] == [b"\x2b", b"\x2f", b"\x76", b"\x39"]
-        or header[0:4] == [b"\x2b", b"\x2f", b"\x76", b"\x2b"]
-        or header[0:4] == [b"\x2b", b"\x2f", b"\x76", b"\x2f"]
-    ):
-        path = tempfile.mkstemp()[1]
-        with open(path, "w") as f:
-            f.write(content.decode("utf-7"))
-        return str(path)
-    elif header[0:2] == [b"\x1f", b"\x8b"]:
-        path = tempfile.mkstemp(suffix=".tar.gz")[1]
-        temp_path = tempfile.mkdtemp()
-        with tarfile.open(path) as f:
-            members = f.getmembers()
-            f.extractall(path=temp_path)
-        os.remove(path)
-        path = f"{temp_path}/{members[0].name}"
-        return str(path)
-    elif header[0:6] == [b"\xfd", b"\x37", b"\x7a", b"\x58", b"\x5a", b"\x00"]:
-        path = tempfile.mkstemp(suffix=".tar.xz")[1]
-        temp_path = tempfile.mkdtemp()
-        with tarfile.open(path) as f:
-            members = f.getmembers()
-            f.extractall(path=temp_path)
-        os.remove(path)
-        path = f"{temp_path}/{members[0].name}"
-        return str(path)
-    elif (
-        header[0:2] == [b"\x78", b"\x01"]
-        or header[0:2] == [b"\x78", b"\x5e"]
-        or header[0:2] == [b"\x78", b"\x9c"]
-        or header[0:2] == [b"\x78", b"\xda"]
-        or header[0:2] == [b"\x78", b"\x20"]
-        or header[0:2] == [b"\x78", b"\x7d"]
-        or header[0:2] == [b"\x78", b"\xbb"]
-        or header[0:2] == [b"\x78", b"\xf9"]
-    ):
-        path = tempfile.mkstemp()[1]
-        with open(path, "wb") as f:
-            f.write(zlib.decompress(content))
-        return str(path)
-    else:
-        raise ValueError("Unable to decode file")
+    elif kind == sniff.TAR:
+        return unpack(read_chunks(stream), directory)
+    elif signature is not None and signature.encoding == "utf-8":
+        write_chunks(read_chunks(stream), directory / "data")
+        return "data"
+    elif signature is not None and signature.encoding is not None:
+        write_chunks(transcode_chunks(stream, signature.encoding), directory / "data")
+        return "data"
+    raise ValueError("Unable to decode file")
+
+
+def cached_content(directory: Path) -> str | None:
+    try:
+        name = (directory / CONTENT_POINTER).read_text(encoding="utf-8")
+    except OSError:
+        return None
+    path = directory / name
+    return str(path) if path.exists() else None
+
+
+def decode_content(value: str, cache_dir: str | Path = CONTENT_CACHE_DIR) -> str:
+    """Decode a base64 encoded, possibly compressed, blob to a file.
+
+    The result is kept in ``cache_dir`` under the SHA-256 of the blob, so
+    decoding the same blob again only returns the existing path. Work happens
+    in a temporary directory next to the cache entry that is renamed into
+    place when complete, or removed when decoding fails.
+    """
+    digest = hashlib.sha256(value.encode("utf-8")).hexdigest()
+    root = Path(cache_dir).expanduser()
+    final = root / digest
+    cached = cached_content(final)
+    if cached is not None:
+        return cached
+
+    root.mkdir(mode=0o700, parents=True, exist_ok=True)
+    work = Path(tempfile.mkdtemp(prefix=f".{digest[:16]}.", dir=str(root)))
+    try:
+        with io.BufferedReader(Base64Reader(value), CHUNK_SIZE) as stream:
+            name = decode_file(stream, work)
+        (work / CONTENT_POINTER).write_text(name, encoding="utf-8")
+        try:
+            os.rename(work, final)
+        except OSError:
+            # Another run decoded the same blob first, use its result.
+            cached = cached_content(final)
+            if cached is None:
+                raise
+            shutil.rmtree(work, ignore_errors=True)
+            return cached
+    except BaseException:
+        shutil.rmtree(work, ignore_errors=True)
+        raise
+    return str(final / name)
 
 
 class Verify:
@@ -184,6 +276,21 @@ class Verify:
             return default
         return ret
 
+    def verify_opt_float(self) -> float | None:
+        if self.value is None:
+            return None
+        self.value = check_type_float(self.value)
+        if not isinstance(self.value, float):
+            raise TypeError(f"{self.name} must be a float")
+        else:
+            return self.value
+
+    def verify_default_float(self, default: float) -> float:
+        ret = self.verify_opt_float()
+        if ret is None:
+            return default
+        return ret
+
     def verify_opt_bool(self) -> bool | None:
         if self.value is None:
             return None
@@ -365,11 +472,7 @@ class Verify:
         if not isinstance(self.value, str):
             raise TypeError(f"{self.name} should be a base64 encoded string")
 
-        content = b64decode(self.value)
-        header = []
-        for i in range(0, 6):
-            header.append(bytes([list(content)[i]]))
-        return decode_file(content, header)
+        return decode_content(self.value)
 
     def verify_opt_content_as_path(self) -> Path | None:
         val = self.verify_opt_content()
@@ -386,11 +489,7 @@ class Verify:
         self.value = check_type_str(self.value)
         if not isinstance(self.value, str):
             raise TypeError(f"{self.name} should be a base64 encoded string")
-        content = b64decode(self.value)
-        header = []
-        for i in range(0, 6):
-            header.append(bytes([list(content)[i]]))
-        return decode_file(content, header)
+        return decode_content(self.value)
 
     def verify_content_as_path(self) -> Path:
         path = Path(self.verify_content())
@@ -59,6 +59,11 @@ responses:
     description: A dictionary or request names and their response objects
     type: dict
     returned: always
+stats:
+    description: Transport counters for the run, such as the number of requests, retries, read cache hits and misses, reused connections, and entry cache hits and misses when kanidm.entry_cache is enabled.
+    type: dict
+    returned: always
+    sample: {"requests": 6, "retries": 0, "cache_hits": 1, "cache_misses": 3, "connections": 1, "reused_connections": 5}
 """
 
 from ansible.module_utils.basic import AnsibleModule  # pylint: disable=E0401  # noqa: E402
@@ -92,7 +97,7 @@ def run_module():
     # changed is if this module effectively modified the target
     # state will include any data that you want your module to pass back
     # for consumption, for example, in a subsequent task
-    result = dict(changed=False, message="", requests={}, responses={}, reset_url="")
+    result = dict(changed=False, message="", requests={}, responses={}, stats={}, reset_url="")
 
     # the AnsibleModule object will be our abstraction working with Ansible
     # this includes instantiation, a couple of common attr would be the
@@ -127,6 +132,9 @@ def run_module():
     except Exception as e:
         module.fail_json(msg=KanidmUnexpectedError(f"{e}").message, **result)
 
+    # Over a persistent httpapi connection the requests go through it.
+    args.kanidm.socket_path = module._socket_path
+
     # if the user is working with this module in only check mode we do not
     # want to make any changes to the environment, just return the current
     # state with no modifications
@@ -143,48 +151,57 @@ def run_module():
     except KanidmArgsException as e:
         result["requests"] = kanidm.api.requests
         result["responses"] = kanidm.api.responses
+        result["stats"] = kanidm.api.stats
         result["message"] = "failed"
         module.fail_json(msg=e.message, **result)
     except KanidmRequiredOptionError as e:
         result["requests"] = kanidm.api.requests
         result["responses"] = kanidm.api.responses
+        result["stats"] = kanidm.api.stats
         result["message"] = "failed"
         module.fail_json(msg=e.message, **result)
     except KanidmAuthenticationFailure as e:
         result["requests"] = kanidm.api.requests
         result["responses"] = kanidm.api.responses
+        result["stats"] = kanidm.api.stats
         result["message"] = "failed"
         module.fail_json(msg=e.message, **result)
     except KanidmException as e:
         result["requests"] = kanidm.api.requests
         result["responses"] = kanidm.api.responses
+        result["stats"] = kanidm.api.stats
         result["message"] = "failed"
         module.fail_json(msg=e.message, **result)
     except KanidmModuleError as e:
         result["requests"] = kanidm.api.requests
         result["responses"] = kanidm.api.responses
+        result["stats"] = kanidm.api.stats
         result["message"] = "failed"
         module.fail_json(msg=e.message, **result)
     except KanidmApiError as e:
         result["requests"] = kanidm.api.requests
         result["responses"] = kanidm.api.responses
+        result["stats"] = kanidm.api.stats
         result["message"] = "failed"
         module.fail_json(msg=e.message, **result)
     except KanidmUnexpectedError as e:
         result["requests"] = kanidm.api.requests
         result["responses"] = kanidm.api.responses
+        result["stats"] = kanidm.api.stats
         result["message"] = "failed"
         module.fail_json(msg=e.message, **result)
     except Exception as e:
         result["requests"] = kanidm.api.requests
         result["responses"] = kanidm.api.responses
+        result["stats"] = kanidm.api.stats
         result["message"] = "failed"
         module.fail_json(msg=KanidmUnexpectedError(f"{e}").message, **result)
 
     result["message"] = "success"
-    result["changed"] = True
+    result["changed"] = kanidm.changed
     result["requests"] = kanidm.api.requests
     result["responses"] = kanidm.api.responses
+    result["stats"] = kanidm.api.stats
 
     # in the event of a successful module execution, you will want to
     # simple AnsibleModule.exit_json(), passing the key/value results
@@ -0,0 +1,195 @@
+# kanidm_action.py - Shared base for the Kanidm action plugins.
+
+# pylint: disable=E0401
+# GNU General Public License v3.0+
+# (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import fcntl
+import hashlib
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Set, Tuple, Type
+
+from ansible import constants as C  # type: ignore
+from ansible.module_utils.basic import missing_required_lib  # type: ignore
+from ansible.module_utils.common.parameters import remove_values  # type: ignore
+from ansible.plugins.action import ActionBase  # type: ignore
+from ansible.utils.display import Display  # type: ignore
+
+from ansible_collections.annie444.base.plugins.module_utils.base_exception import (  # type: ignore
+    BaseAnsibleError,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.exceptions import (  # type: ignore
+    KanidmUnexpectedError,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.api import (  # type: ignore
+    HAS_REQUESTS,
+    REQUESTS_IMP_ERR,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.codec import (  # type: ignore
+    dumpb,
+    loads,
+)
+
+display = Display()
+
+## Connection plugins that run on the controller itself.
+LOCAL_CONNECTIONS = frozenset(
+    ["local", "ansible.builtin.local", "ansible.legacy.local"]
+)
+
+
+class KanidmActionBase(ActionBase):  # type: ignore[misc]
+    """
+    Run a Kanidm runner in the controller process.
+
+    When the task runs over a local connection, for example with
+    ``delegate_to: localhost``, the runner is called directly instead of
+    shipping the module to the target. Hosts running the same task with the
+    same arguments share one execution: the first one takes a file lock keyed
+    by the task and its arguments, runs the runner and writes the result next
+    to the lock, the others wait for the lock and read that result. Like
+    ``exit_json`` does for the module, the values of ``no_log`` options are
+    masked in the result before it is shared or returned. Results holding a
+    secret the runner returned, like an OAuth client secret or a credential
+    reset URL, are never written to disk: every host runs such a task itself.
+
+    Over any other connection the module is executed as usual.
+    """
+
+    TRANSFERS_FILES = False
+    _VALID_ARGS = frozenset()
+
+    ## Fully qualified name of the module this plugin runs.
+    MODULE: str = ""
+    ## The arguments class of the module.
+    ARGS: Type = object
+    ## Result keys the module always returns, besides the common ones.
+    RESULT: Dict[str, Any] = {}
+    ## Result keys holding secrets, a result with any of them set isn't shared.
+    SECRETS: Tuple[str, ...] = ()
+
+    def runner(self, args: Any) -> Any:
+        raise NotImplementedError
+
+    def execute(self, runner: Any) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def report(self, runner: Any) -> Dict[str, Any]:
+        """Result keys to return even when the runner failed."""
+        return {}
+
+    def has_secrets(self, result: Dict[str, Any]) -> bool:
+        return any(result.get(key) for key in self.SECRETS)
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(KanidmActionBase, self).run(tmp, task_vars)
+        del tmp
+
+        if not self.on_controller():
+            result.update(
+                self._execute_module(
+                    module_name=self.MODULE,
+                    module_args=self._task.args,
+                    task_vars=task_vars,
+                )
+            )
+            return result
+
+        if not HAS_REQUESTS:
+            result.update(failed=True, msg=missing_required_lib(REQUESTS_IMP_ERR))
+            return result
+
+        # Raises AnsibleActionFail for invalid arguments, like the module would.
+        validation, params = self.validate_argument_spec(**self.ARGS.full_arg_spec())
+
+        result.update(
+            changed=False,
+            message="",
+            requests={},
+            responses={},
+            stats={},
+            **self.RESULT,
+        )
+        if self._play_context.check_mode:
+            return result
+
+        with self.shared(params) as shared:
+            if shared.get("done"):
+                display.vvv(f"{self.MODULE}: reusing the result of another host")
+            else:
+                shared.update(self.invoke(params, validation._no_log_values))
+                # Secrets would be written in the clear, in the result and in
+                # the transcript, so such a result isn't shared.
+                shared["done"] = not self.has_secrets(shared)
+        shared.pop("done")
+        result.update(shared)
+        return result
+
+    def on_controller(self) -> bool:
+        return self._connection._load_name in LOCAL_CONNECTIONS
+
+    def invoke(self, params: Dict[str, Any], no_log: Set[str]) -> Dict[str, Any]:
+        result: Dict[str, Any] = {}
+        runner = None
+        try:
+            runner = self.runner(self.ARGS(**params))
+            result.update(self.execute(runner))
+            result["message"] = "failed" if result.get("failed") else "success"
+            result["changed"] = runner.changed
+        except BaseAnsibleError as e:
+            result.update(failed=True, message="failed", msg=e.message)
+        except Exception as e:
+            result.update(
+                failed=True,
+                message="failed",
+                msg=KanidmUnexpectedError(f"{e}").message,
+            )
+        if runner is not None:
+            result["requests"] = runner.api.requests
+            result["responses"] = runner.api.responses
+            result["stats"] = runner.api.stats
+            result.update(self.report(runner))
+        # The transcript holds the login request, and with it the password.
+        return remove_values(result, no_log)
+
+    @contextmanager
+    def shared(self, params: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Hold the lock for this task and arguments and yield its result.
+
+        The result is empty for the first host. Whatever the holder puts in it
+        is written back when the lock is released.
+        """
+        digest = hashlib.sha256(
+            dumpb([self.MODULE, params], sort_keys=True, default=str)
+        ).hexdigest()
+        directory = os.path.join(C.DEFAULT_LOCAL_TMP, "kanidm")
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        path = os.path.join(directory, f"{self._task._uuid}-{digest}")
+
+        fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            shared = self.load(f"{path}.json") or {}
+            yield shared
+            if shared.get("done"):
+                self.dump(f"{path}.json", shared)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def load(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "rb") as f:
+                return loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def dump(path: str, value: Dict[str, Any]):
+        # Results may hold secrets, keep them private to the controller user.
+        tmp = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(dumpb(value, default=str))
+        os.replace(tmp, path)
@@ -0,0 +1,96 @@
+"""A fake transport for testing KanidmApi without a Kanidm server.
+
+``FakeAdapter`` is mounted on the session of a ``KanidmApi`` in place of the
+HTTP adapter. Every prepared request is recorded and handed to a handler,
+which answers with ``(status, body)`` or ``(status, body, headers)``, or
+raises to simulate a network failure.
+"""
+
+import base64
+import json
+import threading
+
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.arg_specs.conf import (
+    KanidmConf,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.api import (
+    KanidmApi,
+)
+
+URI = "https://idm.example.com"
+
+
+def jwt(exp, **claims):
+    """An unsigned token that expires at ``exp``, with any other ``claims``."""
+
+    def part(value):
+        return (
+            base64.urlsafe_b64encode(json.dumps(value).encode()).rstrip(b"=").decode()
+        )
+
+    return f"{part({'alg': 'ES256'})}.{part({'exp': exp, **claims})}.c2ln"
+
+
+def body_json(request):
+    if request.body is None:
+        return None
+    body = request.body
+    if isinstance(body, bytes):
+        body = body.decode("utf-8")
+    return json.loads(body)
+
+
+class FakeAdapter(BaseAdapter):
+    def __init__(self, handler):
+        super().__init__()
+        self.handler = handler
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def send(self, request, stream=False, timeout=None, **kwargs):
+        with self.lock:
+            self.requests.append(request)
+        answer = self.handler(request)
+        status, body = answer[0], answer[1]
+        headers = answer[2] if len(answer) > 2 else {}
+        res = Response()
+        res.status_code = status
+        res.reason = "OK" if status < 400 else "Error"
+        res.url = request.url
+        res.request = request
+        res.headers = CaseInsensitiveDict(headers)
+        res.encoding = "utf-8"
+        if isinstance(body, bytes):
+            res._content = body
+        else:
+            res._content = json.dumps(body).encode("utf-8")
+        # Streamed reads iterate over the content already read.
+        res._content_consumed = True
+        return res
+
+    def close(self):
+        pass
+
+    def paths(self, method=None):
+        with self.lock:
+            return [
+                r.path_url
+                for r in self.requests
+                if method is None or r.method == method
+            ]
+
+
+def fake_api(handler, **conf):
+    """A ``KanidmApi`` whose requests are answered by ``handler``."""
+    conf.setdefault("uri", URI)
+    conf.setdefault("token_cache", False)
+    conf.setdefault("retry_backoff", 0.0)
+    api = KanidmApi(KanidmConf(**conf))
+    adapter = FakeAdapter(handler)
+    api.session.mount("https://", adapter)
+    api.session.mount("http://", adapter)
+    return api, adapter
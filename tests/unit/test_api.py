@@ -0,0 +1,258 @@
+import time
+import unittest
+from unittest.mock import patch
+
+from requests.exceptions import ConnectTimeout, ReadTimeout
+
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.exceptions import (
+    KanidmApiError,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.api import (
+    RETRY_BACKOFF_MAX,
+    TOKEN_VALIDATION_MEMO,
+    KanidmCall,
+)
+
+from .kanidm_fake import body_json, fake_api, jwt
+
+ALICE = "00000000-0000-0000-0000-00000000a11c"
+
+
+class TestTokenValidation(unittest.TestCase):
+    def test_check_token_is_memoized(self):
+        api, adapter = fake_api(lambda r: (200, {}), token="opaque")
+        self.assertTrue(api.check_token())
+        self.assertTrue(api.check_token())
+        self.assertEqual(adapter.paths(), ["/v1/auth/valid"])
+
+    def test_check_token_memo_expires(self):
+        api, adapter = fake_api(lambda r: (200, {}), token="opaque")
+        self.assertTrue(api.check_token())
+        with patch(
+            "time.monotonic",
+            return_value=time.monotonic() + TOKEN_VALIDATION_MEMO.total_seconds() + 1,
+        ):
+            self.assertFalse(api.token_is_fresh("opaque"))
+        self.assertFalse(api.token_is_fresh("other"))
+
+    def test_check_token_locally(self):
+        api, adapter = fake_api(
+            lambda r: (200, {}),
+            token=jwt(time.time() + 3600),
+            validate_token_locally=True,
+        )
+        self.assertTrue(api.check_token())
+        self.assertEqual(adapter.requests, [])
+
+    def test_check_token_locally_expired(self):
+        api, adapter = fake_api(
+            lambda r: (401, "notauthenticated"),
+            token=jwt(time.time() - 10),
+            validate_token_locally=True,
+        )
+        self.assertFalse(api.check_token())
+        self.assertEqual(adapter.paths(), ["/v1/auth/valid"])
+
+
+class TestRetries(unittest.TestCase):
+    def setUp(self):
+        sleep = patch(
+            "ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.api.time.sleep"
+        )
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def answers(self, *answers):
+        queue = list(answers)
+
+        def handler(request):
+            answer = queue.pop(0) if len(queue) > 1 else queue[0]
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+        return handler
+
+    def test_retry_idempotent_on_5xx(self):
+        api, adapter = fake_api(
+            self.answers((503, "busy"), (502, "busy"), (200, {"ok": 1})), token="t"
+        )
+        self.assertTrue(api.get("read", "/v1/person/alice"))
+        self.assertEqual(api.json, {"ok": 1})
+        self.assertEqual(len(adapter.requests), 3)
+        self.assertEqual(api.stats["retries"], 2)
+        self.assertEqual(self.sleep.call_count, 2)
+
+    def test_retry_gives_up(self):
+        api, adapter = fake_api(self.answers((503, "busy")), token="t", retries=2)
+        self.assertFalse(api.get("read", "/v1/person/alice"))
+        self.assertEqual(api.response.status_code, 503)
+        self.assertEqual(len(adapter.requests), 3)
+
+    def test_no_retry_for_writes(self):
+        api, adapter = fake_api(self.answers((503, "busy")), token="t")
+        self.assertFalse(api.post("create", "/v1/person", json={"attrs": {}}))
+        self.assertEqual(len(adapter.requests), 1)
+
+        api, adapter = fake_api(self.answers(ReadTimeout("slow")), token="t")
+        with self.assertRaises(ReadTimeout):
+            api.post("create", "/v1/person", json={"attrs": {}})
+        self.assertEqual(len(adapter.requests), 1)
+
+    def test_retry_timeouts(self):
+        api, adapter = fake_api(self.answers(ReadTimeout("slow"), (200, {})), token="t")
+        self.assertTrue(api.get("read", "/v1/person/alice"))
+        self.assertEqual(len(adapter.requests), 2)
+
+        # A request that never reached the server can be sent again.
+        api, adapter = fake_api(
+            self.answers(ConnectTimeout("down"), (200, {})), token="t"
+        )
+        self.assertTrue(api.post("create", "/v1/person", json={"attrs": {}}))
+        self.assertEqual(len(adapter.requests), 2)
+
+    def test_backoff(self):
+        api, _ = fake_api(self.answers((200, {})), retry_backoff=1.0)
+        for attempt in range(1, 10):
+            delay = api.backoff(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(RETRY_BACKOFF_MAX, 2 ** (attempt - 1)))
+        self.assertGreaterEqual(api.backoff(1, "7"), 7)
+        self.assertLessEqual(api.backoff(1, "3600"), RETRY_BACKOFF_MAX)
+
+
+class TestGather(unittest.TestCase):
+    def test_gather_keeps_call_order(self):
+        active = []
+        peak = []
+
+        def handler(request):
+            n = int(request.path_url.rsplit("/", 1)[1])
+            active.append(n)
+            peak.append(len(active))
+            # Later calls finish first.
+            time.sleep(0.01 * (8 - n))
+            active.remove(n)
+            return 200, {"n": n}
+
+        api, _ = fake_api(handler, token="t", workers=4)
+        calls = [
+            KanidmCall(name=f"read[{n}]", method="GET", path=f"/v1/person/{n}")
+            for n in range(8)
+        ]
+        results = api.gather(calls)
+        self.assertEqual([r.json["n"] for r in results], list(range(8)))
+        self.assertEqual([r.name for r in results], [c.name for c in calls])
+        self.assertGreater(max(peak), 1)
+        self.assertLessEqual(max(peak), 4)
+
+    def test_gather_reports_first_failure(self):
+        def handler(request):
+            n = int(request.path_url.rsplit("/", 1)[1])
+            return (404, "nomatchingentries") if n in (2, 5) else (200, {"n": n})
+
+        api, adapter = fake_api(handler, token="t", workers=3)
+        results = api.gather(
+            [
+                KanidmCall(name=f"read[{n}]", method="GET", path=f"/v1/person/{n}")
+                for n in range(6)
+            ]
+        )
+        # Every call runs, failures don't cancel the others.
+        self.assertEqual(len(adapter.requests), 6)
+        self.assertEqual([r.ok for r in results], [n not in (2, 5) for n in range(6)])
+        self.assertIs(api.response, results[2].response)
+
+    def test_gather_serial(self):
+        api, adapter = fake_api(lambda r: (200, {}), token="t")
+        self.assertEqual(api.gather([]), [])
+        api.gather([KanidmCall(name="a", method="GET", path="/v1/person/a")], workers=1)
+        self.assertEqual(adapter.paths(), ["/v1/person/a"])
+
+
+class TestSearch(unittest.TestCase):
+    def test_search_unwraps_entries(self):
+        alice = {"attrs": {"name": ["alice"], "uuid": [ALICE], "mail": ["a@b"]}}
+        api, adapter = fake_api(lambda r: (200, {"entries": [alice]}), token="t")
+        found = api.search("search", {"eq": ["name", "alice"]}, attrs=[])
+        self.assertEqual([(e.name, str(e.uuid)) for e in found], [("alice", ALICE)])
+        self.assertNotIn("mail", found[0])
+        self.assertEqual(
+            body_json(adapter.requests[0]), {"filter": {"eq": ["name", "alice"]}}
+        )
+
+    def test_search_unexpected_response(self):
+        api, _ = fake_api(lambda r: (200, []), token="t")
+        with self.assertRaises(KanidmApiError):
+            api.search("search", {"eq": ["name", "alice"]})
+
+    def test_search_unavailable(self):
+        api, adapter = fake_api(lambda r: (403, "accessdenied"), token="t")
+        self.assertIsNone(api.search("search", {"eq": ["name", "alice"]}))
+        self.assertIsNone(api.search("search", {"eq": ["name", "bob"]}))
+        self.assertEqual(len(adapter.requests), 1)
+
+
+class TestReadCache(unittest.TestCase):
+    def test_reads_are_cached(self):
+        api, adapter = fake_api(lambda r: (200, {"attrs": {}}), token="t")
+        self.assertTrue(api.get("a", "/v1/person/alice"))
+        self.assertTrue(api.get("b", "/v1/person/alice"))
+        self.assertEqual(len(adapter.requests), 1)
+        self.assertEqual(api.stats["cache_hits"], 1)
+
+        api, adapter = fake_api(lambda r: (200, {}), token="t", read_cache=False)
+        api.get("a", "/v1/person/alice")
+        api.get("b", "/v1/person/alice")
+        self.assertEqual(len(adapter.requests), 2)
+
+    def test_writes_invalidate_their_entry(self):
+        api, adapter = fake_api(lambda r: (200, {"entries": []}), token="t")
+        for path in (
+            "/v1/person/alice",
+            "/v1/person/alice/_ssh_pubkeys",
+            "/v1/person/bob",
+        ):
+            api.get("read", path)
+        api.search("search", {"eq": ["name", "alice"]})
+        api.post("write", "/v1/person/alice/_attr/mail", json=["a@example.com"])
+
+        adapter.requests.clear()
+        for path in (
+            "/v1/person/alice",
+            "/v1/person/alice/_ssh_pubkeys",
+            "/v1/person/bob",
+        ):
+            api.get("read", path)
+        api.search("search", {"eq": ["name", "alice"]})
+        self.assertEqual(
+            adapter.paths(),
+            ["/v1/person/alice", "/v1/person/alice/_ssh_pubkeys", "/v1/raw/search"],
+        )
+
+    def test_collection_writes_invalidate_entries(self):
+        api, adapter = fake_api(lambda r: (200, {}), token="t")
+        api.get("read", "/v1/person/alice")
+        api.get("read", "/v1/group/admins")
+        api.post("create", "/v1/person", json={"attrs": {"name": ["bob"]}})
+        adapter.requests.clear()
+        api.get("read", "/v1/person/alice")
+        api.get("read", "/v1/group/admins")
+        self.assertEqual(adapter.paths(), ["/v1/person/alice"])
+
+    def test_failed_write_invalidates(self):
+        def handler(request):
+            return (500, "error") if request.method == "PATCH" else (200, {})
+
+        api, adapter = fake_api(handler, token="t")
+        api.get("read", "/v1/person/alice")
+        self.assertFalse(api.patch("write", "/v1/person/alice", json={"attrs": {}}))
+        api.get("read", "/v1/person/alice")
+        self.assertEqual(adapter.paths("GET"), ["/v1/person/alice"] * 2)
+
+    def test_token_checks_are_not_cached(self):
+        api, adapter = fake_api(lambda r: (200, {}), token="opaque")
+        self.assertTrue(api.check_token())
+        api.validated_at -= TOKEN_VALIDATION_MEMO.total_seconds() + 1
+        self.assertTrue(api.check_token())
+        self.assertEqual(adapter.paths(), ["/v1/auth/valid"] * 2)
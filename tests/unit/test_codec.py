@@ -0,0 +1,92 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner import codec
+
+DOCUMENTS = [
+    {
+        "attrs": {
+            "name": ["alice"],
+            "displayname": ["Ålice 中文 🙂"],
+            "gidnumber": ["1000"],
+            "mail": [],
+        }
+    },
+    [{"b": 1, "a": [True, False, None]}, 'line\nbreak "quoted" \\  '],
+    {"z": 0.1, "y": -7, "x": 2**63, "w": -(2**63)},
+    "",
+    [],
+    {},
+]
+
+FLOATS = [{"v": 1.5e300, "u": 1e-05, "t": -2.5e-300}, [0.1, 1e16, 123456.789]]
+
+
+def both_codecs(test):
+    """Run ``test`` once with orjson, when installed, and once without."""
+
+    def run(self):
+        for has_orjson in sorted({False, codec.HAS_ORJSON}):
+            with (
+                self.subTest(orjson=has_orjson),
+                patch.object(codec, "HAS_ORJSON", has_orjson),
+            ):
+                test(self)
+
+    return run
+
+
+class TestCodec(unittest.TestCase):
+    @both_codecs
+    def test_round_trip(self):
+        for doc in DOCUMENTS:
+            data = codec.dumpb(doc)
+            self.assertIsInstance(data, bytes)
+            self.assertEqual(codec.loads(data), doc)
+            self.assertEqual(codec.loads(data.decode("utf-8")), doc)
+            self.assertEqual(codec.loads(memoryview(data)), doc)
+            self.assertEqual(codec.loads(bytearray(data)), doc)
+
+    @both_codecs
+    def test_matches_the_standard_library(self):
+        for doc in DOCUMENTS:
+            for sort_keys in (False, True):
+                expected = json.dumps(
+                    doc,
+                    sort_keys=sort_keys,
+                    separators=(",", ":"),
+                    ensure_ascii=False,
+                )
+                self.assertEqual(codec.dumps(doc, sort_keys=sort_keys), expected)
+
+    @both_codecs
+    def test_floats(self):
+        # Exponents are written differently, and by orjson versions too, so
+        # only the values are compared.
+        for doc in FLOATS:
+            self.assertEqual(json.loads(codec.dumps(doc)), doc)
+            self.assertEqual(codec.loads(codec.dumpb(doc)), doc)
+
+    @both_codecs
+    def test_values_orjson_refuses(self):
+        # Wider than 64 bits, and keys that aren't strings.
+        self.assertEqual(codec.dumpb(2**64), b"18446744073709551616")
+        self.assertEqual(codec.dumpb(-(2**63) - 1), b"-9223372036854775809")
+        self.assertEqual(codec.dumpb({1: "a", "b": 2}), b'{"1":"a","b":2}')
+        self.assertEqual(
+            codec.dumpb({2: [2**70], 1: None}, sort_keys=True),
+            b'{"1":null,"2":[1180591620717411303424]}',
+        )
+
+    @both_codecs
+    def test_default(self):
+        self.assertEqual(codec.dumps({"s": {1}}, default=sorted), '{"s":[1]}')
+        with self.assertRaises(TypeError):
+            codec.dumpb({"s": {1}})
+
+    @both_codecs
+    def test_invalid_documents(self):
+        for data in (b"", b"{", b"[1,]", b"nope"):
+            with self.assertRaises(codec.JSONDecodeError):
+                codec.loads(data)
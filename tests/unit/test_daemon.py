@@ -0,0 +1,120 @@
+import io
+import json
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.arg_specs.conf import (
+    KanidmConf,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.api import (
+    KanidmApi,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.daemon import (
+    KanidmDaemon,
+    bind,
+)
+
+SESSION_COOKIE = "auth-session-id=s1"
+
+
+class KanidmHandler(BaseHTTPRequestHandler):
+    """Password login that, like Kanidm, ties its steps together by cookie."""
+
+    uploads = []
+
+    def answer(self, status, body, headers=()):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/v1/auth/valid":
+            return self.answer(200, {})
+        self.answer(404, "nomatchingentries")
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path != "/v1/auth":
+            self.uploads.append((self.headers["Content-Type"], body))
+            return self.answer(200, None)
+        step = json.loads(body)["step"]
+        if "init2" in step:
+            return self.answer(
+                200,
+                {"state": {"choose": ["password"]}},
+                [("Set-Cookie", f"{SESSION_COOKIE}; Path=/; HttpOnly")],
+            )
+        if self.headers.get("Cookie") != SESSION_COOKIE:
+            return self.answer(401, "sessionexpired")
+        if "begin" in step:
+            return self.answer(200, {"state": {"continue": ["password"]}})
+        return self.answer(200, {"state": {"success": "session-token"}})
+
+    def log_message(self, *args):
+        pass
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), KanidmHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        KanidmHandler.uploads = []
+
+        self.socket = Path(tempfile.mkdtemp()) / "daemon.sock"
+        self.daemon = KanidmDaemon(self.socket, idle_timeout=1)
+        threading.Thread(
+            target=self.daemon.serve, args=(bind(self.socket),), daemon=True
+        ).start()
+
+        self.api = KanidmApi(
+            KanidmConf(
+                uri=f"http://127.0.0.1:{self.server.server_port}",
+                username="admin",
+                password="secret",
+                token_cache=False,
+                daemon=True,
+                daemon_socket=str(self.socket),
+            )
+        )
+
+    def tearDown(self):
+        if self.api.daemon is not None:
+            self.api.daemon.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_login_through_the_daemon(self):
+        self.api.authenticate()
+        self.assertEqual(self.api.token, "session-token")
+        self.assertIsNotNone(self.api.daemon)
+        self.assertEqual(self.api.session.cookies.get("auth-session-id"), "s1")
+        # The shared session of the daemon keeps no cookies of its own.
+        for session in self.daemon.sessions.values():
+            self.assertEqual(len(session.cookies), 0)
+
+    def test_multipart_through_the_daemon(self):
+        m = MultipartEncoder(
+            {"image": ("logo.svg", io.BytesIO(b"<svg/>"), "image/svg+xml")}
+        )
+        self.assertTrue(
+            self.api.post(
+                "add_image",
+                "/v1/oauth2/app/_image",
+                data=m,
+                content_type=m.content_type,
+            )
+        )
+        self.assertIsNotNone(self.api.daemon)
+        content_type, body = KanidmHandler.uploads[0]
+        self.assertEqual(content_type, m.content_type)
+        self.assertIn(b"<svg/>", body)
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from requests import HTTPError
+
+from ansible_collections.annie444.base.plugins.module_utils.download import (
+    download,
+)
+
+LOGO = b"\x89PNG\r\n\x1a\n" + b"\x00" * 200_000
+
+
+class LogoHandler(BaseHTTPRequestHandler):
+    etag = '"v1"'
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(dict(self.headers))
+        if self.path == "/missing":
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(LOGO)))
+        self.end_headers()
+        self.wfile.write(LOGO)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestDownload(unittest.TestCase):
+    def setUp(self):
+        self.cache = tempfile.mkdtemp()
+        self.server = HTTPServer(("127.0.0.1", 0), LogoHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        LogoHandler.requests = []
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_download_revalidates(self):
+        path = download(f"{self.url}/logo.png", self.cache)
+        self.assertEqual(path.read_bytes(), LOGO)
+        os.utime(path, (0, 0))
+
+        self.assertEqual(download(f"{self.url}/logo.png", self.cache), path)
+        self.assertEqual(os.stat(path).st_mtime, 0)
+        self.assertNotIn("If-None-Match", LogoHandler.requests[0])
+        self.assertEqual(LogoHandler.requests[1]["If-None-Match"], '"v1"')
+
+    def test_download_failure_keeps_nothing(self):
+        with self.assertRaises(HTTPError):
+            download(f"{self.url}/missing", self.cache)
+        self.assertEqual(os.listdir(self.cache), [])
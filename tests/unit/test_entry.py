@@ -0,0 +1,47 @@
+import unittest
+from uuid import UUID
+
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.entry import (
+    KanidmEntry,
+)
+
+ATTRS = {
+    "name": ["alice"],
+    "uuid": ["5b0ab81c-91b3-4d47-a7ca-0f4c7de1c4bc"],
+    "class": ["person", "account", "object"],
+    "account_expire": [],
+    "oauth2_prefer_short_username": ["true"],
+}
+
+
+class TestKanidmEntry(unittest.TestCase):
+    def test_entry_reads_like_attrs(self):
+        entry = KanidmEntry(ATTRS)
+        self.assertEqual(entry.to_dict(), ATTRS)
+        self.assertEqual(dict(entry), ATTRS)
+        self.assertEqual(entry["uuid"], ATTRS["uuid"])
+        self.assertEqual(entry.get("memberof", []), [])
+        self.assertIn("class", entry)
+        self.assertEqual(len(entry), len(ATTRS))
+
+    def test_entry_typed_accessors(self):
+        entry = KanidmEntry(ATTRS)
+        self.assertEqual(entry.name, "alice")
+        self.assertEqual(entry.uuid, UUID(ATTRS["uuid"][0]))
+        self.assertEqual(entry.first("class"), "person")
+        self.assertIsNone(entry.first("account_expire"))
+        self.assertTrue(entry.flag("oauth2_prefer_short_username"))
+        self.assertIsNone(entry.flag("oauth2_allow_localhost_redirect"))
+
+    def test_entry_keep(self):
+        entry = KanidmEntry(ATTRS, keep=["class"])
+        self.assertEqual(sorted(entry), ["class", "name", "uuid"])
+
+    def test_entry_non_canonical_uuid(self):
+        entry = KanidmEntry({"uuid": ["5B0AB81C-91B3-4D47-A7CA-0F4C7DE1C4BC"]})
+        self.assertEqual(entry["uuid"], ["5B0AB81C-91B3-4D47-A7CA-0F4C7DE1C4BC"])
+
+    def test_entry_from_json(self):
+        self.assertIsNone(KanidmEntry.from_json("nomatchingentries"))
+        self.assertIsNone(KanidmEntry.from_json({"attrs": None}))
+        self.assertEqual(KanidmEntry.from_json({"attrs": ATTRS}).name, "alice")
@@ -0,0 +1,132 @@
+import unittest
+from uuid import uuid4
+
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.arg_specs.group import (
+    KanidmGroupArgs,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.exceptions import (
+    KanidmModuleError,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.group import (
+    KanidmGroup,
+)
+
+from .kanidm_fake import URI, FakeAdapter, body_json
+
+ALICE = str(uuid4())
+BOT = str(uuid4())
+
+
+MEMBERS = "/v1/group/admins/_attr/member"
+
+
+def entry(name, uuid):
+    return {"attrs": {"name": [name], "uuid": [uuid]}}
+
+
+def make_group(handler, users=(), **args):
+    group = KanidmGroup(
+        KanidmGroupArgs(
+            name="admins",
+            parent="idm_admins",
+            users=list(users),
+            kanidm={"uri": URI, "token": "t", "token_cache": False},
+            **args,
+        )
+    )
+    adapter = FakeAdapter(handler)
+    group.api.session.mount("https://", adapter)
+    return group, adapter
+
+
+class TestResolveMembers(unittest.TestCase):
+    def group(self, handler):
+        return make_group(handler)
+
+    def test_members_hidden_from_search_are_read(self):
+        # The search only returns alice, the service account isn't readable
+        # through it but can be read directly.
+        def handler(request):
+            if request.path_url == "/v1/raw/search":
+                return 200, {"entries": [entry("alice", ALICE)]}
+            if request.path_url == f"/v1/service_account/{BOT}":
+                return 200, entry("bot", BOT)
+            return 404, "nomatchingentries"
+
+        group, adapter = self.group(handler)
+        members = group.resolve_members([ALICE, BOT, "carol"])
+        self.assertEqual(set(members.values()), {ALICE, BOT, "carol"})
+        self.assertEqual(
+            adapter.paths(),
+            [
+                "/v1/raw/search",
+                f"/v1/person/{BOT}",
+                f"/v1/group/{BOT}",
+                f"/v1/service_account/{BOT}",
+            ],
+        )
+
+    def test_unknown_members_fail(self):
+        group, _ = self.group(
+            lambda r: (200, {"entries": []}) if "search" in r.url else (404, "")
+        )
+        with self.assertRaisesRegex(KanidmModuleError, ALICE):
+            group.resolve_members([ALICE])
+
+
+class TestUpdateMembers(unittest.TestCase):
+    def group(self, current, users, handler=None, **args):
+        group, adapter = make_group(handler or (lambda r: (200, None)), users, **args)
+        group.entry = {"member": current}
+        return group, adapter
+
+    def bodies(self, adapter, method):
+        return [body_json(r) for r in adapter.requests if r.method == method]
+
+    def test_member_diff(self):
+        current = ["alice@idm.example.com", "Bob@idm.example.com", "dave"]
+        users = ["Alice", "bob@idm.example.com", "carol"]
+        expected = {
+            "present": (["carol"], []),
+            "exact": (["carol"], ["dave"]),
+            "absent": ([], ["alice@idm.example.com", "Bob@idm.example.com"]),
+        }
+        for state, diff in expected.items():
+            with self.subTest(state=state):
+                group, adapter = self.group(current, users, state=state)
+                self.assertEqual(group.member_diff(), diff)
+                self.assertEqual(adapter.requests, [])
+
+    def test_additions_are_chunked(self):
+        users = ["a", "b", "c", "d", "e"]
+        group, adapter = self.group(["a"], users, chunk_size=2)
+        self.assertTrue(group.update_members())
+        self.assertTrue(group.changed)
+        self.assertEqual(adapter.paths(), [MEMBERS, MEMBERS])
+        self.assertEqual(self.bodies(adapter, "POST"), [["b", "c"], ["d", "e"]])
+
+    def test_exact_removes_other_members(self):
+        current = ["a@idm.example.com", "b@idm.example.com", "c", "d"]
+        group, adapter = self.group(current, ["A", "e"], state="exact", chunk_size=2)
+        self.assertTrue(group.update_members())
+        self.assertEqual(self.bodies(adapter, "POST"), [["e"]])
+        self.assertEqual(
+            self.bodies(adapter, "DELETE"), [["b@idm.example.com", "c"], ["d"]]
+        )
+
+    def test_unchanged_members_send_nothing(self):
+        group, adapter = self.group(["a", "b"], ["b", "A"], state="exact")
+        self.assertTrue(group.update_members())
+        self.assertFalse(group.changed)
+        self.assertEqual(adapter.requests, [])
+
+    def test_failed_chunk_stops_the_update(self):
+        group, adapter = self.group(
+            [],
+            ["a", "b", "c"],
+            handler=lambda r: (400, "invalidattribute"),
+            chunk_size=1,
+        )
+        self.assertFalse(group.update_members())
+        self.assertEqual(len(self.bodies(adapter, "POST")), 1)
+        self.assertFalse(group.changed)
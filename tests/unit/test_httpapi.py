@@ -0,0 +1,109 @@
+import io
+import json
+import unittest
+from email.message import Message
+
+from ansible.module_utils.connection import ConnectionError as AnsibleConnectionError
+from requests import Request
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+
+from ansible_collections.annie444.base.plugins.httpapi.kanidm import HttpApi
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.httpapi import (
+    KanidmHttpApiTransport,
+)
+
+from .kanidm_fake import URI
+
+
+class FakeResponse(object):
+    def __init__(self, status, headers):
+        self.status = status
+        self.reason = "OK" if status < 400 else "Error"
+        self.headers = Message()
+        for name, value in headers.items():
+            self.headers[name] = value
+
+    def geturl(self):
+        return f"{URI}/v1/person/alice"
+
+
+class FakeNetworkConnection(object):
+    """Stands in for the httpapi connection the HttpApi plugin talks through."""
+
+    def __init__(self, status=200, body=b"{}", headers=None):
+        self.answer = (status, body, headers or {"Content-Type": "application/json"})
+        self.sent = []
+
+    def send(self, path, data, method="GET", headers=None):
+        self.sent.append((path, data, method, headers))
+        status, body, headers = self.answer
+        return FakeResponse(status, headers), io.BytesIO(body)
+
+
+class FakeConnection(object):
+    """Stands in for the module side of the persistent connection."""
+
+    def __init__(self, network):
+        self.plugin = HttpApi(network)
+
+    def send_request(self, data, **kwargs):
+        return self.plugin.send_request(data, **kwargs)
+
+
+class TestKanidmHttpApiTransport(unittest.TestCase):
+    def transport(self, network):
+        transport = KanidmHttpApiTransport("/nonexistent/socket")
+        transport.connection = FakeConnection(network)
+        return transport
+
+    def prepare(self, method, path, **kwargs):
+        req = Request(method, f"{URI}{path}", **kwargs).prepare()
+        req.headers["Authorization"] = "Bearer ignored"
+        return req
+
+    def test_send(self):
+        network = FakeNetworkConnection(body=b'{"attrs": {"name": ["alice"]}}')
+        req = self.prepare("PATCH", "/v1/person/alice", json={"attrs": {}})
+        res = self.transport(network).send(req)
+
+        path, data, method, headers = network.sent[0]
+        self.assertEqual((path, method), ("/v1/person/alice", "PATCH"))
+        self.assertEqual(json.loads(data), {"attrs": {}})
+        self.assertNotIn("Authorization", headers)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {"attrs": {"name": ["alice"]}})
+        self.assertEqual(res.headers["content-type"], "application/json")
+        self.assertIs(res.request, req)
+
+    def test_send_errors_are_responses(self):
+        network = FakeNetworkConnection(status=404, body=b'"nomatchingentries"')
+        res = self.transport(network).send(self.prepare("GET", "/v1/person/bob"))
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(res.json(), "nomatchingentries")
+
+    def test_send_multipart(self):
+        network = FakeNetworkConnection()
+        m = MultipartEncoder(
+            {"image": ("logo.svg", io.BytesIO(b"<svg/>"), "image/svg+xml")}
+        )
+        req = self.prepare(
+            "POST",
+            "/v1/oauth2/app/_image",
+            data=m,
+            headers={"Content-Type": m.content_type},
+        )
+        self.transport(network).send(req)
+        _, data, _, headers = network.sent[0]
+        self.assertIn(b"<svg/>", data)
+        self.assertEqual(headers["Content-Type"], m.content_type)
+
+    def test_send_connection_lost(self):
+        class Lost(object):
+            def send_request(self, data, **kwargs):
+                raise AnsibleConnectionError("socket closed")
+
+        transport = KanidmHttpApiTransport("/nonexistent/socket")
+        transport.connection = Lost()
+        with self.assertRaises(RequestsConnectionError):
+            transport.send(self.prepare("GET", "/v1/person/alice"))
@@ -0,0 +1,37 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.images import (
+    KanidmImageState,
+    file_sha256,
+)
+
+URI = "https://idm.example.com"
+
+
+class TestKanidmImageState(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.state = KanidmImageState(self.dir / "state")
+        self.logo = self.dir / "logo.png"
+        self.logo.write_bytes(b"\x89PNG\r\n\x1a\n" + b"\x00" * 100_000)
+
+    def test_image_state_unchanged(self):
+        sha256 = file_sha256(self.logo)
+        self.assertFalse(self.state.unchanged(URI, "app", sha256, "abc"))
+        self.state.set(URI, "app", sha256, "abc")
+        self.assertTrue(self.state.unchanged(URI, "app", sha256, "abc"))
+        self.assertFalse(self.state.unchanged(URI, "other", sha256, "abc"))
+
+    def test_image_state_changed(self):
+        sha256 = file_sha256(self.logo)
+        self.state.set(URI, "app", sha256, "abc")
+        # Removed or replaced on the server.
+        self.assertFalse(self.state.unchanged(URI, "app", sha256, None))
+        self.assertFalse(self.state.unchanged(URI, "app", sha256, "def"))
+        # Replaced locally.
+        self.logo.write_bytes(b"GIF89a")
+        self.assertFalse(
+            self.state.unchanged(URI, "app", file_sha256(self.logo), "abc")
+        )
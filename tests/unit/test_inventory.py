@@ -0,0 +1,76 @@
+import unittest
+
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.inventory import (
+    KanidmInventory,
+)
+
+from .kanidm_fake import fake_api
+
+
+def account(name, cid, memberof=()):
+    return {
+        "attrs": {
+            "class": ["service_account"],
+            "name": [name],
+            "uuid": [f"uuid-{name}"],
+            "spn": [f"{name}@idm.example.com"],
+            "last_modified_cid": [cid],
+            "memberof": [f"{g}@idm.example.com" for g in memberof],
+        }
+    }
+
+
+class TestKanidmInventory(unittest.TestCase):
+    def setUp(self):
+        self.accounts = [
+            account("web1", "0001", ["web"]),
+            account("db1", "0002", ["db"]),
+        ]
+
+        def handler(request):
+            if request.path_url == "/v1/service_account":
+                return 200, self.accounts
+            return 200, {}
+
+        self.api, self.adapter = fake_api(handler, token="t")
+        self.runner = KanidmInventory(self.api)
+
+    def test_inventory(self):
+        snapshot = self.runner.refresh()
+        self.assertEqual(
+            self.runner.inventory(snapshot),
+            {
+                "web1": {
+                    "groups": ["web"],
+                    "vars": {
+                        "kanidm_uuid": "uuid-web1",
+                        "kanidm_spn": "web1@idm.example.com",
+                        "kanidm_displayname": "",
+                        "kanidm_gidnumber": None,
+                        "kanidm_memberof": ["web"],
+                    },
+                },
+                "db1": {
+                    "groups": ["db"],
+                    "vars": {
+                        "kanidm_uuid": "uuid-db1",
+                        "kanidm_spn": "db1@idm.example.com",
+                        "kanidm_displayname": "",
+                        "kanidm_gidnumber": None,
+                        "kanidm_memberof": ["db"],
+                    },
+                },
+            },
+        )
+        self.assertNotIn("/v1/group", self.adapter.paths())
+
+    def test_refresh_derives_changed_entries(self):
+        snapshot = self.runner.refresh()
+        self.accounts = [
+            account("web1", "0001", ["web"]),
+            account("web2", "0003", ["web"]),
+        ]
+        runner = KanidmInventory(self.api)
+        hosts = runner.inventory(runner.refresh(snapshot))
+        self.assertEqual(sorted(hosts), ["web1", "web2"])
+        self.assertEqual((runner.derived, runner.reused), (1, 1))
@@ -0,0 +1,129 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from ansible_collections.annie444.base.plugins.action.kanidm_create_group import (
+    ActionModule,
+)
+from ansible_collections.annie444.base.plugins.action.kanidm_create_person import (
+    ActionModule as PersonActionModule,
+)
+
+from .kanidm_fake import URI, FakeAdapter, body_json
+
+PASSWORD = "correct horse battery staple"
+RESET_TOKEN = "reset-token-secret"
+
+
+def kanidm(request):
+    """Answer a password login and find the group unchanged."""
+    if request.path_url == "/v1/auth":
+        step = body_json(request)["step"]
+        if "init2" in step:
+            return 200, {"sessionid": "s", "state": {"choose": ["password"]}}
+        if "begin" in step:
+            return 200, {"sessionid": "s", "state": {"continue": ["password"]}}
+        if step["cred"]["password"] == PASSWORD:
+            return 200, {"sessionid": "s", "state": {"success": "session-token"}}
+        return 401, "notauthenticated"
+    if request.path_url == "/v1/auth/valid":
+        return 200, {}
+    if request.path_url == "/v1/group/admins":
+        return 200, {"attrs": {"name": ["admins"], "uuid": ["uuid-admins"]}}
+    if request.path_url == "/v1/person/alice":
+        return 200, {"attrs": {"name": ["alice"], "uuid": ["uuid-alice"]}}
+    if request.path_url.startswith("/v1/person/alice/_credential/_update_intent"):
+        return 200, {"token": RESET_TOKEN}
+    return 404, "nomatchingentries"
+
+
+class TestKanidmActionBase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        local_tmp = patch(
+            "ansible_collections.annie444.base.plugins.plugin_utils.kanidm_action.C.DEFAULT_LOCAL_TMP",
+            self.tmp,
+        )
+        local_tmp.start()
+        self.addCleanup(local_tmp.stop)
+        self.adapter = FakeAdapter(kanidm)
+
+    def action(self, connection="local", module=ActionModule, **args):
+        task = MagicMock()
+        task._uuid = "task-uuid"
+        task.async_val = 0
+        task.check_mode = False
+        task.args = args or {"name": "admins", "users": []}
+        task.args.update(
+            kanidm={
+                "uri": URI,
+                "username": "admin",
+                "password": PASSWORD,
+                "token_cache": False,
+                "entry_cache": False,
+            }
+        )
+        conn = MagicMock()
+        conn._load_name = connection
+        play_context = MagicMock()
+        play_context.check_mode = False
+        action = module(task, conn, play_context, None, None, None)
+
+        runner = action.runner
+        adapter = self.adapter
+
+        def mounted(args):
+            result = runner(args)
+            result.api.session.mount("https://", adapter)
+            return result
+
+        action.runner = mounted
+        return action
+
+    def test_runs_on_the_controller(self):
+        result = self.action().run(task_vars={})
+        self.assertFalse(result.get("failed"), result.get("msg"))
+        self.assertEqual(result["message"], "success")
+        self.assertFalse(result["changed"])
+        self.assertIn("get_group", result["requests"])
+        self.assertIn("/v1/group/admins", self.adapter.paths("GET"))
+
+    def test_hosts_share_one_execution(self):
+        first = self.action().run(task_vars={})
+        requests = len(self.adapter.requests)
+        second = self.action().run(task_vars={})
+        self.assertEqual(len(self.adapter.requests), requests)
+        self.assertEqual(first, second)
+
+    def test_password_is_masked(self):
+        result = self.action().run(task_vars={})
+        self.assertIn("login_send", result["requests"])
+        self.assertNotIn(PASSWORD, json.dumps(result))
+        shared = os.path.join(self.tmp, "kanidm")
+        for name in os.listdir(shared):
+            with open(os.path.join(shared, name), "rb") as f:
+                self.assertNotIn(PASSWORD.encode(), f.read())
+
+    def test_secrets_are_not_shared(self):
+        first = self.action(module=PersonActionModule, name="alice").run(task_vars={})
+        self.assertFalse(first.get("failed"), first.get("msg"))
+        self.assertIn(RESET_TOKEN, first["reset_url"])
+        requests = len(self.adapter.requests)
+        second = self.action(module=PersonActionModule, name="alice").run(task_vars={})
+        self.assertEqual(second["reset_url"], first["reset_url"])
+        self.assertEqual(len(self.adapter.requests), 2 * requests)
+        shared = os.path.join(self.tmp, "kanidm")
+        for name in os.listdir(shared):
+            with open(os.path.join(shared, name), "rb") as f:
+                self.assertNotIn(RESET_TOKEN.encode(), f.read())
+
+    def test_other_connections_run_the_module(self):
+        action = self.action(connection="ssh")
+        with patch.object(
+            action, "_execute_module", return_value={"changed": False}
+        ) as execute:
+            action.run(task_vars={})
+        execute.assert_called_once()
+        self.assertEqual(self.adapter.requests, [])
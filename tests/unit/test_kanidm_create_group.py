@@ -190,6 +190,121 @@ class TestKanidmGroupModule(unittest.TestCase):
         self.assertEqual(raised.data["changed"], True)
         self.assertEqual(raised.data["message"].lower(), "success")
 
+    def test_kanidm_group_member_state(self):
+        with self.assertRaises(AnsibleExitJson) as ej:
+            set_module_args(
+                {
+                    "kanidm": {
+                        "uri": "https://localhost:8443",
+                        "username": "idm_admin",
+                        "password": "aSLXKGvBjCad9q6jh22y3dfk8pzZJ3VhFf7VW6NkDv6ZKUvp",
+                        "verify_ca": False,
+                    },
+                    "name": "test_member_state_group",
+                    "users": ["user1", "user2"],
+                    "state": "present",
+                }
+            )
+            kanidm_create_group.main()
+        raised = ej.exception
+        self.assertEqual(raised.data["changed"], True)
+        self.assertEqual(raised.data["message"].lower(), "success")
+
+        with self.assertRaises(AnsibleExitJson) as ej:
+            set_module_args(
+                {
+                    "kanidm": {
+                        "uri": "https://localhost:8443",
+                        "username": "idm_admin",
+                        "password": "aSLXKGvBjCad9q6jh22y3dfk8pzZJ3VhFf7VW6NkDv6ZKUvp",
+                        "verify_ca": False,
+                    },
+                    "name": "test_member_state_group",
+                    "users": ["user1", "user2"],
+                    "state": "present",
+                }
+            )
+            kanidm_create_group.main()
+        raised = ej.exception
+        self.assertEqual(raised.data["changed"], False)
+        self.assertEqual(raised.data["message"].lower(), "success")
+
+        with self.assertRaises(AnsibleExitJson) as ej:
+            set_module_args(
+                {
+                    "kanidm": {
+                        "uri": "https://localhost:8443",
+                        "username": "idm_admin",
+                        "password": "aSLXKGvBjCad9q6jh22y3dfk8pzZJ3VhFf7VW6NkDv6ZKUvp",
+                        "verify_ca": False,
+                    },
+                    "name": "test_member_state_group",
+                    "users": ["user1"],
+                    "state": "exact",
+                }
+            )
+            kanidm_create_group.main()
+        raised = ej.exception
+        self.assertEqual(raised.data["changed"], True)
+        self.assertEqual(raised.data["message"].lower(), "success")
+
+        with self.assertRaises(AnsibleExitJson) as ej:
+            set_module_args(
+                {
+                    "kanidm": {
+                        "uri": "https://localhost:8443",
+                        "username": "idm_admin",
+                        "password": "aSLXKGvBjCad9q6jh22y3dfk8pzZJ3VhFf7VW6NkDv6ZKUvp",
+                        "verify_ca": False,
+                    },
+                    "name": "test_member_state_group",
+                    "users": ["user1"],
+                    "state": "exact",
+                }
+            )
+            kanidm_create_group.main()
+        raised = ej.exception
+        self.assertEqual(raised.data["changed"], False)
+        self.assertEqual(raised.data["message"].lower(), "success")
+
+        with self.assertRaises(AnsibleExitJson) as ej:
+            set_module_args(
+                {
+                    "kanidm": {
+                        "uri": "https://localhost:8443",
+                        "username": "idm_admin",
+                        "password": "aSLXKGvBjCad9q6jh22y3dfk8pzZJ3VhFf7VW6NkDv6ZKUvp",
+                        "verify_ca": False,
+                    },
+                    "name": "test_member_state_group",
+                    "users": ["user1", "user2"],
+                    "state": "absent",
+                }
+            )
+            kanidm_create_group.main()
+        raised = ej.exception
+        self.assertEqual(raised.data["changed"], True)
+        self.assertEqual(raised.data["message"].lower(), "success")
+
+        with self.assertRaises(AnsibleExitJson) as ej:
+            set_module_args(
+                {
+                    "kanidm": {
+                        "uri": "https://localhost:8443",
+                        "username": "idm_admin",
+                        "password": "aSLXKGvBjCad9q6jh22y3dfk8pzZJ3VhFf7VW6NkDv6ZKUvp",
+                        "verify_ca": False,
+                    },
+                    "name": "test_member_state_group",
+                    "users": ["user1", "user2"],
+                    "state": "absent",
+                }
+            )
+            kanidm_create_group.main()
+        raised = ej.exception
+        self.assertEqual(raised.data["changed"], False)
+        self.assertEqual(raised.data["message"].lower(), "success")
+
     def test_kanidm_group_all_args(self):
         with self.assertRaises(AnsibleExitJson) as ej:
             set_module_args(
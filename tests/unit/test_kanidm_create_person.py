@@ -187,7 +187,7 @@ class TestKanidmPersonModule(unittest.TestCase):
             )
             kanidm_create_person.main()
         raised = ej.exception
-        self.assertEqual(raised.data["changed"], True)
+        self.assertEqual(raised.data["changed"], False)
         self.assertIsInstance(raised.data["reset_url"], str)
         self.assertEqual(raised.data["message"].lower(), "success")
 
@@ -0,0 +1,89 @@
+import json
+import unittest
+
+from ansible.errors import AnsibleError
+from ansible.module_utils import basic
+from ansible.module_utils.common.text.converters import to_bytes
+from ansible.plugins.loader import lookup_loader
+
+from ansible_collections.annie444.base.plugins.modules import kanidm_create_group
+
+from unittest.mock import patch
+
+KANIDM = {
+    "uri": "https://localhost:8443",
+    "username": "idm_admin",
+    "password": "aSLXKGvBjCad9q6jh22y3dfk8pzZJ3VhFf7VW6NkDv6ZKUvp",
+    "verify_ca": False,
+    "entry_cache": False,
+}
+
+
+class AnsibleExitJson(Exception):
+    def __init__(self, data):
+        self.data = data
+
+
+def exit_json(*args, **kwargs):
+    raise AnsibleExitJson(kwargs)
+
+
+def fail_json(*args, **kwargs):
+    kwargs["failed"] = True
+    raise AnsibleExitJson(kwargs)
+
+
+class TestKanidmLookup(unittest.TestCase):
+    def setUp(self):
+        self.mock_module_helper = patch.multiple(
+            basic.AnsibleModule,
+            exit_json=exit_json,
+            fail_json=fail_json,
+        )
+        self.mock_module_helper.start()
+        self.addCleanup(self.mock_module_helper.stop)
+        self.lookup = lookup_loader.get("annie444.base.kanidm")
+
+    def create_group(self, name, users):
+        basic._ANSIBLE_ARGS = to_bytes(
+            json.dumps(
+                {
+                    "ANSIBLE_MODULE_ARGS": {
+                        "name": name,
+                        "users": users,
+                        "kanidm": KANIDM,
+                    }
+                }
+            )
+        )
+        with self.assertRaises(AnsibleExitJson) as ej:
+            kanidm_create_group.main()
+        self.assertFalse(ej.exception.data.get("failed", False))
+
+    def test_lookup_fail_when_required_args_missing(self):
+        with self.assertRaises(AnsibleError):
+            self.lookup.run(["idm_admin"], {})
+
+    def test_kanidm_lookup_groups(self):
+        self.create_group("test_lookup_group1", ["idm_admin"])
+        self.create_group("test_lookup_group2", [])
+
+        uuids = self.lookup.run(
+            ["test_lookup_group1", "test_lookup_group2"],
+            {},
+            kind="group",
+            attribute="uuid",
+            first=True,
+            kanidm=KANIDM,
+        )
+        self.assertEqual(len(uuids), 2)
+        self.assertNotEqual(uuids[0], uuids[1])
+
+        members = self.lookup.run(
+            [uuids[0], "test_lookup_group2"], {}, kind="group_members", kanidm=KANIDM
+        )
+        self.assertEqual(members, [["idm_admin"], []])
+
+    def test_kanidm_lookup_missing(self):
+        with self.assertRaises(AnsibleError):
+            self.lookup.run(["test_lookup_nobody"], {}, kanidm=KANIDM)
@@ -0,0 +1,101 @@
+import unittest
+
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.mutation import (
+    spn_key,
+    url_key,
+)
+
+from .kanidm_fake import body_json, fake_api
+
+PATH = "/v1/oauth2/app"
+
+
+class TestKanidmMutationBatching(unittest.TestCase):
+    def test_flush_sends_one_patch(self):
+        api, adapter = fake_api(lambda r: (200, None), token="t")
+        mutation = api.mutation(name="update", path=PATH)
+        mutation.set("displayname", ["App"])
+        mutation.set("oauth2_rs_origin_landing", ["https://app.example.com"])
+        self.assertEqual(len(mutation), 2)
+        self.assertTrue(mutation.flush())
+
+        self.assertEqual(adapter.paths(), [PATH])
+        self.assertEqual(adapter.requests[0].method, "PATCH")
+        self.assertEqual(
+            body_json(adapter.requests[0]),
+            {
+                "attrs": {
+                    "displayname": ["App"],
+                    "oauth2_rs_origin_landing": ["https://app.example.com"],
+                }
+            },
+        )
+        self.assertTrue(mutation.changed)
+        self.assertEqual(len(mutation), 0)
+        # Nothing left to write.
+        self.assertTrue(mutation.flush())
+        self.assertEqual(len(adapter.requests), 1)
+
+    def test_rejected_batch_falls_back_per_attribute(self):
+        def handler(request):
+            attrs = body_json(request)["attrs"]
+            return (400, "invalidattribute") if "bad" in attrs else (200, None)
+
+        api, adapter = fake_api(handler, token="t")
+        mutation = api.mutation(name="update", path=PATH)
+        mutation.set("displayname", ["App"])
+        mutation.set("bad", ["x"])
+        mutation.set("name", ["app"])
+        self.assertFalse(mutation.flush())
+
+        sent = [list(body_json(r)["attrs"]) for r in adapter.requests]
+        self.assertEqual(
+            sent, [["displayname", "bad", "name"], ["displayname"], ["bad"]]
+        )
+        self.assertEqual(mutation.failed, "bad")
+        self.assertTrue(mutation.changed)
+        # The attribute that was written isn't staged any more.
+        self.assertEqual(sorted(mutation.attrs), ["bad", "name"])
+        self.assertEqual(mutation.current["displayname"], ["App"])
+
+
+class TestKanidmMutationDiff(unittest.TestCase):
+    def test_converged_entry_is_not_written(self):
+        api, adapter = fake_api(lambda r: (200, None), token="t")
+        mutation = api.mutation(name="update", path=PATH).load(
+            {
+                "displayname": ["App"],
+                "oauth2_rs_origin_landing": ["https://app.example.com/"],
+                "oauth2_rs_origin": ["https://b.example.com", "https://a.example.com"],
+            }
+        )
+        mutation.set("displayname", ["App"])
+        mutation.set(
+            "oauth2_rs_origin_landing", ["https://app.example.com"], key=url_key
+        )
+        mutation.add("oauth2_rs_origin", ["https://a.example.com"])
+        self.assertEqual(len(mutation), 0)
+        self.assertTrue(mutation.flush())
+        self.assertEqual(adapter.requests, [])
+        self.assertFalse(mutation.changed)
+
+    def test_only_differences_are_written(self):
+        api, adapter = fake_api(lambda r: (200, None), token="t")
+        mutation = api.mutation(name="update", path=PATH).load(
+            {"displayname": ["App"], "member": ["alice@idm.example.com"]}
+        )
+        mutation.set("displayname", ["App"])
+        mutation.add("member", ["alice", "bob"], key=spn_key)
+        self.assertTrue(mutation.flush())
+        self.assertEqual(
+            body_json(adapter.requests[0]),
+            {"attrs": {"member": ["alice@idm.example.com", "bob"]}},
+        )
+        self.assertTrue(mutation.changed)
+
+    def test_set_back_to_current_unstages(self):
+        api, adapter = fake_api(lambda r: (200, None), token="t")
+        mutation = api.mutation(name="update", path=PATH).load({"displayname": ["A"]})
+        mutation.set("displayname", ["B"])
+        mutation.set("displayname", ["A"])
+        self.assertEqual(len(mutation), 0)
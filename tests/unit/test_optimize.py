@@ -0,0 +1,98 @@
+import io
+import os
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+from unittest.mock import patch
+
+from ansible_collections.annie444.base.plugins.module_utils import sniff
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.arg_specs.oauth_sub import (
+    Image as KanidmImage,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.exceptions import (
+    KanidmModuleError,
+)
+from ansible_collections.annie444.base.plugins.module_utils.optimize import (
+    HAS_PIL,
+    minify_svg,
+    optimize_image,
+)
+
+SVG = b"""<?xml version="1.0"?>
+<!-- exported by an editor -->
+<svg xmlns="http://www.w3.org/2000/svg">
+  <text>a <tspan>b</tspan></text>
+</svg>
+"""
+
+
+class TestOptimizeImage(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.cache = self.dir / "cache"
+
+    def test_optimize_svg(self):
+        path = self.dir / "logo.svg"
+        path.write_bytes(SVG)
+        out, kind = optimize_image(path, sniff.SVG, cache_dir=self.cache)
+        self.assertEqual(kind, sniff.SVG)
+        self.assertEqual(
+            out.read_bytes(),
+            b'<?xml version="1.0"?><svg xmlns="http://www.w3.org/2000/svg">'
+            b"<text>a <tspan>b</tspan></text></svg>",
+        )
+        os.utime(out, (0, 0))
+        self.assertEqual(optimize_image(path, sniff.SVG, cache_dir=self.cache)[0], out)
+        self.assertEqual(os.stat(out).st_mtime, 0)
+
+    def test_minify_svg_keeps_text(self):
+        self.assertEqual(
+            minify_svg(
+                b"<svg>\n  <g>\n    <text x='0'>\n      <tspan>Hello</tspan>\n"
+                b"      <tspan>world</tspan>\n    </text>\n  </g>\n"
+                b"  <svg:text>\n<tspan>a</tspan>\n<tspan>b</tspan></svg:text>\n"
+                b"  <textPath>\n  <tspan/>\n</textPath>\n</svg>\n"
+            ),
+            b"<svg><g><text x='0'>\n      <tspan>Hello</tspan>\n"
+            b"      <tspan>world</tspan>\n    </text></g>"
+            b"<svg:text>\n<tspan>a</tspan>\n<tspan>b</tspan></svg:text>"
+            b"<textPath><tspan/></textPath></svg>",
+        )
+
+    def test_optimize_gif_unchanged(self):
+        path = self.dir / "logo.gif"
+        path.write_bytes(b"GIF89a")
+        self.assertEqual(
+            optimize_image(path, sniff.GIF, cache_dir=self.cache), (path, sniff.GIF)
+        )
+
+    @unittest.skipUnless(HAS_PIL, "Pillow is not installed")
+    def test_optimize_png(self):
+        from PIL import Image
+
+        path = self.dir / "logo.png"
+        Image.effect_noise((1024, 512), 50).save(path)
+        out, kind = optimize_image(path, sniff.PNG, 128, cache_dir=self.cache)
+        self.assertEqual(kind, sniff.WEBP)
+        self.assertLess(out.stat().st_size, path.stat().st_size)
+        with Image.open(io.BytesIO(out.read_bytes())) as image:
+            self.assertEqual(image.size, (128, 64))
+
+    @unittest.skipUnless(HAS_PIL, "Pillow is not installed")
+    def test_optimize_decompression_bomb(self):
+        from PIL import Image
+
+        path = self.dir / "logo.png"
+        Image.new("L", (64, 64)).save(path)
+        image = KanidmImage(src=str(path), format="png", optimize=True)
+        # Twice the limit is refused, more than the limit only warns.
+        with patch.object(Image, "MAX_IMAGE_PIXELS", 1000):
+            with self.assertRaisesRegex(KanidmModuleError, "optimize"):
+                image.get()
+        image = KanidmImage(src=str(path), format="png", optimize=True)
+        with patch.object(Image, "MAX_IMAGE_PIXELS", 4000):
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                with self.assertRaisesRegex(KanidmModuleError, "optimize"):
+                    image.get()
@@ -0,0 +1,71 @@
+import bz2
+import gzip
+import io
+import lzma
+import tarfile
+import unittest
+import zlib
+
+from ansible_collections.annie444.base.plugins.module_utils import sniff as s
+
+
+def tar(data):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as f:
+        info = tarfile.TarInfo("ca.pem")
+        info.size = len(data)
+        f.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+class TestSniff(unittest.TestCase):
+    def test_sniff_kinds(self):
+        data = b"-----BEGIN CERTIFICATE-----\n"
+        samples = [
+            (gzip.compress(data), s.GZIP, None),
+            (bz2.compress(data), s.BZIP2, None),
+            (lzma.compress(data), s.XZ, None),
+            (zlib.compress(data), s.ZLIB, None),
+            (zlib.compress(data, 1), s.ZLIB, None),
+            (b"\x1f\xa0\x90", s.LZW, None),
+            (b"PK\x03\x04\x14", s.ZIP, None),
+            (b"PK\x05\x06" + b"\x00" * 18, s.EMPTY_ZIP, None),
+            (tar(data), s.TAR, None),
+            (s.UTF8_BOM + data, s.TEXT, "utf-8"),
+            ("\ufeff-".encode("utf-16-le"), s.TEXT, "utf-16-le"),
+            ("\ufeff-".encode("utf-32-le"), s.TEXT, "utf-32-le"),
+            ("\ufeff-".encode("utf-16-be"), s.TEXT, "utf-16-be"),
+            ("\ufeff-".encode("utf-32-be"), s.TEXT, "utf-32-be"),
+            (b"+/v8-", s.TEXT, "utf-7"),
+            (b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0dIHDR", s.PNG, None),
+            (b"\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01", s.JPEG, None),
+            (b"\xff\xd8\xff\xe1\x00\x10Exif\x00\x00", s.JPEG, None),
+            (b"GIF89a\x01\x00", s.GIF, None),
+            (b"GIF87a\x01\x00", s.GIF, None),
+            (b"RIFF\x24\x00\x00\x00WEBPVP8 ", s.WEBP, None),
+            (b'<?xml version="1.0"?>\n<svg/>', s.SVG, None),
+            (b'  \n<svg xmlns="http://www.w3.org/2000/svg"/>', s.SVG, None),
+            (b"<!-- logo -->\n<svg/>", s.SVG, None),
+        ]
+        for blob, kind, encoding in samples:
+            signature = s.sniff(blob)
+            self.assertIsNotNone(signature, blob)
+            self.assertEqual((signature.kind, signature.encoding), (kind, encoding))
+            self.assertEqual(s.sniff(memoryview(blob)), signature)
+
+    def test_sniff_unknown(self):
+        for blob in (b"", b"x", b"RIFF\x24\x00\x00\x00WAVE", b"<html></html>"):
+            self.assertIsNone(s.sniff(blob), blob)
+
+    def test_sniff_restricted_kinds(self):
+        svg = s.UTF8_BOM + b"<svg/>"
+        self.assertEqual(s.sniff(svg).kind, s.TEXT)
+        self.assertEqual(s.sniff(svg, s.IMAGE_KINDS).kind, s.SVG)
+        self.assertIsNone(s.sniff(gzip.compress(b""), s.IMAGE_KINDS))
+
+    def test_signatures_indexed_longest_first(self):
+        for group in s.SIGNATURE_INDEX.values():
+            sizes = [signature.size for signature in group]
+            self.assertEqual(sizes, sorted(sizes, reverse=True))
+        utf32 = s.sniff(b"\xff\xfe\x00\x00")
+        self.assertEqual(utf32.encoding, "utf-32-le")
@@ -0,0 +1,116 @@
+import sqlite3
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from ansible.parsing.ajson import AnsibleJSONDecoder, AnsibleJSONEncoder
+
+from ansible_collections.annie444.base.plugins.cache.kanidm import CacheModule
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.store import (
+    KanidmStore,
+)
+
+MISSING = object()
+
+
+class TestKanidmStore(unittest.TestCase):
+    def setUp(self):
+        self.path = Path(tempfile.mkdtemp()) / "entries.sqlite"
+
+    def later(self, seconds):
+        return patch("time.time", return_value=time.time() + seconds)
+
+    def test_values_expire(self):
+        store = KanidmStore(self.path, ttl=60)
+        store.set("a", {"v": 1})
+        store.set("b", {"v": 2}, ttl=3600)
+        self.assertEqual(store.get("a"), {"v": 1})
+        with self.later(120):
+            self.assertIsNone(store.get("a"))
+            self.assertEqual(store.get("b"), {"v": 2})
+            self.assertEqual(store.keys(), ["b"])
+        self.assertEqual(store.stats()["session"]["expired"], 1)
+
+    def test_zero_ttl_never_expires(self):
+        store = KanidmStore(self.path, ttl=0)
+        store.set("a", 1)
+        KanidmStore(self.path, ttl=60).set("b", 2, ttl=0)
+        with self.later(10 * 365 * 86400):
+            self.assertEqual(store.get("a"), 1)
+            self.assertEqual(store.get("b"), 2)
+            self.assertTrue(store.contains("a"))
+            self.assertEqual(store.keys(), ["a", "b"])
+
+    def test_stored_none_is_a_hit(self):
+        store = KanidmStore(self.path)
+        store.set("none", None)
+        self.assertIs(store.get("none", MISSING), None)
+        self.assertIs(store.get("unknown", MISSING), MISSING)
+        self.assertIsNone(store.get("unknown"))
+        self.assertEqual(store.stats()["session"]["hits"], 1)
+        self.assertEqual(store.stats()["session"]["misses"], 2)
+
+    def test_least_recently_read_are_evicted(self):
+        store = KanidmStore(self.path, max_entries=2)
+        store.set("a", 1)
+        store.set("b", 2)
+        store.get("a")
+        store.set("c", 3)
+        self.assertEqual(store.keys(), ["a", "c"])
+        self.assertEqual(store.stats()["total"]["evictions"], 1)
+
+    def test_reads_dont_take_the_write_lock(self):
+        store = KanidmStore(self.path)
+        store.set("a", 1)
+        other = sqlite3.connect(str(self.path), timeout=0, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        try:
+            self.assertEqual(store.get("a"), 1)
+            self.assertIsNone(store.get("b"))
+        finally:
+            other.execute("ROLLBACK")
+            other.close()
+
+    def test_counters_are_written_at_close(self):
+        store = KanidmStore(self.path)
+        store.set("a", 1)
+        store.get("a")
+        store.get("b")
+        self.assertEqual(KanidmStore(self.path).stats()["total"]["hits"], 0)
+        self.assertEqual(store.stats()["total"]["hits"], 1)
+        store.close()
+        total = KanidmStore(self.path).stats()["total"]
+        self.assertEqual((total["hits"], total["misses"]), (1, 1))
+
+
+class TestCachePlugin(unittest.TestCase):
+    def cache(self, **options):
+        # Plugin options are only resolved when loaded by Ansible, so the
+        # store is set up the way the plugin's constructor would.
+        cache = CacheModule.__new__(CacheModule)
+        cache._prefix = "facts/"
+        cache._store = KanidmStore(
+            Path(tempfile.mkdtemp()) / "facts.sqlite",
+            encoder=AnsibleJSONEncoder,
+            decoder=AnsibleJSONDecoder,
+            **options,
+        )
+        return cache
+
+    def test_none_facts_are_cached(self):
+        cache = self.cache()
+        cache.set("host", None)
+        self.assertTrue(cache.contains("host"))
+        self.assertIsNone(cache.get("host"))
+        self.assertEqual(cache.copy(), {"host": None})
+        with self.assertRaises(KeyError):
+            cache.get("other")
+
+    def test_zero_timeout_never_expires(self):
+        cache = self.cache(ttl=0)
+        cache.set("host", {"fact": 1})
+        with patch("time.time", return_value=time.time() + 10 * 365 * 86400):
+            self.assertEqual(cache.get("host"), {"fact": 1})
+            self.assertEqual(cache.keys(), ["host"])
@@ -0,0 +1,35 @@
+import json
+import unittest
+
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.stream import (
+    JsonStreamError,
+    iter_array,
+)
+
+
+def chunks(body, size):
+    return (body[i : i + size] for i in range(0, len(body), size))
+
+
+class TestIterArray(unittest.TestCase):
+    def test_iter_array_any_chunk_size(self):
+        doc = [
+            {"attrs": {"name": ["alice"], "displayname": ["Ålice 中"]}},
+            [1, [2, "]"]],
+            12.5e-3,
+            -7,
+            True,
+            None,
+            "",
+        ]
+        body = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+        for size in (1, 2, 3, 5, 64, len(body)):
+            self.assertEqual(list(iter_array(chunks(body, size))), doc)
+
+    def test_iter_array_empty(self):
+        self.assertEqual(list(iter_array([b" [ ] "])), [])
+
+    def test_iter_array_invalid(self):
+        for body in (b"", b'{"a": 1}', b"[1, 2", b"[1 2]", b"[1,]", b"[1] x", b"[2.x]"):
+            with self.assertRaises(JsonStreamError):
+                list(iter_array(chunks(body, 2)))
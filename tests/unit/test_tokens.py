@@ -0,0 +1,202 @@
+import json
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.arg_specs.conf import (
+    KanidmConf,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.tokens import (
+    KanidmTokenCache,
+    token_expired,
+)
+
+from .kanidm_fake import URI, body_json, fake_api, jwt
+
+
+def privileged(expiry):
+    """A token that may write until ``expiry`` and stays valid for a day."""
+    return jwt(time.time() + 86400, purpose={"readwrite": {"expiry": expiry}})
+
+
+def login(new_token):
+    """Answer a password login with ``new_token``."""
+
+    def handler(request):
+        step = body_json(request)["step"]
+        if "init2" in step:
+            return 200, {"sessionid": "s", "state": {"choose": ["password"]}}
+        if "begin" in step:
+            return 200, {"sessionid": "s", "state": {"continue": ["password"]}}
+        return 200, {"sessionid": "s", "state": {"success": new_token}}
+
+    return handler
+
+
+class TestKanidmTokenCache(unittest.TestCase):
+    def setUp(self):
+        self.path = Path(tempfile.mkdtemp()) / "kanidm_tokens"
+        self.cache = KanidmTokenCache(self.path)
+
+    def test_token_cache_keeps_cli_instances(self):
+        self.path.write_text(
+            json.dumps({"instances": {"": {"keys": {"k": 1}, "tokens": {"a": "t"}}}})
+        )
+        self.assertTrue(self.cache.set(URI, "admin", "token"))
+        self.assertEqual(self.cache.get(URI, "admin"), "token")
+        data = json.loads(self.path.read_text())
+        self.assertEqual(
+            data["instances"][""], {"keys": {"k": 1}, "tokens": {"a": "t"}}
+        )
+        self.assertEqual(self.path.stat().st_mode & 0o777, 0o600)
+
+        self.assertTrue(self.cache.remove(URI, "admin"))
+        self.assertIsNone(self.cache.get(URI, "admin"))
+
+    def test_token_cache_parallel_writers(self):
+        # Without the lock, concurrent read-modify-write cycles lose updates.
+        threads = [
+            threading.Thread(target=self.cache.set, args=(URI, f"user{i}", f"t{i}"))
+            for i in range(16)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for i in range(16):
+            self.assertEqual(self.cache.get(URI, f"user{i}"), f"t{i}")
+
+    def test_token_cache_unreadable_file(self):
+        self.path.write_text("not json")
+        self.assertIsNone(self.cache.get(URI, "admin"))
+        self.assertTrue(self.cache.set(URI, "admin", "token"))
+        self.assertEqual(self.cache.get(URI, "admin"), "token")
+
+
+class TestTokenExpiry(unittest.TestCase):
+    def test_token_expired(self):
+        self.assertFalse(token_expired(jwt(time.time() + 3600)))
+        self.assertTrue(token_expired(jwt(time.time() - 10)))
+        # Tokens about to expire are treated as expired.
+        self.assertTrue(token_expired(jwt(time.time() + 5)))
+        self.assertIsNone(token_expired("opaque"))
+
+    def test_token_write_access_expired(self):
+        token = privileged(int(time.time()) + 60)
+        self.assertFalse(token_expired(token))
+        self.assertTrue(token_expired(token, writable=True))
+        self.assertFalse(token_expired(privileged(time.time() + 3600), writable=True))
+        # No limit on writes, or a read only token.
+        self.assertFalse(token_expired(privileged(None), writable=True))
+        readonly = jwt(time.time() + 3600, purpose="readonly")
+        self.assertFalse(token_expired(readonly, writable=True))
+
+    def test_token_cache_is_opt_in(self):
+        self.assertFalse(KanidmConf(uri=URI).token_cache)
+
+    def test_expired_cached_token_is_dropped(self):
+        path = Path(tempfile.mkdtemp()) / "kanidm_tokens"
+        KanidmTokenCache(path).set(URI, "admin", jwt(time.time() - 10))
+        api, adapter = fake_api(
+            lambda r: (500, "unexpected"),
+            username="admin",
+            password="secret",
+            token_cache=True,
+            token_cache_path=str(path),
+        )
+        self.assertFalse(api.load_cached_token())
+        self.assertIsNone(KanidmTokenCache(path).get(URI, "admin"))
+        self.assertEqual(adapter.requests, [])
+
+    def test_valid_cached_token_skips_login(self):
+        path = Path(tempfile.mkdtemp()) / "kanidm_tokens"
+        token = jwt(time.time() + 3600)
+        KanidmTokenCache(path).set(URI, "admin", token)
+        api, adapter = fake_api(
+            lambda r: (200, {}),
+            username="admin",
+            password="secret",
+            token_cache=True,
+            token_cache_path=str(path),
+        )
+        api.authenticate()
+        self.assertEqual(adapter.paths(), ["/v1/auth/valid"])
+        self.assertEqual(
+            adapter.requests[0].headers["Authorization"], f"Bearer {token}"
+        )
+
+    def test_read_only_cached_token_is_dropped(self):
+        path = Path(tempfile.mkdtemp()) / "kanidm_tokens"
+        KanidmTokenCache(path).set(URI, "admin", privileged(int(time.time()) - 60))
+        api, adapter = fake_api(
+            lambda r: (500, "unexpected"),
+            username="admin",
+            password="secret",
+            token_cache=True,
+            token_cache_path=str(path),
+        )
+        self.assertFalse(api.load_cached_token())
+        self.assertIsNone(KanidmTokenCache(path).get(URI, "admin"))
+        self.assertEqual(adapter.requests, [])
+
+
+class TestRefusedCachedToken(unittest.TestCase):
+    def setUp(self):
+        self.path = Path(tempfile.mkdtemp()) / "kanidm_tokens"
+        # The token claims no limit, but the server took its write access.
+        self.stale = jwt(time.time() + 3600)
+        self.fresh = jwt(time.time() + 7200)
+        KanidmTokenCache(self.path).set(URI, "admin", self.stale)
+
+    def api(self, refuse):
+        answer_login = login(self.fresh)
+
+        def handler(request):
+            if request.path_url == "/v1/auth":
+                return answer_login(request)
+            if request.method == "GET":
+                return 200, {}
+            return (403, "accessdenied") if refuse(request) else (200, None)
+
+        return fake_api(
+            handler,
+            username="admin",
+            password="secret",
+            token_cache=True,
+            token_cache_path=str(self.path),
+        )
+
+    def sent_with(self, adapter, method):
+        return [
+            r.headers["Authorization"] for r in adapter.requests if r.method == method
+        ]
+
+    def test_refused_write_logs_in_again(self):
+        api, adapter = self.api(
+            lambda r: r.headers["Authorization"] == f"Bearer {self.stale}"
+        )
+        api.authenticate()
+        self.assertTrue(api.patch("write", "/v1/person/alice", json={"attrs": {}}))
+        self.assertEqual(
+            self.sent_with(adapter, "PATCH"),
+            [f"Bearer {self.stale}", f"Bearer {self.fresh}"],
+        )
+        self.assertEqual(KanidmTokenCache(self.path).get(URI, "admin"), self.fresh)
+        # Later writes use the new token straight away.
+        self.assertTrue(api.patch("write", "/v1/person/bob", json={"attrs": {}}))
+        self.assertEqual(len(self.sent_with(adapter, "PATCH")), 3)
+
+    def test_refused_write_is_retried_once(self):
+        api, adapter = self.api(lambda r: True)
+        api.authenticate()
+        self.assertFalse(api.patch("write", "/v1/person/alice", json={"attrs": {}}))
+        self.assertFalse(api.patch("write", "/v1/person/bob", json={"attrs": {}}))
+        self.assertEqual(len(self.sent_with(adapter, "PATCH")), 3)
+        self.assertEqual(adapter.paths("POST").count("/v1/auth"), 3)
+
+    def test_refused_write_without_cache_is_not_retried(self):
+        api, adapter = fake_api(lambda r: (403, "accessdenied"), token="t")
+        self.assertFalse(api.patch("write", "/v1/person/alice", json={"attrs": {}}))
+        self.assertEqual(len(adapter.requests), 1)
@@ -0,0 +1,125 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from requests import Request, Response
+from requests.structures import CaseInsensitiveDict
+
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner import (
+    transcript,
+)
+from ansible_collections.annie444.base.plugins.module_utils.kanidm.runner.transcript import (
+    KanidmTranscript,
+)
+
+from .kanidm_fake import URI
+
+REQUEST_KEYS = {"body", "headers", "method", "url"}
+RESPONSE_KEYS = {
+    "cookies",
+    "elapsed",
+    "encoding",
+    "headers",
+    "redirect",
+    "json",
+    "reason",
+    "status_code",
+    "text",
+    "url",
+}
+
+
+def request(path, body=None):
+    return Request("POST" if body else "GET", f"{URI}{path}", json=body).prepare()
+
+
+def response(status, content):
+    res = Response()
+    res.status_code = status
+    res.reason = "OK"
+    res.url = URI
+    res.headers = CaseInsensitiveDict({"Content-Type": "application/json"})
+    res.encoding = "utf-8"
+    res._content = content
+    return res
+
+
+def record(log, name, body=None, content=b'{"ok": true}'):
+    log.record_request(name, request(f"/v1/{name}", body))
+    log.record_response(name, response(200, content))
+
+
+class TestKanidmTranscript(unittest.TestCase):
+    def test_oldest_entries_are_evicted(self):
+        log = KanidmTranscript(max_entries=2)
+        for name in ("a", "b", "c"):
+            record(log, name)
+        self.assertEqual(list(log.requests()), ["b", "c"])
+        self.assertEqual(list(log.responses()), ["b", "c"])
+        self.assertEqual(log.dropped, 1)
+
+    def test_bytes_budget_evicts_the_oldest(self):
+        log = KanidmTranscript(max_bytes=40)
+        record(log, "a", content=b'"' + b"x" * 20 + b'"')
+        record(log, "b", content=b'"' + b"y" * 20 + b'"')
+        self.assertEqual(list(log.responses()), ["b"])
+        self.assertEqual(log.size, 22)
+        self.assertEqual(log.dropped, 1)
+
+    def test_newest_entry_is_kept_and_clipped(self):
+        log = KanidmTranscript(max_bytes=4)
+        record(log, "a", content=b"0123456789")
+        self.assertEqual(log.responses(), {"a": "200 OK 0123"})
+        self.assertTrue(log.entries["a"][1].truncated)
+
+    def test_repeated_names_replace_the_entry(self):
+        log = KanidmTranscript(max_entries=2)
+        record(log, "a")
+        record(log, "b")
+        record(log, "a", content=b"[]")
+        self.assertEqual(list(log.requests()), ["b", "a"])
+        self.assertEqual(log.dropped, 0)
+
+    def test_bodies_are_decoded_on_access(self):
+        log = KanidmTranscript(debug=True)
+        with patch.object(transcript, "loads", wraps=json.loads) as loads:
+            record(log, "a", body={"attrs": {"name": ["alice"]}})
+            self.assertEqual(loads.call_count, 0)
+            self.assertIsInstance(log.entries["a"][1].content, bytes)
+            requests, responses = log.requests(), log.responses()
+            self.assertEqual(loads.call_count, 2)
+        self.assertEqual(requests["a"]["body"], {"attrs": {"name": ["alice"]}})
+        self.assertEqual(responses["a"]["json"], {"ok": True})
+
+    def test_debug_shapes(self):
+        log = KanidmTranscript(debug=True)
+        record(log, "a", body=["alice"])
+        log.record_request("b", request("/v1/b"))
+        log.record_response("b", response(404, b"nomatchingentries"))
+        requests, responses = log.requests(), log.responses()
+        self.assertEqual(set(requests["a"]), REQUEST_KEYS)
+        self.assertEqual(requests["a"]["method"], "POST")
+        self.assertEqual(requests["a"]["url"], f"{URI}/v1/a")
+        self.assertEqual(requests["b"]["body"], "")
+        self.assertEqual(set(responses["a"]), RESPONSE_KEYS)
+        self.assertEqual(responses["a"]["text"], {"ok": True})
+        self.assertEqual(responses["b"]["status_code"], 404)
+        self.assertEqual(responses["b"]["json"], {})
+        self.assertEqual(responses["b"]["text"], "nomatchingentries")
+
+    def test_basic_shapes(self):
+        log = KanidmTranscript()
+        record(log, "a", body=["alice"])
+        log.record_request("b", request("/v1/b"))
+        self.assertEqual(
+            log.requests(),
+            {"a": f"POST {URI}/v1/a ['alice']", "b": f"GET {URI}/v1/b"},
+        )
+        self.assertEqual(log.responses(), {"a": '200 OK {"ok": true}'})
+
+    def test_streamed_bodies_are_not_read(self):
+        log = KanidmTranscript(debug=True)
+        log.record_request("a", request("/v1/a"))
+        log.record_response("a", response(200, b"image"), streamed=True)
+        self.assertEqual(log.responses()["a"]["text"], "")
+        self.assertTrue(log.entries["a"][1].truncated)
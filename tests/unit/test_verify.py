@@ -0,0 +1,61 @@
+import gzip
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from base64 import b64encode, encodebytes
+from pathlib import Path
+
+from ansible_collections.annie444.base.plugins.module_utils.verify import (
+    decode_content,
+)
+
+PEM = b"-----BEGIN CERTIFICATE-----\nMIIB\n-----END CERTIFICATE-----\n"
+
+
+def tar_gz(name, data, mode="w:gz"):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode=mode) as f:
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        f.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+def zipped(name, data):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as f:
+        f.writestr(name, data)
+    return buf.getvalue()
+
+
+class TestDecodeContent(unittest.TestCase):
+    def setUp(self):
+        self.cache = tempfile.mkdtemp()
+
+    def test_decode_content_formats(self):
+        for blob in (
+            gzip.compress(PEM),
+            tar_gz("ca.pem", PEM),
+            tar_gz("ca.pem", PEM, mode="w"),
+            zipped("ca.pem", PEM),
+            b"\xff\xfe" + PEM.decode().encode("utf-16-le"),
+        ):
+            path = decode_content(encodebytes(blob).decode(), self.cache)
+            self.assertEqual(Path(path).read_bytes(), PEM)
+
+    def test_decode_content_reuses_cache(self):
+        value = b64encode(gzip.compress(PEM)).decode()
+        path = decode_content(value, self.cache)
+        os.utime(path, (0, 0))
+        self.assertEqual(decode_content(value, self.cache), path)
+        self.assertEqual(os.stat(path).st_mtime, 0)
+        self.assertEqual(len(os.listdir(self.cache)), 1)
+
+    def test_decode_content_failure_leaves_nothing(self):
+        for blob in (b"not a known format", b"PK\x05\x06" + b"\x00" * 18):
+            with self.assertRaises(ValueError):
+                decode_content(b64encode(blob).decode(), self.cache)
+        self.assertEqual(os.listdir(self.cache), [])